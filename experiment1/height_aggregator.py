@@ -0,0 +1,118 @@
+"""
+Streaming per-height aggregation of the gravitational acceleration data.
+
+The track logs are read in chunks and reduced to mergeable accumulators
+(count, mean and M2, Welford's method) for each track height, so files far
+larger than memory can be summarized before the slope is fitted.
+"""
+import numpy as np
+import pandas as pd
+
+from phys1494.fitcache import linregress
+from phys1494.instrument import staged
+
+L = 150  # cm
+
+HEIGHT_COLUMN = 'h (mm)'
+ACCELERATION_COLUMN = 'ax (m/s^2)'
+DELTA_COLUMNS = ['Trial #', 'l2 (m)', 'v1 (m/s)']
+
+
+class HeightAggregator:
+    def __init__(self):
+        """
+        Initialize an empty set of per-height accumulators.
+        """
+        self.stats = pd.DataFrame(
+            {'count': [], 'mean': [], 'm2': []}, dtype=float
+        )
+
+    def update(self, heights, accelerations):
+        """
+        Fold a block of (height, acceleration) samples into the accumulators.
+        """
+        grouped = pd.Series(np.asarray(accelerations, dtype=float)).groupby(
+            np.asarray(heights, dtype=float)
+        )
+        count = grouped.count().astype(float)
+        block = pd.DataFrame({
+            'count': count,
+            'mean': grouped.mean(),
+            'm2': grouped.var(ddof=0) * count,
+        })
+        self.merge(block)
+
+    def merge(self, other):
+        """
+        Merge another set of accumulators (a HeightAggregator or its stats
+        frame) into this one using the parallel Welford update.
+        """
+        other = other.stats if isinstance(other, HeightAggregator) else other
+        index = self.stats.index.union(other.index)
+        a = self.stats.reindex(index, fill_value=0.0)
+        b = other.reindex(index, fill_value=0.0)
+
+        count = a['count'] + b['count']
+        delta = b['mean'] - a['mean']
+        mean = a['mean'] + delta * b['count'] / count
+        m2 = a['m2'] + b['m2'] + delta**2 * a['count'] * b['count'] / count
+        self.stats = pd.DataFrame({'count': count, 'mean': mean, 'm2': m2})
+
+    def means(self):
+        """
+        Return the table of height (cm), mean acceleration and standard error.
+        """
+        count = self.stats['count']
+        std = np.sqrt(self.stats['m2'] / (count - 1))
+        return pd.DataFrame({
+            'h (cm)': self.stats.index.to_numpy() / 10.0,
+            'ax_mean': self.stats['mean'].to_numpy(),
+            'ax_error': (std / np.sqrt(count)).to_numpy(),
+        })
+
+
+def trial_deltas(chunk):
+    """
+    Return the Trial # and Delta = v1^2 / (2 ax l2) - 1 of every trial in a
+    block of rows.
+    """
+    delta = (chunk['v1 (m/s)'] ** 2) / (2 * chunk[ACCELERATION_COLUMN] * chunk['l2 (m)']) - 1
+    return pd.DataFrame({'Trial #': chunk['Trial #'], 'Delta': delta})
+
+
+@staged("load")
+def aggregate_csv(filename, chunksize=1_000_000, deltas=None):
+    """
+    Stream a gravitational_acceleration_data.csv-format file and return the
+    populated HeightAggregator. If deltas is a list, the trial_deltas of
+    every chunk are appended to it in the same pass.
+    """
+    columns = [HEIGHT_COLUMN, ACCELERATION_COLUMN]
+    if deltas is not None:
+        columns += DELTA_COLUMNS
+    aggregator = HeightAggregator()
+    for chunk in pd.read_csv(filename, usecols=columns, chunksize=chunksize):
+        aggregator.update(chunk[HEIGHT_COLUMN], chunk[ACCELERATION_COLUMN])
+        if deltas is not None:
+            deltas.append(trial_deltas(chunk))
+    return aggregator
+
+
+def estimate_g(means, track_length=L):
+    """
+    Fit ax_mean against height and return the slope, intercept, their
+    standard errors and the estimate of g with its uncertainty.
+    """
+    h = means['h (cm)'].to_numpy()
+    slope, intercept, r_value, p_value, std_err = linregress(h, means['ax_mean'])
+    SE_intercept = std_err * np.sqrt(
+        (1 / len(h)) + (np.mean(h) ** 2 / np.sum((h - np.mean(h)) ** 2))
+    )
+    return {
+        'slope': slope,
+        'slope_error': std_err,
+        'intercept': intercept,
+        'intercept_error': SE_intercept,
+        'g': slope * track_length,
+        'sigma_g': std_err * track_length,
+    }
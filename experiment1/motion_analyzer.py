@@ -1,14 +1,31 @@
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 import os
 
+from phys1494.instrument import stage, staged
+
+TRIAL_COLUMNS = ["v initial", "uncertainty vi", "v final", "uncertainty vf"]
+PLOT_SAMPLE_ROWS = 100_000  # trials kept for the plots when streaming
+
 class CoefficientAnalyzer:
-    def __init__(self, data_file):
+    def __init__(self, data_file, chunksize=None):
         """
         Initialize the CoefficientAnalyzer class.
+
+        If chunksize is given, the CSV is streamed in chunks of that many rows
+        when the trials are processed instead of being loaded up front, and
+        the plots show a uniform random sample of at most PLOT_SAMPLE_ROWS
+        trials.
         """
+        self.data_file = data_file
+        self.chunksize = chunksize
         # Load the data for all trials from the CSV
-        self.data = pd.read_csv(data_file)
+        self.data = None
+        self.sample = None
+        if chunksize is None:
+            with stage("load") as s:
+                self.data = pd.read_csv(data_file)
+                s.rows = len(self.data)
 
     def calculate_coefficient(self, v_initial, v_final):
         """
@@ -28,8 +45,22 @@ class CoefficientAnalyzer:
             + (partial_e_vf**2 * sigma_vf**2)
         ) ** 0.5
 
-    def process_all_trials(self):
-        """Process all trials in the data."""
+    @staged("transform")
+    def process_all_trials(self, vectorized=False):
+        """
+        Process all trials in the data.
+
+        With vectorized=True the coefficients, uncertainties and means are
+        computed with whole-column array operations. Chunked input is always
+        processed that way.
+        """
+        if self.chunksize is not None:
+            self._process_chunks()
+            return
+        if vectorized:
+            self._process_vectorized()
+            return
+
         self.data["e_calculated"] = self.data.apply(
             lambda row: self.calculate_coefficient(
                 row["v initial"], row["v final"]
@@ -57,20 +88,110 @@ class CoefficientAnalyzer:
         self.e_weighted_mean = sum(self.data["e_calculated"] * weights) / sum(weights)
         self.sigma_weighted_mean = (sum(weights)) ** -0.5
 
+    def _trial_arrays(self, frame):
+        """Return e and its uncertainty for every row of frame as arrays."""
+        v_initial, sigma_vi, v_final, sigma_vf = (
+            frame[column].to_numpy(dtype=float) for column in TRIAL_COLUMNS
+        )
+        e = self.calculate_coefficient(v_initial, v_final)
+        sigma_e = self.calculate_uncertainty(v_initial, sigma_vi, v_final, sigma_vf)
+        return e, sigma_e
+
+    @staticmethod
+    def _trial_sums(e, sigma_e):
+        """
+        Reduce a block of trials to mergeable sums: count, mean, sum of squared
+        deviations (M2), sum of weights and weighted sum of e.
+        """
+        weights = 1 / sigma_e**2
+        n = e.size
+        mean = e.mean() if n else 0.0
+        m2 = np.sum((e - mean) ** 2)
+        return n, mean, m2, np.sum(weights), np.dot(weights, e)
+
+    @staticmethod
+    def _merge_sums(a, b):
+        """Combine two sets of trial sums (Chan et al. parallel update)."""
+        n_a, mean_a, m2_a, w_a, we_a = a
+        n_b, mean_b, m2_b, w_b, we_b = b
+        n = n_a + n_b
+        if n == 0:
+            return a
+        delta = mean_b - mean_a
+        mean = mean_a + delta * n_b / n
+        m2 = m2_a + m2_b + delta**2 * n_a * n_b / n
+        return n, mean, m2, w_a + w_b, we_a + we_b
+
+    def _set_statistics(self, sums):
+        """Store the unweighted and weighted means computed from trial sums."""
+        n, mean, m2, sum_weights, weighted_sum = sums
+        self.e_mean = mean
+        self.sigma = (m2 / (n - 1)) ** 0.5  # standard deviation
+        self.N = n
+        self.sigma_mean = self.sigma / (self.N**0.5)
+        self.e_weighted_mean = weighted_sum / sum_weights
+        self.sigma_weighted_mean = sum_weights**-0.5
+
+    def _process_vectorized(self):
+        """Process the loaded trials with array operations."""
+        e, sigma_e = self._trial_arrays(self.data)
+        self.data["e_calculated"] = e
+        self.data["e_uncertainty"] = sigma_e
+        self._set_statistics(self._trial_sums(e, sigma_e))
+
+    def _process_chunks(self):
+        """
+        Process the CSV chunk by chunk, keeping only the running sums and a
+        bounded sample of (v initial, e) for the plots.
+        """
+        sums = (0, 0.0, 0.0, 0.0, 0.0)
+        rng = np.random.default_rng(0)
+        keys = np.empty(0)
+        sample = np.empty((0, 2))
+        for chunk in pd.read_csv(
+            self.data_file, usecols=TRIAL_COLUMNS, chunksize=self.chunksize
+        ):
+            e, sigma_e = self._trial_arrays(chunk)
+            sums = self._merge_sums(sums, self._trial_sums(e, sigma_e))
+
+            # Keep the rows with the smallest random keys seen so far, a
+            # uniform sample of every trial read
+            keys = np.concatenate([keys, rng.random(len(e))])
+            v_initial = chunk["v initial"].to_numpy(dtype=float)
+            sample = np.concatenate([sample, np.column_stack([v_initial, e])])
+            if len(keys) > PLOT_SAMPLE_ROWS:
+                keep = np.argpartition(keys, PLOT_SAMPLE_ROWS)[:PLOT_SAMPLE_ROWS]
+                keys, sample = keys[keep], sample[keep]
+        self._set_statistics(sums)
+        self.sample = pd.DataFrame(sample, columns=["v initial", "e_calculated"])
+
+    def _plot_data(self):
+        """The processed trials to plot: all of them, or the streamed sample."""
+        if self.data is not None and "e_calculated" in self.data:
+            return self.data
+        if self.sample is None:
+            raise RuntimeError("call process_all_trials() before plotting")
+        return self.sample
+
     def display_results(self):
         """Display the results for all trials."""
-        print("Trial-wise results:")
-        print(self.data)
+        if self.data is not None:
+            print("Trial-wise results:")
+            print(self.data)
         print("\nUnweighted mean (ē):", self.e_mean)
         print("Standard deviation (σ):", self.sigma)
         print("Standard error on the mean (σ̄e):", self.sigma_mean)
         print("\nWeighted mean (ē_w):", self.e_weighted_mean)
         print("Standard error on the weighted mean (σ̄_ew):", self.sigma_weighted_mean)
 
+    @staged("plot")
     def plot_e_vs_vi(self):
         """Plot e against v_initial and save the figure in the 'figures' folder."""
+        import matplotlib.pyplot as plt
+
+        data = self._plot_data()
         plt.figure(figsize=(10, 6))
-        plt.scatter(self.data["v initial"], self.data["e_calculated"], marker='o', color='blue', label="e values")
+        plt.scatter(data["v initial"], data["e_calculated"], marker='o', color='blue', label="e values")
         plt.axhline(y=self.e_mean, color='r', linestyle='--', label=f"Unweighted mean $\\bar{{e}}$ = {self.e_mean:.4f}")
         plt.axhline(y=self.e_weighted_mean, color='g', linestyle='-.', label=f"Weighted mean $\\bar{{e}}_w$ = {self.e_weighted_mean:.4f}")
         plt.xlabel("Initial Velocity ($v_i$)")
@@ -88,10 +209,14 @@ class CoefficientAnalyzer:
         plt.savefig('experiment1/figures/e_vs_vi_plot.png')
         plt.show()
 
+    @staged("plot")
     def plot_histogram(self):
             """Plot a histogram of e values and overlay vertical lines for e_bar and e_w_bar."""
+            import matplotlib.pyplot as plt
+
+            data = self._plot_data()
             plt.figure(figsize=(10, 6))
-            plt.hist(self.data["e_calculated"], bins=10, color='lightblue', edgecolor='black', alpha=0.7, label="Frequency of e values")
+            plt.hist(data["e_calculated"], bins=10, color='lightblue', edgecolor='black', alpha=0.7, label="Frequency of e values")
             plt.axvline(x=self.e_mean, color='r', linestyle='--', label=f"Unweighted mean $\\bar{{e}}$ = {self.e_mean:.4f}")
             plt.axvline(x=self.e_weighted_mean, color='g', linestyle='-.', label=f"Weighted mean $\\bar{{e}}_w$ = {self.e_weighted_mean:.4f}")
             plt.xlabel("Coefficient of Restitution (e)")
@@ -105,8 +230,17 @@ class CoefficientAnalyzer:
             plt.savefig('experiment1/figures/e_histogram.png')
             plt.show()
 
-analyzer = CoefficientAnalyzer("experiment1/data.csv")  # Adjust the file path
-analyzer.process_all_trials()
-analyzer.display_results()
-analyzer.plot_e_vs_vi()
-analyzer.plot_histogram()
+
+def main(plot=True):
+    analyzer = CoefficientAnalyzer("experiment1/data.csv")  # Adjust the file path
+    analyzer.process_all_trials()
+    analyzer.display_results()
+    if plot:
+        analyzer.plot_e_vs_vi()
+        analyzer.plot_histogram()
+    return analyzer
+
+
+if __name__ == "__main__":
+    main()
+
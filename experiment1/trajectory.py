@@ -0,0 +1,113 @@
+"""
+Vectorized displacement and velocity trajectories for a cart bouncing off the
+bumper, as plotted by velocity_acceleration_graph.py.
+
+Every function works on a batch of (velocity_left, velocity_right) pairs and
+returns 2-D arrays with one row per collision scenario, so sweeps over many
+scenarios need no per-sample Python loop.
+"""
+import numpy as np
+
+INITIAL_POSITION = 150  # cm
+INTERPOLATION_FRACTION = 0.05  # fraction of the time to hit the bumper
+
+
+def _time_grid(velocity_pairs, num_samples, initial_position):
+    """Return the velocity columns, time to hit the bumper and time matrix."""
+    velocity_pairs = np.atleast_2d(np.asarray(velocity_pairs, dtype=float))
+    velocity_left = velocity_pairs[:, 0:1]
+    velocity_right = velocity_pairs[:, 1:2]
+
+    time_to_hit_bumper = initial_position / np.abs(velocity_left)
+    total_time = 2 * time_to_hit_bumper  # Assuming it returns to the same position
+    times = total_time * np.linspace(0, 1, num_samples)
+    return velocity_left, velocity_right, time_to_hit_bumper, times
+
+
+def batch_ideal_trajectories(
+    velocity_pairs, num_samples=1000, initial_position=INITIAL_POSITION
+):
+    """
+    Compute ideal trajectories with an instantaneous bounce.
+
+    Returns (times, displacements, velocities), each of shape
+    (len(velocity_pairs), num_samples).
+    """
+    velocity_left, velocity_right, time_to_hit_bumper, times = _time_grid(
+        velocity_pairs, num_samples, initial_position
+    )
+    before_bounce = times < time_to_hit_bumper
+
+    displacements = np.where(
+        before_bounce,
+        initial_position + velocity_left * times,
+        velocity_right * (times - time_to_hit_bumper),
+    )
+    velocities = np.where(before_bounce, velocity_left, velocity_right)
+    return times, displacements, velocities
+
+
+def batch_real_trajectories(
+    velocity_pairs, num_samples=1000, initial_position=INITIAL_POSITION
+):
+    """
+    Compute realistic trajectories in which the cart moves at the midpoint
+    velocity during a window around the collision.
+
+    Displacements after the window opens are integrated with a cumulative sum
+    of the velocities, matching the step-by-step integration of the original
+    loop. Returns (times, displacements, velocities), each of shape
+    (len(velocity_pairs), num_samples).
+    """
+    velocity_left, velocity_right, time_to_hit_bumper, times = _time_grid(
+        velocity_pairs, num_samples, initial_position
+    )
+    interpolation_window = INTERPOLATION_FRACTION * time_to_hit_bumper
+    midpoint_velocity = (velocity_left + velocity_right) / 2
+
+    approaching = times < time_to_hit_bumper - interpolation_window
+    colliding = ~approaching & (times < time_to_hit_bumper + interpolation_window)
+
+    velocities = np.where(
+        approaching,
+        velocity_left,
+        np.where(colliding, midpoint_velocity, velocity_right),
+    )
+
+    # Position at the last sample before the window opens, then integrate
+    rows = np.arange(times.shape[0])
+    last_approach = np.maximum(approaching.sum(axis=1) - 1, 0)
+    start_position = initial_position + velocity_left[:, 0] * times[rows, last_approach]
+    time_step = times[:, 1:2] - times[:, 0:1]
+    integrated = start_position[:, None] + time_step * np.cumsum(
+        np.where(approaching, 0.0, velocities), axis=1
+    )
+
+    displacements = np.where(
+        approaching, initial_position + velocity_left * times, integrated
+    )
+    return times, displacements, velocities
+
+
+def ideal_trajectory(
+    velocity_left, velocity_right, num_samples=1000, initial_position=INITIAL_POSITION
+):
+    """Return (times, displacements, velocities) arrays for one ideal bounce."""
+    return tuple(
+        array[0]
+        for array in batch_ideal_trajectories(
+            [(velocity_left, velocity_right)], num_samples, initial_position
+        )
+    )
+
+
+def real_trajectory(
+    velocity_left, velocity_right, num_samples=1000, initial_position=INITIAL_POSITION
+):
+    """Return (times, displacements, velocities) arrays for one real bounce."""
+    return tuple(
+        array[0]
+        for array in batch_real_trajectories(
+            [(velocity_left, velocity_right)], num_samples, initial_position
+        )
+    )
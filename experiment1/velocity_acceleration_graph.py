@@ -1,35 +1,21 @@
 import os
-import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
 
+from phys1494.instrument import staged
+
+from trajectory import ideal_trajectory, real_trajectory
+
+directory = "experiment1/figures/"
+
+
+@staged("plot")
 def generate_graphs(velocity_left, velocity_right, label_prefix, save_name):
     """
     Generates displacement and velocity graphs for a given set of left and right velocities.
     """
-
-    # Constants
-    initial_position = 150  # cm
-    time_to_hit_bumper = initial_position / abs(velocity_left)
-    total_time = 2 * time_to_hit_bumper  # Assuming it returns to the same position
-
-    # Time array
-    times = np.linspace(0, total_time, 1000)
+    import matplotlib.pyplot as plt
 
     # Displacement and velocity arrays
-    displacements = []
-    velocities = []
-
-    for t in times:
-        if t < time_to_hit_bumper:
-            # Moving left towards the bumper
-            displacements.append(initial_position + velocity_left * t)
-            velocities.append(velocity_left)
-        else:
-            # Moving right after bouncing
-            time_after_bounce = t - time_to_hit_bumper
-            displacements.append(velocity_right * time_after_bounce)
-            velocities.append(velocity_right)
+    times, displacements, velocities = ideal_trajectory(velocity_left, velocity_right)
 
     # Plotting
     fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 8))
@@ -58,44 +44,16 @@ def generate_graphs(velocity_left, velocity_right, label_prefix, save_name):
     plt.show()
 
 
-def generate_real_graph(velocity_left, velocity_right, label_prefix, save_name):
+@staged("plot", rows="num_samples")
+def generate_real_graph(velocity_left, velocity_right, label_prefix, save_name, num_samples=1000):
     """
     Generates a more realistic graph with interpolated velocity during collision.
     """
+    import matplotlib.pyplot as plt
 
-    # Constants
-    initial_position = 150  # cm
-    time_to_hit_bumper = initial_position / abs(velocity_left)
-    total_time = 2 * time_to_hit_bumper
-
-    # Time array
-    times = np.linspace(0, total_time, 1000)
-
-    # Displacement and velocity arrays
-    displacements = []
-    velocities = []
-
-    # Define a small time window for interpolation around the collision
-    interpolation_window = 0.05 * time_to_hit_bumper  # 5% of the time to hit the bumper
-
-    midpoint_velocity = (velocity_left + velocity_right) / 2
-
-    for t in times:
-        if t < time_to_hit_bumper - interpolation_window:
-            # Moving left before approaching the bumper
-            displacements.append(initial_position + velocity_left * t)
-            velocities.append(velocity_left)
-        elif t < time_to_hit_bumper + interpolation_window:
-            # Using the midpoint velocity during the interpolation window
-            displacements.append(displacements[-1] + midpoint_velocity * (times[1] - times[0]))
-            velocities.append(midpoint_velocity)
-        else:
-            # Moving right after bouncing
-            time_after_bounce = t - (time_to_hit_bumper + interpolation_window)
-            displacements.append(
-                displacements[-1] + velocity_right * (times[1] - times[0])
-            )
-            velocities.append(velocity_right)
+    # Displacement and velocity arrays, using the midpoint velocity in a small
+    # window around the collision (5% of the time to hit the bumper)
+    times, displacements, velocities = real_trajectory(velocity_left, velocity_right, num_samples)
 
     # Plotting
     fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 8))
@@ -123,18 +81,32 @@ def generate_real_graph(velocity_left, velocity_right, label_prefix, save_name):
     plt.savefig(f"{directory}{save_name}.png")
     plt.show()
 
-# Create the directory if it doesn't exist
-directory = "experiment1/figures/"
-if not os.path.exists(directory):
-    os.makedirs(directory)
 
-# Ideal data
-generate_graphs(-0.5, 0.5, "Ideal", "ideal_velocity_acceleration_graph")
+@staged("load")
+def average_velocities(filename="experiment1/data.csv"):
+    """Return the average final and initial velocities of the recorded trials."""
+    import pandas as pd
+
+    data = pd.read_csv(filename)
+    return data['v final'].mean(), data['v initial'].mean()
+
+
+def main(plot=True):
+    # Real data from CSV
+    v_final_average, v_initial_average = average_velocities()
+    if not plot:
+        return v_final_average, v_initial_average
+
+    # Create the directory if it doesn't exist
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    # Ideal data
+    generate_graphs(-0.5, 0.5, "Ideal", "ideal_velocity_acceleration_graph")
 
+    generate_real_graph(v_final_average, v_initial_average, "Real", "real_velocity_acceleration_graph")
+    return v_final_average, v_initial_average
 
-# Real data from CSV
-data = pd.read_csv("experiment1/data.csv")
-v_final_average = data['v final'].mean()
-v_initial_average = data['v initial'].mean()
 
-generate_real_graph(v_final_average, v_initial_average, "Real", "real_velocity_acceleration_graph")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
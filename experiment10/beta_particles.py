@@ -1,5 +1,9 @@
 import numpy as np
-import matplotlib.pyplot as plt
+
+from phys1494.grouped import grouped_mean_std
+from phys1494.instrument import stage, staged
+
+from attenuation_fit import fit_attenuation
 
 # Background radiation correction (counts per minute)
 background_count_rate = 46.6 # per minute
@@ -24,40 +28,80 @@ data = np.array([
     [0.07112, 58, 30], [0.07112, 56, 30], [0.07112, 50, 30]
 ])
 
-# Calculating average counts and standard deviation for each thickness
-unique_thicknesses = np.unique(data[:, 0])
-avg_counts = []
-std_devs = []
-
-for thickness in unique_thicknesses:
-    counts_at_thickness = data[data[:, 0] == thickness, 1]
-    avg_counts.append(np.mean(counts_at_thickness))
-    std_devs.append(np.std(counts_at_thickness))
-
-# Correcting for background radiation and converting to counts per minute
-corrected_counts = [(count - background_count_rate * (time / 60)) * (60 / time) for count, time in zip(avg_counts, data[:, 2])]
-corrected_errors = [std_dev * (60 / time) for std_dev, time in zip(std_devs, data[:, 2])]
-
-# Plotting Corrected Count Rate vs. Aluminum Absorber Thickness with error bars
-plt.figure(figsize=(10, 6))
-plt.errorbar(unique_thicknesses, corrected_counts, yerr=corrected_errors, fmt='o', linestyle='-', color='b')
-plt.title('Beta Particle Attenuation in Aluminum Absorbers')
-plt.xlabel('Absorber Thickness (cm)')
-plt.ylabel('Corrected Count Rate (counts/minute)')
-plt.grid(True)
-plt.show()
-
-# Estimate Maximum Beta Energy
+# Aluminum density and the expected maximum energy for Thallium-204
 density_Al = 2.702  # g/cm^3
-range_max = unique_thicknesses[-1]  # Maximum range from the graph
-energy_max = ((range_max / (0.412 * density_Al)) ** (1/1.29))  # MeV
-
-# Expected value and standard deviation of maximum energy for Thallium-204
 expected_energy = 0.765  # MeV
-energy_std_dev = np.std([(range_val / (0.412 * density_Al)) ** (1/1.29) for range_val in unique_thicknesses])
 
-# Calculate the number of standard deviations away from the expected value
-num_std_devs = (energy_max - expected_energy) / energy_std_dev
 
-print(f"Estimated Maximum Energy of Beta Particles: {energy_max:.3f} MeV")
-print(f"Number of standard deviations from expected value: {num_std_devs:.2f}")
\ No newline at end of file
+def analyze(data=data, background_count_rate=background_count_rate):
+    """
+    Background-corrected count rates per thickness, the maximum beta energy
+    estimate and the maximum-likelihood absorption coefficient.
+
+    data holds [thickness, count, time] rows, as does
+    RateMonitor.attenuation_data() in geiger_stream.py, whose
+    background_count_rate can be passed along with it.
+    """
+    # Calculating average counts and standard deviation for each thickness
+    with stage("transform", rows=len(data), function="grouped_mean_std"):
+        count_stats = grouped_mean_std(data[:, 0], data[:, 1])
+    unique_thicknesses = count_stats.keys
+    avg_counts = count_stats.mean
+    std_devs = count_stats.std
+
+    # Correcting for background radiation and converting to counts per minute
+    corrected_counts = [(count - background_count_rate * (time / 60)) * (60 / time) for count, time in zip(avg_counts, data[:, 2])]
+    corrected_errors = [std_dev * (60 / time) for std_dev, time in zip(std_devs, data[:, 2])]
+
+    # Estimate Maximum Beta Energy
+    range_max = unique_thicknesses[-1]  # Maximum range from the graph
+    energy_max = ((range_max / (0.412 * density_Al)) ** (1/1.29))  # MeV
+
+    # Standard deviation of maximum energy
+    energy_std_dev = np.std([(range_val / (0.412 * density_Al)) ** (1/1.29) for range_val in unique_thicknesses])
+
+    # Calculate the number of standard deviations away from the expected value
+    num_std_devs = (energy_max - expected_energy) / energy_std_dev
+
+    # Poisson maximum-likelihood fit to every trial, background in counts/second
+    with stage("fit", rows=len(data), function="fit_attenuation"):
+        fit = fit_attenuation(data[:, 0], data[:, 1], data[:, 2], background_count_rate / 60)
+
+    return {
+        'thicknesses': unique_thicknesses,
+        'corrected_counts': corrected_counts,
+        'corrected_errors': corrected_errors,
+        'energy_max': energy_max,
+        'num_std_devs': num_std_devs,
+        'fit': fit,
+    }
+
+
+@staged("plot")
+def plot_results(results):
+    import matplotlib.pyplot as plt
+
+    # Plotting Corrected Count Rate vs. Aluminum Absorber Thickness with error bars
+    plt.figure(figsize=(10, 6))
+    plt.errorbar(results['thicknesses'], results['corrected_counts'], yerr=results['corrected_errors'], fmt='o', linestyle='-', color='b')
+    plt.title('Beta Particle Attenuation in Aluminum Absorbers')
+    plt.xlabel('Absorber Thickness (cm)')
+    plt.ylabel('Corrected Count Rate (counts/minute)')
+    plt.grid(True)
+    plt.show()
+
+
+def main(plot=True):
+    results = analyze()
+    if plot:
+        plot_results(results)
+
+    fit = results['fit']
+    print(f"Estimated Maximum Energy of Beta Particles: {results['energy_max']:.3f} MeV")
+    print(f"Number of standard deviations from expected value: {results['num_std_devs']:.2f}")
+    print(f"Maximum-likelihood absorption coefficient: {fit.mu[0]:.1f} ± {fit.mu_err[0]:.1f} cm^-1")
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,10 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.stats import linregress
+
+from phys1494.fitcache import linregress
+from phys1494.grouped import grouped_mean_std
+from phys1494.instrument import stage, staged
+
+from attenuation_fit import fit_attenuation
 
 # Gamma particle data
 data = np.array([
@@ -13,36 +17,63 @@ data = np.array([
 ])
 
 
-# Group data by thickness and calculate average count rate and its standard deviation
-unique_thicknesses = np.unique(data[:, 1])
-avg_ln_counts = []
-std_devs = []
-
-for thickness in unique_thicknesses:
-    counts_at_thickness = data[data[:, 1] == thickness, 2]
-    corrected_counts = counts_at_thickness / data[data[:, 1] == thickness, 3]  # Correct for time
-    ln_corrected_counts = np.log(corrected_counts)
-    avg_ln_counts.append(np.mean(ln_corrected_counts))
-    std_devs.append(np.std(ln_corrected_counts))
-
-# Convert lists to numpy arrays for plotting
-avg_ln_counts = np.array(avg_ln_counts)
-std_devs = np.array(std_devs)
-
-# Linear regression on the averaged data
-slope, intercept, _, _, std_err = linregress(unique_thicknesses, avg_ln_counts)
-
-# Plotting with error bars
-plt.figure(figsize=(10, 6))
-plt.errorbar(unique_thicknesses, avg_ln_counts, yerr=std_devs, fmt='o', linestyle='', color='b', label='Averaged Data')
-plt.plot(unique_thicknesses, slope * unique_thicknesses + intercept, color='r', label='Line of Best Fit')  # Line of best fit
-plt.title('Logarithmic Analysis of Gamma Ray Attenuation in Lead')
-plt.xlabel('Lead Absorber Thickness (cm)')
-plt.ylabel('Ln(Count Rate)')
-plt.legend()
-plt.grid(True)
-plt.show()
-
-# Absorption coefficient (μ) is the negative of the slope
-absorption_coefficient = -slope
-print(f"Linear Absorption Coefficient (μ): {absorption_coefficient:.3f} cm^-1")
+def analyze(data=data):
+    """
+    Average ln(count rate) per thickness with the line fitted through it, and
+    the maximum-likelihood fit to every trial.
+    """
+    # Group data by thickness and calculate average ln(count rate) and its standard deviation
+    with stage("transform", rows=len(data), function="grouped_mean_std"):
+        ln_rates = grouped_mean_std(data[:, 1], np.log(data[:, 2] / data[:, 3]))  # Correct for time
+
+    # Linear regression on the averaged data
+    slope, intercept, _, _, std_err = linregress(ln_rates.keys, ln_rates.mean)
+
+    # Poisson maximum-likelihood fit to every trial
+    with stage("fit", rows=len(data), function="fit_attenuation"):
+        fit = fit_attenuation(data[:, 1], data[:, 2], data[:, 3])
+
+    return {
+        'thicknesses': ln_rates.keys,
+        'avg_ln_counts': ln_rates.mean,
+        'std_devs': ln_rates.std,
+        'slope': slope,
+        'intercept': intercept,
+        'std_err': std_err,
+        # Absorption coefficient (μ) is the negative of the slope
+        'absorption_coefficient': -slope,
+        'fit': fit,
+    }
+
+
+@staged("plot")
+def plot_results(results):
+    import matplotlib.pyplot as plt
+
+    unique_thicknesses = results['thicknesses']
+
+    # Plotting with error bars
+    plt.figure(figsize=(10, 6))
+    plt.errorbar(unique_thicknesses, results['avg_ln_counts'], yerr=results['std_devs'], fmt='o', linestyle='', color='b', label='Averaged Data')
+    plt.plot(unique_thicknesses, results['slope'] * unique_thicknesses + results['intercept'], color='r', label='Line of Best Fit')  # Line of best fit
+    plt.title('Logarithmic Analysis of Gamma Ray Attenuation in Lead')
+    plt.xlabel('Lead Absorber Thickness (cm)')
+    plt.ylabel('Ln(Count Rate)')
+    plt.legend()
+    plt.grid(True)
+    plt.show()
+
+
+def main(plot=True):
+    results = analyze()
+    if plot:
+        plot_results(results)
+
+    fit = results['fit']
+    print(f"Linear Absorption Coefficient (μ): {results['absorption_coefficient']:.3f} cm^-1")
+    print(f"Maximum-likelihood μ: {fit.mu[0]:.3f} ± {fit.mu_err[0]:.3f} cm^-1")
+    return results
+
+
+if __name__ == '__main__':
+    main()
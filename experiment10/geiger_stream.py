@@ -0,0 +1,290 @@
+"""
+Streaming ingestion of Geiger counter events.
+
+The detector (or anything standing in for it: a pipe, a FIFO, a TCP or Unix
+socket) writes one ASCII line per event holding its timestamp in seconds.
+Control lines start with '#', followed by a timestamp and a command:
+
+    #<t> background            source removed, counts estimate the background
+    #<t> absorber <thickness>  source in place behind <thickness> cm
+    #<t> stop                  end of the current counting interval
+
+Events are parsed a chunk at a time into NumPy arrays and folded into a
+RateMonitor, which keeps the rolling count rate in a ring buffer of time
+bins, updates the background rate online from the background intervals and
+records every absorber interval as a [thickness, count, time] row, the layout
+of the data array in beta_particles.py. analyze_source runs the beta count
+rate analysis of beta_particles.py on those rows once the stream ends, with
+the background measured in the stream.
+
+Usage:
+
+    python experiment10/geiger_stream.py tcp://host:port | unix:///path | FILE
+"""
+import asyncio
+import os
+import stat
+import sys
+
+import numpy as np
+
+CHUNK_SIZE = 1 << 16
+
+
+class RateMonitor:
+    def __init__(self, bin_width=1.0, window=60.0):
+        """
+        Initialize a monitor whose rolling rate covers the last window
+        seconds in bins of bin_width seconds.
+        """
+        self.bin_width = bin_width
+        n_bins = max(1, int(round(window / bin_width)))
+        self.bins = np.zeros(n_bins, dtype=np.int64)
+        self.first_bin = None
+        self.current_bin = None
+        self.total_events = 0
+        self.last_time = None
+
+        self.state = None  # None, 'background' or the absorber thickness
+        self.interval_start = None
+        self.interval_counts = 0
+        self.background_counts = 0
+        self.background_time = 0.0
+        self.rows = []
+
+    def add_events(self, timestamps):
+        """Fold a time-ordered array of event timestamps into the monitor."""
+        timestamps = np.asarray(timestamps, dtype=float)
+        if timestamps.size == 0:
+            return
+        n = len(self.bins)
+        bins = np.floor(timestamps / self.bin_width).astype(np.int64)
+        newest = int(bins[-1])
+
+        if self.current_bin is None:
+            self.first_bin = self.current_bin = int(bins[0])
+        # Clear the ring slots the window has moved past
+        if newest - self.current_bin >= n:
+            self.bins[:] = 0
+        elif newest > self.current_bin:
+            self.bins[np.arange(self.current_bin + 1, newest + 1) % n] = 0
+        self.current_bin = max(self.current_bin, newest)
+
+        recent = bins[bins > self.current_bin - n]
+        self.bins += np.bincount(recent % n, minlength=n)
+
+        self.total_events += timestamps.size
+        self.interval_counts += timestamps.size
+        self.last_time = float(timestamps[-1])
+
+    def control(self, time, command, argument=None):
+        """Apply a control line: close the open interval and start the next."""
+        self._close_interval(time)
+        if command == 'background':
+            self.state = 'background'
+        elif command == 'absorber':
+            self.state = float(argument)
+        elif command == 'stop':
+            self.state = None
+        else:
+            raise ValueError(f'unknown control command {command!r}')
+        self.interval_start = time
+        self.interval_counts = 0
+        self.last_time = time
+
+    def _close_interval(self, time):
+        if self.state is None or self.interval_start is None:
+            return
+        duration = time - self.interval_start
+        if self.state == 'background':
+            self.background_counts += self.interval_counts
+            self.background_time += duration
+        else:
+            self.rows.append([self.state, self.interval_counts, duration])
+
+    @property
+    def rate(self):
+        """Rolling count rate (counts/s) over the window."""
+        if self.current_bin is None:
+            return 0.0
+        covered = min(len(self.bins), self.current_bin - self.first_bin + 1)
+        return self.bins.sum() / (covered * self.bin_width)
+
+    def background(self):
+        """
+        Return the background rate and its Poisson uncertainty in counts/s,
+        including the background interval still being counted.
+        """
+        counts = self.background_counts
+        time = self.background_time
+        if self.state == 'background' and self.last_time is not None:
+            counts += self.interval_counts
+            time += self.last_time - self.interval_start
+        if time <= 0:
+            return np.nan, np.nan
+        return counts / time, np.sqrt(counts) / time
+
+    @property
+    def background_count_rate(self):
+        """Background rate in counts per minute, as used in beta_particles.py."""
+        return self.background()[0] * 60
+
+    @property
+    def corrected_rate(self):
+        """Rolling count rate minus the current background estimate (counts/s)."""
+        background = self.background()[0]
+        return self.rate - (0.0 if np.isnan(background) else background)
+
+    def attenuation_data(self):
+        """Completed absorber intervals as an array of [thickness, count, time]."""
+        return np.array(self.rows, dtype=float).reshape(-1, 3)
+
+
+def parse_chunk(chunk):
+    """
+    Split a chunk of complete lines into a list of items, each either an
+    array of event timestamps or a (time, command, argument) control tuple.
+    """
+    if b'#' not in chunk:
+        return [np.array(chunk.split(), dtype=float)]
+
+    # Every block after the first starts with a control line
+    leading, *blocks = (b'\n' + chunk).split(b'\n#')
+    items = [np.array(leading.split(), dtype=float)] if leading.strip() else []
+    for block in blocks:
+        head, _, events = block.partition(b'\n')
+        fields = head.decode().split()
+        argument = fields[2] if len(fields) > 2 else None
+        items.append((float(fields[0]), fields[1], argument))
+        if events.strip():
+            items.append(np.array(events.split(), dtype=float))
+    return items
+
+
+async def read_items(reader, chunk_size=CHUNK_SIZE):
+    """Yield parsed items from reader until end of stream."""
+    pending = b''
+    while True:
+        data = await reader.read(chunk_size)
+        if not data:
+            break
+        complete, newline, pending = (pending + data).rpartition(b'\n')
+        if newline:
+            for item in parse_chunk(complete):
+                yield item
+    if pending.strip():
+        for item in parse_chunk(pending):
+            yield item
+
+
+async def ingest(reader, monitor, on_update=None):
+    """
+    Feed every event and control line from reader into monitor, calling
+    on_update(monitor) after each parsed item.
+    """
+    async for item in read_items(reader):
+        if isinstance(item, tuple):
+            monitor.control(*item)
+        else:
+            monitor.add_events(item)
+        if on_update is not None:
+            on_update(monitor)
+    return monitor
+
+
+class FileReader:
+    def __init__(self, path):
+        """
+        Read a regular file in a worker thread. Regular files cannot be
+        attached to the event loop like pipes and sockets can, but this has
+        the read() coroutine of an asyncio.StreamReader.
+        """
+        self.file = open(path, 'rb')
+
+    async def read(self, n=-1):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.file.read, n)
+
+    def close(self):
+        self.file.close()
+
+
+async def open_stream(source):
+    """
+    Open a tcp://host:port or unix:///path socket, or a file or pipe path.
+
+    Returns a reader with an asyncio.StreamReader read() coroutine and the
+    object to close once reading is done. The socket writer has to be kept
+    until then, since a collected StreamWriter closes its connection.
+    """
+    if source.startswith('tcp://'):
+        host, _, port = source[len('tcp://'):].rpartition(':')
+        return await asyncio.open_connection(host, int(port))
+    if source.startswith('unix://'):
+        return await asyncio.open_unix_connection(source[len('unix://'):])
+    if stat.S_ISREG(os.stat(source).st_mode):
+        reader = FileReader(source)
+        return reader, reader
+
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    transport, _ = await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader),
+        open(source, 'rb', buffering=0),
+    )
+    return reader, transport
+
+
+async def monitor_source(source, bin_width=1.0, window=60.0, on_update=None):
+    """Open source and ingest it to the end into a new RateMonitor."""
+    reader, closer = await open_stream(source)
+    try:
+        return await ingest(reader, RateMonitor(bin_width, window), on_update)
+    finally:
+        closer.close()
+
+
+async def analyze_source(source, bin_width=1.0, window=60.0, on_update=None):
+    """
+    Ingest source to the end and run beta_particles.analyze on its absorber
+    intervals, with the background rate of its background intervals (or the
+    recorded background of beta_particles.py if it had none). Returns the
+    RateMonitor and the analysis results, which are None without any
+    absorber interval.
+    """
+    import beta_particles
+
+    monitor = await monitor_source(source, bin_width, window, on_update)
+    data = monitor.attenuation_data()
+    if len(data) == 0:
+        return monitor, None
+    background_count_rate = monitor.background_count_rate
+    if np.isnan(background_count_rate):
+        background_count_rate = beta_particles.background_count_rate
+    return monitor, beta_particles.analyze(data, background_count_rate)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        print(__doc__)
+        return 2
+
+    def report(monitor):
+        print(f'\rrate: {monitor.rate * 60:8.1f} cpm   '
+              f'corrected: {monitor.corrected_rate * 60:8.1f} cpm', end='')
+
+    monitor, results = asyncio.run(analyze_source(argv[0], on_update=report))
+    rate, error = monitor.background()
+    print(f'\nBackground: {rate * 60:.1f} ± {error * 60:.1f} counts/minute')
+    print('Thickness (cm), Count, Time (s):')
+    print(monitor.attenuation_data())
+    if results is not None:
+        fit = results['fit']
+        print(f"Absorption coefficient: {fit.mu[0]:.3f} ± {fit.mu_err[0]:.3f} 1/cm")
+        print(f"Maximum beta energy: {results['energy_max']:.3f} MeV")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
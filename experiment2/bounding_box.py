@@ -1,15 +1,140 @@
+import numpy as np
+
+
+class BoundingBoxSet:
+    def __init__(self, x_min, y_max, x_max, y_min, num_points):
+        # Store the corners and point counts of every box as contiguous arrays
+        self.x_min = np.asarray(x_min, dtype=float)
+        self.y_max = np.asarray(y_max, dtype=float)
+        self.x_max = np.asarray(x_max, dtype=float)
+        self.y_min = np.asarray(y_min, dtype=float)
+        self.num_points = np.asarray(num_points, dtype=np.int64)
+
+    @classmethod
+    def from_corners(cls, top_left, bottom_right, num_points):
+        """Build a set from sequences of (x, y) top-left and bottom-right corners."""
+        top_left = np.asarray(top_left, dtype=float).reshape(-1, 2)
+        bottom_right = np.asarray(bottom_right, dtype=float).reshape(-1, 2)
+        return cls(
+            top_left[:, 0],
+            top_left[:, 1],
+            bottom_right[:, 0],
+            bottom_right[:, 1],
+            num_points,
+        )
+
+    def __len__(self):
+        return len(self.x_min)
+
+    def __getitem__(self, index):
+        """Return a BoundingBox view of one box, or a BoundingBoxSet of several."""
+        if isinstance(index, (int, np.integer)):
+            return BoundingBox.view(self, range(len(self))[index])
+        return BoundingBoxSet(
+            self.x_min[index],
+            self.y_max[index],
+            self.x_max[index],
+            self.y_min[index],
+            self.num_points[index],
+        )
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield BoundingBox.view(self, index)
+
+    @property
+    def width(self):
+        """Return the width of every bounding box."""
+        return self.x_max - self.x_min
+
+    @property
+    def height(self):
+        """Return the height of every bounding box."""
+        return self.y_max - self.y_min
+
+    @property
+    def area(self):
+        """Return the area of every bounding box."""
+        return self.width * self.height
+
+    @property
+    def density(self):
+        """Return the density of points in every bounding box; inf with no area."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.num_points / self.area
+
+    @property
+    def mean(self):
+        """Estimate the mean coordinates of the points in every box as (x, y) arrays."""
+        mean_x = (self.x_min + self.x_max) / 2
+        mean_y = (self.y_min + self.y_max) / 2
+        return mean_x, mean_y
+
+    @property
+    def std_dev(self):
+        """Estimate the standard deviations in x and y of every box as (x, y) arrays."""
+        std_dev_x = self.width / (12 ** 0.5)
+        std_dev_y = self.height / (12 ** 0.5)
+        return std_dev_x, std_dev_y
+
+    def statistics(self):
+        """
+        Return every derived statistic of every box as a dict of arrays; the
+        density of a box with no area is inf.
+        """
+        mean_x, mean_y = self.mean
+        std_dev_x, std_dev_y = self.std_dev
+        return {
+            "width": self.width,
+            "height": self.height,
+            "area": self.area,
+            "density": self.density,
+            "mean_x": mean_x,
+            "mean_y": mean_y,
+            "std_dev_x": std_dev_x,
+            "std_dev_y": std_dev_y,
+        }
+
+
+def _field(name):
+    """Property reading and writing one entry of a BoundingBoxSet array."""
+
+    def get(self):
+        return getattr(self._set, name)[self._index]
+
+    def set(self, value):
+        getattr(self._set, name)[self._index] = value
+
+    return property(get, set)
+
+
 class BoundingBox:
+    __slots__ = ("_set", "_index")
+
     def __init__(self, top_left, bottom_right, num_points):
         # Initialize the bounding box corners and the number of points
-        self.x_min, self.y_max = top_left
-        self.x_max, self.y_min = bottom_right
-        self.num_points = num_points
+        self._set = BoundingBoxSet.from_corners(top_left, bottom_right, [num_points])
+        self._index = 0
+
+    @classmethod
+    def view(cls, box_set, index):
+        """Return a BoundingBox reading box index of box_set, without copying."""
+        box = cls.__new__(cls)
+        box._set = box_set
+        box._index = index
+        return box
+
+    x_min = _field("x_min")
+    y_max = _field("y_max")
+    x_max = _field("x_max")
+    y_min = _field("y_min")
+    num_points = _field("num_points")
 
     @property
     def width(self):
         """Return the width of the bounding box."""
         return self.x_max - self.x_min
-    
+
     @property
     def height(self):
         """Return the height of the bounding box."""
@@ -22,8 +147,9 @@ class BoundingBox:
 
     @property
     def density(self):
-        """Return the density of points in the bounding box."""
-        return self.num_points / self.area
+        """Return the density of points in the bounding box; inf with no area."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.num_points / self.area
 
     @property
     def mean(self):
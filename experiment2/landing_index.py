@@ -0,0 +1,185 @@
+"""
+Uniform-grid spatial index for raw landing coordinates.
+
+Points are bucketed into square cells and sorted by cell once, so every cell
+is a contiguous slice of the sorted points found with one searchsorted. A
+radius query only visits the cells overlapping the circle's bounding square,
+which keeps it close to linear in the number of points instead of the
+pairwise scan. Per-trial statistics are np.bincount reductions, and the
+bounding-box summaries used by run_bouding_box_analysis.py are derived from
+the per-trial extents.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from bounding_box import BoundingBoxSet
+
+DEFAULT_QUERY_CHUNK = 1 << 16
+
+ClusterStats = namedtuple(
+    'ClusterStats',
+    ['trials', 'count', 'mean_x', 'mean_y', 'std_x', 'std_y', 'cov_xy', 'radius'],
+)
+
+
+class LandingIndex:
+    def __init__(self, x, y, trial=None, cell_size=None):
+        """
+        Index the hits (x, y), each labelled with the trial it belongs to (all
+        one trial when omitted). cell_size defaults to a width giving a few
+        points per occupied cell. Without hits the grid has no cells: maps
+        are empty, counts zero and there are no trials.
+        """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        if trial is None:
+            trial = np.zeros(len(x), dtype=np.intp)
+        self.trials, self.trial_index = np.unique(trial, return_inverse=True)
+        self.trial_index = self.trial_index.ravel()
+
+        if len(x) == 0:
+            # No hits: a grid without cells, so maps are empty and counts zero
+            self.origin = np.zeros(2)
+            self.cell_size = 1.0 if cell_size is None else float(cell_size)
+            self.shape = (0, 0)
+        else:
+            self.origin = np.array([x.min(), y.min()])
+            extent = max(x.max() - x.min(), y.max() - y.min(), 1e-12)
+            if cell_size is None:
+                cell_size = extent * np.sqrt(4 / len(x))
+            self.cell_size = float(cell_size)
+            self.shape = (
+                int(np.floor((x.max() - self.origin[0]) / self.cell_size)) + 1,
+                int(np.floor((y.max() - self.origin[1]) / self.cell_size)) + 1,
+            )
+
+        cells = self._cell_ids(*self._cell_coords(x, y))
+        self.order = np.argsort(cells, kind='stable')
+        self.cells = cells[self.order]
+        self.x = x[self.order]
+        self.y = y[self.order]
+
+    def __len__(self):
+        return len(self.x)
+
+    def _cell_coords(self, x, y):
+        ix = np.floor((x - self.origin[0]) / self.cell_size).astype(np.int64)
+        iy = np.floor((y - self.origin[1]) / self.cell_size).astype(np.int64)
+        return ix, iy
+
+    def _cell_ids(self, ix, iy):
+        return ix * self.shape[1] + iy
+
+    def density_map(self, trial=None):
+        """
+        Points per unit area in every cell, as an array of shape self.shape
+        indexed [x cell, y cell]; only the points of one trial if given.
+        """
+        cells = self.cells
+        if trial is not None:
+            label = np.searchsorted(self.trials, trial)
+            cells = cells[self.trial_index[self.order] == label]
+        counts = np.bincount(cells, minlength=self.shape[0] * self.shape[1])
+        return counts.reshape(self.shape) / self.cell_size**2
+
+    def radius_count(self, cx, cy, radius, chunk_size=DEFAULT_QUERY_CHUNK):
+        """
+        Number of indexed points within radius of every query point (cx, cy).
+        Queries are processed in batches that compare at most chunk_size
+        candidate points each (or one query's candidates), to bound memory.
+        """
+        cx = np.atleast_1d(np.asarray(cx, dtype=float))
+        cy = np.atleast_1d(np.asarray(cy, dtype=float))
+        reach = int(np.ceil(radius / self.cell_size))
+        offsets = np.arange(-reach, reach + 1)
+        counts = np.zeros(len(cx), dtype=np.int64)
+
+        for start in range(0, len(cx), chunk_size):
+            qx = cx[start:start + chunk_size]
+            qy = cy[start:start + chunk_size]
+            ix, iy = self._cell_coords(qx, qy)
+
+            # Candidate cells of every query, dropping those off the grid
+            cell_x = (ix[:, None] + offsets[None, :])[:, :, None]
+            cell_y = (iy[:, None] + offsets[None, :])[:, None, :]
+            inside = (
+                (cell_x >= 0)
+                & (cell_x < self.shape[0])
+                & (cell_y >= 0)
+                & (cell_y < self.shape[1])
+            )
+            query = np.nonzero(inside)[0]
+            cell_x, cell_y = np.broadcast_arrays(cell_x, cell_y)
+            cells = self._cell_ids(cell_x, cell_y)[inside]
+            begin = np.searchsorted(self.cells, cells, side='left')
+            lengths = np.searchsorted(self.cells, cells, side='right') - begin
+
+            # Batches of whole queries holding about chunk_size candidate
+            # points; query is sorted, so every batch is a slice of cells
+            per_query = np.bincount(query, weights=lengths, minlength=len(qx))
+            batch = (np.cumsum(per_query) // chunk_size).astype(np.int64)[query]
+            bounds = np.concatenate(
+                ([0], np.flatnonzero(np.diff(batch)) + 1, [len(cells)])
+            )
+
+            for lo, hi in zip(bounds[:-1], bounds[1:]):
+                # Expand each cell's slice of the sorted points into indices
+                part = lengths[lo:hi]
+                point_query = np.repeat(query[lo:hi], part)
+                first = np.repeat(begin[lo:hi] - np.cumsum(part) + part, part)
+                points = first + np.arange(part.sum())
+
+                dx = self.x[points] - qx[point_query]
+                dy = self.y[points] - qy[point_query]
+                within = dx * dx + dy * dy <= radius * radius
+                counts[start:start + len(qx)] += np.bincount(
+                    point_query[within], minlength=len(qx)
+                )
+        return counts
+
+    def cluster_statistics(self):
+        """
+        Count, mean, standard deviation, x-y covariance and RMS distance from
+        the mean of the hits of every trial, ordered like self.trials.
+        """
+        label = self.trial_index[self.order]
+        n_trials = len(self.trials)
+
+        def trial_sum(values):
+            return np.bincount(label, weights=values, minlength=n_trials)
+
+        count = np.bincount(label, minlength=n_trials)
+        mean_x = trial_sum(self.x) / count
+        mean_y = trial_sum(self.y) / count
+        dx = self.x - mean_x[label]
+        dy = self.y - mean_y[label]
+        var_x = trial_sum(dx * dx) / count
+        var_y = trial_sum(dy * dy) / count
+        cov_xy = trial_sum(dx * dy) / count
+        return ClusterStats(
+            self.trials,
+            count,
+            mean_x,
+            mean_y,
+            np.sqrt(var_x),
+            np.sqrt(var_y),
+            cov_xy,
+            np.sqrt(var_x + var_y),
+        )
+
+    def bounding_boxes(self):
+        """BoundingBoxSet of the extent and hit count of every trial."""
+        label = self.trial_index[self.order]
+        n_trials = len(self.trials)
+        x_min = np.full(n_trials, np.inf)
+        x_max = np.full(n_trials, -np.inf)
+        y_min = np.full(n_trials, np.inf)
+        y_max = np.full(n_trials, -np.inf)
+        np.minimum.at(x_min, label, self.x)
+        np.maximum.at(x_max, label, self.x)
+        np.minimum.at(y_min, label, self.y)
+        np.maximum.at(y_max, label, self.y)
+        return BoundingBoxSet(
+            x_min, y_max, x_max, y_min, np.bincount(label, minlength=n_trials)
+        )
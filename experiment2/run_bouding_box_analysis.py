@@ -1,7 +1,9 @@
 import numpy as np
-import matplotlib.pyplot as plt
 
-from bounding_box import BoundingBox
+from phys1494.instrument import staged
+from phys1494.montecarlo import propagate
+
+from bounding_box import BoundingBoxSet
 
 g = 9.81  # Acceleration due to gravity (m/s^2)
 
@@ -44,80 +46,133 @@ provided_data = {
     'Trial 2 (plastic)': {'h1': 1.334, 'h2': 1.114, 'h3': 1.086, 'D': 0.287, 'L': 0.292, 'v0': 1.3856, 'x_lab_manual': 0.6677}
 }
 
-# Calculate expected x and its uncertainty
-expected_x = {}
-for trial, data in provided_data.items():
-    h1 = data['h1']
-    h2 = data['h2']
-    h3 = data['h3']
-    D = data['D']
-    L = data['L']
-    v0 = data['v0']
-    
-    x = v0 * (D / L) * (v0 - (h2 - h3) / L + np.sqrt(((v0 - (h2 - h3)) / L)**2 + 2 * g * h2))
-    expected_x[trial] = x
-
-# Analyze each trial
-results = {}
-
-for trial, data in trials.items():
-    # Calculate mean and std dev for radial measurements
-    radial_mean = np.mean(data["Radial measurements"])
-    radial_std_dev = np.std(data["Radial measurements"])
-
-    # Calculate bounding box mean and std dev
-    bbox = BoundingBox(data["Bounding Box"]["corners"][0], data["Bounding Box"]["corners"][2], data["Bounding Box"]["points"])
-    bbox_mean = bbox.mean
-    bbox_std_dev = bbox.std_dev
+# Assumed measurement resolution of the inputs to expected x
+length_uncertainty = 0.001  # m
+v0_uncertainty = 0.0001  # m/s
+
+x_lab_manual = [35.12317744, 63.69481605, 57.62550324, 66.77425112]
+x_degree_estimate = [29.61330724, 32.31506849, 31.92818004, 32.45342466]
+
+
+def expected_x_model(h1, h2, h3, D, L, v0):
+    return v0 * (D / L) * (v0 - (h2 - h3) / L + np.sqrt(((v0 - (h2 - h3)) / L)**2 + 2 * g * h2))
+
+
+@staged("transform", rows="n_samples")
+def expected_positions(provided_data=provided_data, n_samples=100_000, seed=0):
+    """
+    Calculate expected x and its uncertainty by Monte Carlo propagation for
+    every trial, returned as two dicts keyed by trial.
+    """
+    expected_x = {}
+    expected_x_uncertainty = {}
+    for trial, data in provided_data.items():
+        inputs = {name: (data[name], length_uncertainty) for name in ('h1', 'h2', 'h3', 'D', 'L')}
+        inputs['v0'] = (data['v0'], v0_uncertainty)
+
+        x = expected_x_model(**{name: spec[0] for name, spec in inputs.items()})
+        result = propagate(expected_x_model, inputs, n_samples=n_samples, seed=seed)
+        expected_x[trial] = x
+        expected_x_uncertainty[trial] = result.std
+    return expected_x, expected_x_uncertainty
+
+
+@staged("transform", rows="trials")
+def bounding_boxes(trials=trials):
+    """Bounding boxes of all trials, one row per trial."""
+    return BoundingBoxSet.from_corners(
+        [data["Bounding Box"]["corners"][0] for data in trials.values()],
+        [data["Bounding Box"]["corners"][2] for data in trials.values()],
+        [data["Bounding Box"]["points"] for data in trials.values()],
+    )
+
+
+@staged("transform", rows="trials")
+def analyze_trials(trials=trials, boxes=None):
+    """
+    Return the overall mean position and standard deviation of every trial,
+    combining the radial measurements with the bounding box estimate.
+    """
+    if boxes is None:
+        boxes = bounding_boxes(trials)
+    bbox = boxes.statistics()
+
+    # Mean and std dev of the radial measurements of every trial, from the
+    # measurements of all trials in one array
+    radial = [data["Radial measurements"] for data in trials.values()]
+    radial_count = np.array([len(measurements) for measurements in radial])
+    values = np.concatenate(radial).astype(float)
+    starts = np.cumsum(radial_count) - radial_count
+    radial_sum = np.add.reduceat(values, starts)
+    radial_mean = radial_sum / radial_count
+    radial_var = np.add.reduceat((values - np.repeat(radial_mean, radial_count)) ** 2, starts) / radial_count
 
     # Calculate overall mean and std dev incorporating bounding box data
-    total_points = len(data["Radial measurements"]) + bbox.num_points
-    overall_mean_x = (np.sum(data["Radial measurements"]) + bbox.num_points * bbox_mean[0]) / total_points
-    overall_mean_y = (np.sum(data["Radial measurements"]) + bbox.num_points * bbox_mean[1]) / total_points
-    overall_std_dev_x = np.sqrt(((len(data["Radial measurements"]) - 1) * radial_std_dev**2 + bbox.num_points * bbox_std_dev[0]**2) / total_points)
-    overall_std_dev_y = np.sqrt(((len(data["Radial measurements"]) - 1) * radial_std_dev**2 + bbox.num_points * bbox_std_dev[1]**2) / total_points)
-
-    # Store results
-    results[trial] = {
-        "Mean Position": (overall_mean_x, overall_mean_y),
-        "Standard Deviation": (overall_std_dev_x, overall_std_dev_y)
+    total_points = radial_count + boxes.num_points
+    overall_mean_x = (radial_sum + boxes.num_points * bbox["mean_x"]) / total_points
+    overall_mean_y = (radial_sum + boxes.num_points * bbox["mean_y"]) / total_points
+    overall_std_dev_x = np.sqrt(((radial_count - 1) * radial_var + boxes.num_points * bbox["std_dev_x"]**2) / total_points)
+    overall_std_dev_y = np.sqrt(((radial_count - 1) * radial_var + boxes.num_points * bbox["std_dev_y"]**2) / total_points)
+
+    return {
+        trial: {
+            "Mean Position": (overall_mean_x[i], overall_mean_y[i]),
+            "Standard Deviation": (overall_std_dev_x[i], overall_std_dev_y[i]),
+        }
+        for i, trial in enumerate(trials)
     }
 
-output = ""
-x_lab_manual = [35.12317744, 63.69481605, 57.62550324, 66.77425112]
-x_degree_estimate = [29.61330724, 32.31506849, 31.92818004, 32.45342466]
-x_computed = [data["Mean Position"][1] for _, data in results.items()]
-differences_lab_manual = [computed - manual for computed, manual in zip(x_computed, x_lab_manual)]
-differences_degree_estimate = [computed - estimate for computed, estimate in zip(x_computed, x_degree_estimate)]
-
-trial_names = list(results.keys())
-mean_positions_x = [data["Mean Position"][0] for _, data in results.items()]
-mean_positions_z = [data["Mean Position"][1] for _, data in results.items()]
-std_devs_x = [data["Standard Deviation"][0] for _, data in results.items()]
-std_devs_z = [data["Standard Deviation"][1] for _, data in results.items()]
-
-fig, ax = plt.subplots(figsize=(12, 8))
-
-# For each trial
-for trial, data in trials.items():
-    # Extract all measurements
-    measurements = data["Radial measurements"]
-    
-    # For bounding box points, use the mean of the bounding box as the measurement
-    bbox = BoundingBox(data["Bounding Box"]["corners"][0], data["Bounding Box"]["corners"][2], data["Bounding Box"]["points"])
-    bbox_mean_x, bbox_mean_y = bbox.mean
-    measurements += [bbox_mean_x] * bbox.num_points  # Adding mean x value for each bounding box point
-    
-    # The y-error for each point will be the overall std dev of the trial
-    y_error = results[trial]["Standard Deviation"][0]
-    
-    # Plotting each point for the trial
-    ax.errorbar([trial] * len(measurements), measurements, yerr=y_error, fmt='o', capsize=5, elinewidth=1, label=f"{trial} measurements")
-
-ax.set_ylabel('Position (cm)')
-ax.set_title('Ball Landing Position with Standard Deviation')
-plt.xticks(rotation=45)
-plt.grid(True, which='both', linestyle='--', linewidth=0.5)
-ax.legend()
-plt.tight_layout()
-plt.show()
+
+def compare_positions(results):
+    """Differences of the computed positions from the manual and degree estimates."""
+    x_computed = [data["Mean Position"][1] for _, data in results.items()]
+    differences_lab_manual = [computed - manual for computed, manual in zip(x_computed, x_lab_manual)]
+    differences_degree_estimate = [computed - estimate for computed, estimate in zip(x_computed, x_degree_estimate)]
+    return differences_lab_manual, differences_degree_estimate
+
+
+@staged("plot")
+def plot_results(results, trials=trials, boxes=None):
+    """Plot every trial's measurements with the trial's standard deviation."""
+    import matplotlib.pyplot as plt
+
+    if boxes is None:
+        boxes = bounding_boxes(trials)
+
+    fig, ax = plt.subplots(figsize=(12, 8))
+
+    # For each trial
+    for (trial, data), bbox in zip(trials.items(), boxes):
+        # For bounding box points, use the mean of the bounding box as the measurement
+        bbox_mean_x, bbox_mean_y = bbox.mean
+        measurements = data["Radial measurements"] + [bbox_mean_x] * bbox.num_points  # Adding mean x value for each bounding box point
+
+        # The y-error for each point will be the overall std dev of the trial
+        y_error = results[trial]["Standard Deviation"][0]
+
+        # Plotting each point for the trial
+        ax.errorbar([trial] * len(measurements), measurements, yerr=y_error, fmt='o', capsize=5, elinewidth=1, label=f"{trial} measurements")
+
+    ax.set_ylabel('Position (cm)')
+    ax.set_title('Ball Landing Position with Standard Deviation')
+    plt.xticks(rotation=45)
+    plt.grid(True, which='both', linestyle='--', linewidth=0.5)
+    ax.legend()
+    plt.tight_layout()
+    plt.show()
+
+
+def main(plot=True):
+    expected_x, expected_x_uncertainty = expected_positions()
+    for trial, x in expected_x.items():
+        print(f"{trial}: expected x = {x:.4f} ± {expected_x_uncertainty[trial]:.4f} m")
+
+    boxes = bounding_boxes()
+    results = analyze_trials(trials, boxes)
+    if plot:
+        plot_results(results, trials, boxes)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,5 @@
-import numpy as np
-import matplotlib.pyplot as plt
-from scipy.stats import linregress
+from phys1494.grouped import grouped_linregress, split_groups
+from phys1494.instrument import stage, staged
 
 # Given data
 L = 0.1024  # in meters
@@ -10,45 +9,57 @@ data = {
     "F=mg": [0.003924, 0.0138321, 0.0168732, 0.0211896, 0.0227592, 0.003924, 0.0080442, 0.0118701, 0.0170694, 0.0210915, 0.0036297, 0.0061803, 0.0101043, 0.0141264, 0.0161865, 0.0036297, 0.0051993, 0.0089271, 0.0120663, 0.0152055, 0.0022563, 0.0043164, 0.0069651, 0.0091233, 0.012753]
 }
 
-# Extracting unique I values for individual plots
-unique_I = np.unique(data["I"])
-
-# Plotting iL against F=mg for each I
-plt.figure(figsize=(12, 8))
-for current in unique_I:
-    idx = [i for i, x in enumerate(data["I"]) if x == current]
-    x_values = [data["iL"][i] for i in idx]
-    y_values = [data["F=mg"][i] for i in idx]
-    plt.scatter(x_values, y_values, label=f"I = {current} mA")
-    slope, intercept, r_value, p_value, std_err = linregress(x_values, y_values)
-    plt.plot(x_values, [slope*x + intercept for x in x_values], linestyle='--')
-
-plt.xlabel('iL (mA*m)')
-plt.ylabel('F = mg (N)')
-plt.legend()
-plt.title('iL vs F=mg for various I values')
-plt.grid(True)
-plt.show()
-
-# Calculating B for each I setting
-B_values = []
-B_errors = []
-for current in unique_I:
-    idx = [i for i, x in enumerate(data["I"]) if x == current]
-    x_values = [data["iL"][i] for i in idx]
-    y_values = [data["F=mg"][i] for i in idx]
-    slope, intercept, r_value, p_value, std_err = linregress(x_values, y_values)
-    B_values.append(slope)
-    B_errors.append(std_err)
-
-# Plotting B against I
-plt.figure(figsize=(12, 8))
-plt.errorbar(unique_I, B_values, yerr=B_errors, fmt='o-', label='Measured B values')
-plt.xlabel('I (mA)')
-plt.ylabel('B (T)')
-plt.title('B vs I with error bars')
-plt.grid(True)
-plt.legend()
-plt.show()
-
-B_values, B_errors
+
+def analyze(data=data):
+    """
+    Regress F=mg on iL for every I value at once; B for each I setting is the
+    slope of its regression.
+    """
+    with stage("fit", rows=len(data["I"]), function="grouped_linregress"):
+        return grouped_linregress(data["I"], data["iL"], data["F=mg"])
+
+
+@staged("plot")
+def plot_results(fit, data=data):
+    """Plot iL against F=mg for each I, then B against I."""
+    import matplotlib.pyplot as plt
+
+    unique_I = fit.keys
+    x_groups, y_groups = split_groups(fit, data["iL"], data["F=mg"])
+
+    # Plotting iL against F=mg for each I
+    plt.figure(figsize=(12, 8))
+    for current, x_values, y_values, slope, intercept in zip(unique_I, x_groups, y_groups, fit.slope, fit.intercept):
+        plt.scatter(x_values, y_values, label=f"I = {current} mA")
+        plt.plot(x_values, slope*x_values + intercept, linestyle='--')
+
+    plt.xlabel('iL (mA*m)')
+    plt.ylabel('F = mg (N)')
+    plt.legend()
+    plt.title('iL vs F=mg for various I values')
+    plt.grid(True)
+    plt.show()
+
+    # Plotting B against I
+    plt.figure(figsize=(12, 8))
+    plt.errorbar(unique_I, fit.slope, yerr=fit.stderr, fmt='o-', label='Measured B values')
+    plt.xlabel('I (mA)')
+    plt.ylabel('B (T)')
+    plt.title('B vs I with error bars')
+    plt.grid(True)
+    plt.legend()
+    plt.show()
+
+
+def main(plot=True):
+    fit = analyze()
+    if plot:
+        plot_results(fit)
+
+    B_values = fit.slope
+    B_errors = fit.stderr
+    return B_values, B_errors
+
+
+if __name__ == "__main__":
+    main()
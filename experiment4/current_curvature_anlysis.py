@@ -2,8 +2,9 @@
 Analysis of current as a function of curvature
 """
 import numpy as np
-import matplotlib.pyplot as plt
-import pandas as pd
+
+from phys1494.grouped import grouped_wls
+from phys1494.instrument import staged
 
 voltage = [100, 100, 100, 200, 200, 200, 300, 300, 300, 400, 400, 400, 500, 500, 500]
 current = [1, 0.86, 1.19, 1, 1.28, 1.64, 1.78, 2.03, 1.59, 1.84, 2.07, 1.66, 2.06, 1.86, 2.63]
@@ -13,8 +14,14 @@ diameter = [0.075, 0.08, 0.06, 0.11, 0.09, 0.07, 0.08, 0.07, 0.09, 0.09, 0.08, 0
 
 unique_voltages = sorted(set(voltage))
 
+# Constants
+C = 0.0008047  # T A^-1
+
 # Adjusted function
+@staged("plot")
 def plot_current_vs_inv_radius(voltage, current, current_high, current_low, diameter):
+    import matplotlib.pyplot as plt
+
     # Convert diameter to radius
     radius = [d / 2 for d in diameter]
     
@@ -47,83 +54,69 @@ def plot_current_vs_inv_radius(voltage, current, current_high, current_low, diam
     plt.grid(True)
     plt.show()
 
+@staged("fit", rows="voltage")
 def weighted_least_squares_fit(voltage, inv_radius, current, current_high, current_low):
-    results = []
-    for v in unique_voltages:
-        # Extracting data corresponding to the voltage
-        indices = [i for i, x in enumerate(voltage) if x == v]
-        v_inv_radius = [inv_radius[i] for i in indices]
-        v_current = [current[i] for i in indices]
-        
-        # Calculate errors and weights
-        v_errors = [abs(current_high[i] - current_low[i]) / 2 for i in indices]
-        weights = [1 / e**2 for e in v_errors]
-        
-        # Weighted linear regression
-        slope, intercept = np.polyfit(v_inv_radius, v_current, 1, w=weights)
-        
-        # Standard errors for slope and intercept
-        y_fit = [slope*x + intercept for x in v_inv_radius]
-        residuals = [y_fit[i] - v_current[i] for i in range(len(v_current))]
-        residual_sum_squares = sum([r**2 for r in residuals])
-        variance = residual_sum_squares / (len(v_inv_radius) - 2)
-        std_error_slope = (variance / sum([(x - np.mean(v_inv_radius))**2 for x in v_inv_radius]))**0.5
-        std_error_intercept = (variance * sum([x**2 for x in v_inv_radius]) / (len(v_inv_radius) * sum([(x - np.mean(v_inv_radius))**2 for x in v_inv_radius])))**0.5
-        
-        results.append({
-            'Voltage (V)': v,
-            'Slope A': slope,
-            'Intercept D': intercept,
-            'σA': std_error_slope,
-            'σD': std_error_intercept
-        })
-
-    return pd.DataFrame(results)
-
-# Call the function with the updated data
-plot_current_vs_inv_radius(voltage, current, current_high, current_low, diameter)
-
-# Create a DataFrame with the data
-data = pd.DataFrame({
-    'Voltage (V)': voltage,
-    'Current (A)': current,
-    'Current High (A)': current_high,
-    'Current Low (A)': current_low,
-    'Diameter (m)': diameter,
-    'Radius (m)': [d/2 for d in diameter],
-    '1/Radius (1/m)': [1/(d/2) for d in diameter]
-})
-
-# Call the function to plot the data
-plot_current_vs_inv_radius(voltage, current, current_high, current_low, diameter)
-
-# Create a DataFrame with the data
-data = pd.DataFrame({
-    'Voltage (V)': voltage,
-    'Current (A)': current,
-    'Current High (A)': current_high,
-    'Current Low (A)': current_low,
-    'Diameter (m)': diameter,
-    'Radius (m)': [d/2 for d in diameter],
-    '1/Radius (1/m)': [1/(d/2) for d in diameter]
-})
-
-# Compute the weighted least squares results and display them
-results_df = weighted_least_squares_fit(voltage, data['1/Radius (1/m)'].values, data['Current (A)'].values, current_high, current_low)
-print(results_df)
-
-# Constants
-C = 0.0008047  # T A^-1
-
-# Extracting the values from the results dataframe
-voltages = results_df['Voltage (V)'].values
-slopes_A = results_df['Slope A'].values
-errors_A = results_df['σA'].values
-
-# Calculating e/m and its uncertainty for each estimate
-em_values = [2*V / (A**2 * C**2) for V, A in zip(voltages, slopes_A)]
-sigma_em_values = [((-4*V) / (A**3 * C**2) * sigma_A)**2 for V, A, sigma_A in zip(voltages, slopes_A, errors_A)]
-
-em_values, np.sqrt(sigma_em_values)
-
-print(f'e/m = {np.mean(em_values)} ± {np.sqrt(np.mean(sigma_em_values))}')
\ No newline at end of file
+    import pandas as pd
+
+    inv_radius = np.asarray(inv_radius, dtype=float)
+
+    # Calculate errors and weights. The squared weights reproduce the former
+    # np.polyfit(w=1/e**2) call, which weights the residuals, not their squares
+    errors = np.abs(np.asarray(current_high) - np.asarray(current_low)) / 2
+    weights = (1 / errors**2) ** 2
+
+    # Weighted linear regression for every voltage at once
+    fit = grouped_wls(voltage, inv_radius, current, weights=weights)
+
+    # Standard errors for slope and intercept from the residuals
+    def group_sum(values):
+        return np.bincount(fit.inverse, weights=values)
+
+    n = fit.n
+    variance = group_sum(fit.residuals**2) / (n - 2)
+    x_mean = group_sum(inv_radius) / n
+    s_xx = group_sum((inv_radius - x_mean[fit.inverse])**2)
+    std_error_slope = (variance / s_xx)**0.5
+    std_error_intercept = (variance * group_sum(inv_radius**2) / (n * s_xx))**0.5
+
+    return pd.DataFrame({
+        'Voltage (V)': fit.keys,
+        'Slope A': fit.slope,
+        'Intercept D': fit.intercept,
+        'σA': std_error_slope,
+        'σD': std_error_intercept
+    })
+
+def analyze(voltage=voltage, current=current, current_high=current_high, current_low=current_low, diameter=diameter):
+    """
+    Fit current against 1/r for every voltage and estimate e/m from the
+    slopes, returning the fit table and the e/m values and variances.
+    """
+    inv_radius = np.array([1/(d/2) for d in diameter])
+
+    # Compute the weighted least squares results
+    results_df = weighted_least_squares_fit(voltage, inv_radius, np.array(current), current_high, current_low)
+
+    # Extracting the values from the results dataframe
+    voltages = results_df['Voltage (V)'].values
+    slopes_A = results_df['Slope A'].values
+    errors_A = results_df['σA'].values
+
+    # Calculating e/m and its uncertainty for each estimate
+    em_values = [2*V / (A**2 * C**2) for V, A in zip(voltages, slopes_A)]
+    sigma_em_values = [((-4*V) / (A**3 * C**2) * sigma_A)**2 for V, A, sigma_A in zip(voltages, slopes_A, errors_A)]
+    return results_df, em_values, sigma_em_values
+
+
+def main(plot=True):
+    if plot:
+        plot_current_vs_inv_radius(voltage, current, current_high, current_low, diameter)
+
+    results_df, em_values, sigma_em_values = analyze()
+    print(results_df)
+    print(f'e/m = {np.mean(em_values)} ± {np.sqrt(np.mean(sigma_em_values))}')
+    return results_df, em_values, sigma_em_values
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,15 @@
-import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
 
+from phys1494.instrument import staged
+
+from angular_windows import windowed_mean_std
+from sensor_cache import load_series
+
+@staged("load")
 def read_intesity_angular_position(filename):
-    df = pd.read_csv(filename, sep='\t', header=0)
-    return df['Angular Position ( deg )'], df['Relative Intensity (  )']
+    return load_series(filename, 'Angular Position ( deg )', 'Relative Intensity (  )', header=0)
 
+@staged("transform", rows="angular_positions")
 def normalize_phase(angular_positions, intensities):
     # 1. Discard data above 360 degrees
     valid_indices = angular_positions <= 360
@@ -24,45 +28,49 @@ def normalize_phase(angular_positions, intensities):
     
     return normalized_angular_positions, intensities
 
-def calculate_avg_and_std(*trials):
-    # Convert tuples to DataFrame objects
-    dfs = [pd.DataFrame({'Angular Position ( deg )': trial[0], 'Relative Intensity (  )': trial[1]}) for trial in trials]
-    
-    # Combine all trials into one dataframe
-    all_data = pd.concat(dfs, axis=0)
-    
-    # Sample 20 points between 0 and 360
-    sample_points = np.linspace(0, 360, 20)
-    avg_intensities = []
-    std_intensities = []
+@staged("transform")
+def calculate_avg_and_std(*trials, num_points=20, window=9):
+    # Combine all trials
+    angular_positions = np.concatenate([np.asarray(trial[0]) for trial in trials])
+    intensities = np.concatenate([np.asarray(trial[1]) for trial in trials])
     
-    # Define a window around each sample point (e.g., 9 degrees on either side)
-    window = 9
-    
-    for point in sample_points:
-        subset = all_data[(all_data['Angular Position ( deg )'] >= point - window) & (all_data['Angular Position ( deg )'] <= point + window)]
-        avg_intensities.append(subset['Relative Intensity (  )'].mean())
-        std_intensities.append(subset['Relative Intensity (  )'].std())
-    
-    return sample_points, avg_intensities, std_intensities
+    # Sample num_points points between 0 and 360 and average within a window
+    # around each (e.g., 9 degrees on either side), wrapping around 360 degrees
+    return windowed_mean_std(angular_positions, intensities, num_points=num_points, window=window)
+
+TRIAL_FILES = [
+    'experiment5/intensityAngularPosition_1.txt',
+    'experiment5/intensityAngularPosition_2.txt',
+    'experiment5/intensityAngularPosition_3.txt',
+]
 
-plt.figure(figsize=(10, 6))
+def analyze(filenames=TRIAL_FILES):
+    """Average the phase-normalized trials; returns positions, means and stds."""
+    normalized_trials = []
+    for filename in filenames:
+        trial = read_intesity_angular_position(filename)
+        normalized_trials.append(normalize_phase(trial[0], trial[1]))
 
-trial_1 = read_intesity_angular_position('experiment5/intensityAngularPosition_1.txt')
-normalized_trial_1 = normalize_phase(trial_1[0], trial_1[1])
+    # Calculate average and standard deviation
+    return calculate_avg_and_std(*normalized_trials)
 
-trial_2 = read_intesity_angular_position('experiment5/intensityAngularPosition_2.txt')
-normalized_trial_2 = normalize_phase(trial_2[0], trial_2[1])
+@staged("plot")
+def plot_results(angular_positions, avg_intensities, std_intensities):
+    import matplotlib.pyplot as plt
 
-trial_3 = read_intesity_angular_position('experiment5/intensityAngularPosition_3.txt')
-normalized_trial_3 = normalize_phase(trial_3[0], trial_3[1])
+    plt.figure(figsize=(10, 6))
+    plt.errorbar(angular_positions, avg_intensities, yerr=std_intensities, fmt='o', color='blue', ecolor='red', capsize=5)
+    plt.title('Graph of Angular Position vs. Average Relative Intensity')
+    plt.xlabel('Angular Position (deg)')
+    plt.ylabel('Relative Intensity')
+    plt.grid(True)
+    plt.show()
 
-# Calculate average and standard deviation
-angular_positions, avg_intensities, std_intensities = calculate_avg_and_std(normalized_trial_1, normalized_trial_2, normalized_trial_3)
+def main(plot=True):
+    angular_positions, avg_intensities, std_intensities = analyze()
+    if plot:
+        plot_results(angular_positions, avg_intensities, std_intensities)
+    return angular_positions, avg_intensities, std_intensities
 
-plt.errorbar(angular_positions, avg_intensities, yerr=std_intensities, fmt='o', color='blue', ecolor='red', capsize=5)
-plt.title('Graph of Angular Position vs. Average Relative Intensity')
-plt.xlabel('Angular Position (deg)')
-plt.ylabel('Relative Intensity')
-plt.grid(True)
-plt.show()
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Windowed averaging of intensity against angular position.
+
+The angles are sorted once and prefix sums of the intensity and its square
+are built, so the mean and standard deviation inside every window come from
+two searchsorted lookups instead of a scan of all samples per window.
+"""
+import numpy as np
+
+
+def windowed_mean_std(
+    angles, intensities, num_points=20, window=9, period=360, wrap=True
+):
+    """
+    Average the intensities within +/- window degrees of num_points sample
+    points evenly spaced over [0, period].
+
+    With wrap=True the windows wrap around the period, so the window around
+    0 degrees also collects samples just below 360. Returns the sample points
+    and the mean and sample standard deviation (ddof=1) in each window; empty
+    windows give NaN.
+    """
+    angles = np.asarray(angles, dtype=float)
+    intensities = np.asarray(intensities, dtype=float)
+    sample_points = np.linspace(0, period, num_points)
+
+    if wrap:
+        if 2 * window >= period:
+            raise ValueError('window must be narrower than half the period')
+        angles = np.mod(angles, period)
+    order = np.argsort(angles, kind='stable')
+    angles = angles[order]
+    # Center the intensities so the sum-of-squares variance stays accurate
+    offset = intensities.mean() if intensities.size else 0.0
+    values = intensities[order] - offset
+
+    if wrap:
+        # Copies shifted by one period on either side cover the wrapped windows
+        angles = np.concatenate([angles - period, angles, angles + period])
+        values = np.tile(values, 3)
+
+    sums = np.concatenate([[0.0], np.cumsum(values)])
+    sums_sq = np.concatenate([[0.0], np.cumsum(values**2)])
+
+    lo = np.searchsorted(angles, sample_points - window, side='left')
+    hi = np.searchsorted(angles, sample_points + window, side='right')
+    count = hi - lo
+    total = sums[hi] - sums[lo]
+    total_sq = sums_sq[hi] - sums_sq[lo]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+        variance = (total_sq - total * mean) / (count - 1)
+    std = np.sqrt(np.maximum(variance, 0.0))
+    std[count < 2] = np.nan
+    return sample_points, mean + offset, std
@@ -1,20 +1,26 @@
-import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
-from scipy.optimize import curve_fit
+
+from phys1494.fitcache import curve_fit
+from phys1494.instrument import staged
+
+from peaks import find_peaks
+from sensor_cache import load_series
 
 # Function to read the data from a file
+@staged("load")
 def read_intensity_linear_position(filename):
-    df = pd.read_csv(filename, sep='\t', header=1)
-    return df['Linear Position ( m )'], df['Relative Intensity (  )']
+    return load_series(filename, 'Linear Position ( m )', 'Relative Intensity (  )', header=1)
 
-# Function to find the positions of maxima
-def find_maxima_positions(linear_positions, intensities):
-    maxima_positions = []
-    for i in range(1, len(intensities) - 1):
-        if intensities[i] > intensities[i - 1] and intensities[i] > intensities[i + 1]:
-            maxima_positions.append(linear_positions[i])
-    return maxima_positions
+# Function to find the positions of maxima, refined to sub-sample precision
+@staged("transform", rows="linear_positions")
+def find_maxima_positions(linear_positions, intensities, prominence=None, min_distance=None):
+    peaks = find_peaks(
+        np.asarray(linear_positions),
+        np.asarray(intensities),
+        prominence=prominence,
+        min_distance=min_distance,
+    )
+    return list(peaks.position)
 
 # Fitting function
 def linear_fit(x, m, c):
@@ -29,37 +35,66 @@ filepaths = [
     'experiment5/linearPositionRelativeIntensity_6.txt',
 ]
 
-all_maxima_positions = []
+L = .1065  # distance between the slits and the screen in meters
+d = 0.25e-3  # separation between the slits in meters
 
-# Read data from all files and find maxima
-for filepath in filepaths:
-    linear_positions, intensities = read_intensity_linear_position(filepath)
-    maxima_positions = find_maxima_positions(linear_positions, intensities)
-    all_maxima_positions.extend(maxima_positions)
+def analyze(filepaths=filepaths):
+    """
+    Find the maxima of every file, fit their positions against order number
+    and estimate the wavelength and slit width.
+    """
+    all_maxima_positions = []
 
-# Assuming the central maximum is at the midpoint of the list
-midpoint = len(all_maxima_positions) // 2
-order_numbers = list(range(-midpoint, len(all_maxima_positions) - midpoint))
+    # Read data from all files and find maxima
+    for filepath in filepaths:
+        linear_positions, intensities = read_intensity_linear_position(filepath)
+        maxima_positions = find_maxima_positions(linear_positions, intensities)
+        all_maxima_positions.extend(maxima_positions)
 
-# Fit the data
-params, _ = curve_fit(linear_fit, order_numbers, all_maxima_positions)
-slope, intercept = params
+    # Assuming the central maximum is at the midpoint of the list
+    midpoint = len(all_maxima_positions) // 2
+    order_numbers = list(range(-midpoint, len(all_maxima_positions) - midpoint))
 
-plt.scatter(order_numbers, all_maxima_positions, label='Data', color='blue')
-plt.plot(order_numbers, linear_fit(np.array(order_numbers), slope, intercept), '--', color='red', label=f'Fit: Slope={slope:.4f}, Intercept={intercept:.4f}')
-plt.xlabel('Order Number (m)')
-plt.ylabel('Position of Maximum (xm)')
-plt.legend()
-plt.title('Order Number vs. Position of Maximum')
-plt.grid(True)
-plt.show()
+    # Fit the data
+    params, _ = curve_fit(linear_fit, order_numbers, all_maxima_positions)
+    slope, intercept = params
 
-L = .1065  # distance between the slits and the screen in meters
-d = 0.25e-3  # separation between the slits in meters
+    wavelength_estimate = slope * d / L
+
+    # Estimate the slit width using the calculated slope and wavelength
+    estimated_slit_width = wavelength_estimate * L / slope
+
+    return {
+        'order_numbers': order_numbers,
+        'maxima_positions': all_maxima_positions,
+        'slope': slope,
+        'intercept': intercept,
+        'wavelength': wavelength_estimate,
+        'slit_width': estimated_slit_width,
+    }
+
+@staged("plot")
+def plot_results(results):
+    import matplotlib.pyplot as plt
+
+    order_numbers = results['order_numbers']
+    slope, intercept = results['slope'], results['intercept']
+    plt.scatter(order_numbers, results['maxima_positions'], label='Data', color='blue')
+    plt.plot(order_numbers, linear_fit(np.array(order_numbers), slope, intercept), '--', color='red', label=f'Fit: Slope={slope:.4f}, Intercept={intercept:.4f}')
+    plt.xlabel('Order Number (m)')
+    plt.ylabel('Position of Maximum (xm)')
+    plt.legend()
+    plt.title('Order Number vs. Position of Maximum')
+    plt.grid(True)
+    plt.show()
 
-wavelength_estimate = slope * d / L
-print(f"Estimated Wavelength: {wavelength_estimate:.10f} m")
+def main(plot=True):
+    results = analyze()
+    if plot:
+        plot_results(results)
+    print(f"Estimated Wavelength: {results['wavelength']:.10f} m")
+    print(f"Estimated Slit Width: {results['slit_width']:.10f} m")
+    return results
 
-# Estimate the slit width using the calculated slope and wavelength
-estimated_slit_width = wavelength_estimate * L / slope
-print(f"Estimated Slit Width: {estimated_slit_width:.10f} m")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Vectorized local-maximum detection for intensity scans.
+
+Scans are processed as a stacked 2-D array (one scan per row), and each
+maximum is refined to sub-sample precision by fitting a parabola through the
+peak sample and its two neighbours.
+"""
+from collections import namedtuple
+
+import numpy as np
+from scipy.ndimage import maximum_filter1d
+from scipy.signal import peak_prominences
+
+Peaks = namedtuple(
+    'Peaks', ['scan', 'index', 'position', 'height', 'prominence']
+)
+
+
+def stack_scans(scans, fill=np.nan):
+    """
+    Stack 1-D scans of different lengths into a 2-D array padded with fill.
+    """
+    scans = [np.asarray(scan, dtype=float) for scan in scans]
+    stacked = np.full((len(scans), max(len(scan) for scan in scans)), fill)
+    for row, scan in enumerate(scans):
+        stacked[row, :len(scan)] = scan
+    return stacked
+
+
+def _forward_fill(values):
+    """Replace NaNs in each row with the last valid value before them."""
+    valid = ~np.isnan(values)
+    last = np.where(valid, np.arange(values.shape[1]), 0)
+    np.maximum.accumulate(last, axis=1, out=last)
+    return values[np.arange(values.shape[0])[:, None], last]
+
+
+def _prominences(intensities, scan, index):
+    """
+    Compute the prominence of every peak at once by running scipy over all
+    scans laid end to end, separated by +inf so no search crosses a scan.
+    """
+    if len(scan) == 0:
+        return np.empty(0)
+    filled = _forward_fill(intensities)
+    padded = np.pad(filled, ((0, 0), (0, 1)), constant_values=np.inf)
+    flat_peaks = scan * padded.shape[1] + index
+    return peak_prominences(padded.ravel(), flat_peaks)[0]
+
+
+def find_peaks(
+    positions, intensities, prominence=None, min_distance=None, refine=True
+):
+    """
+    Find the strict local maxima of every scan.
+
+    positions is either one 1-D axis shared by all scans or an array shaped
+    like intensities; intensities is 1-D (a single scan) or 2-D (one scan per
+    row, NaN-padded). Peaks less prominent than prominence, or not the highest
+    sample within min_distance samples on either side, are dropped.
+
+    Returns a Peaks tuple of flat arrays (scan row, sample index, refined
+    position, refined height, prominence) ordered by scan and position.
+    """
+    intensities = np.atleast_2d(np.asarray(intensities, dtype=float))
+    positions = np.broadcast_to(
+        np.asarray(positions, dtype=float), intensities.shape
+    )
+
+    # Strict local maxima, compared with both neighbours
+    left = intensities[:, :-2]
+    center = intensities[:, 1:-1]
+    right = intensities[:, 2:]
+    is_peak = (center > left) & (center > right)
+
+    if min_distance:
+        window = 2 * int(min_distance) + 1
+        local_max = maximum_filter1d(
+            np.nan_to_num(intensities, nan=-np.inf),
+            size=window,
+            axis=1,
+            mode='nearest',
+        )
+        is_peak &= center >= local_max[:, 1:-1]
+
+    scan, index = np.nonzero(is_peak)
+    index = index + 1
+
+    # Prominences are only computed when filtering on them
+    if prominence is not None:
+        prominences = _prominences(intensities, scan, index)
+        keep = prominences >= prominence
+        scan, index, prominences = scan[keep], index[keep], prominences[keep]
+    else:
+        prominences = np.full(len(scan), np.nan)
+
+    y_left = intensities[scan, index - 1]
+    y_peak = intensities[scan, index]
+    y_right = intensities[scan, index + 1]
+    x_left = positions[scan, index - 1]
+    x_peak = positions[scan, index]
+    x_right = positions[scan, index + 1]
+
+    if refine:
+        # Vertex of the parabola through the three samples, as a fraction of
+        # a sample step (always within (-0.5, 0.5) for a strict maximum)
+        offset = 0.5 * (y_left - y_right) / (y_left - 2 * y_peak + y_right)
+        step = np.where(offset >= 0, x_right - x_peak, x_peak - x_left)
+        position = x_peak + offset * step
+        height = y_peak - 0.25 * (y_left - y_right) * offset
+    else:
+        position, height = x_peak, y_peak
+
+    return Peaks(scan, index, position, height, prominences)
@@ -0,0 +1,87 @@
+"""
+Binary sidecar cache for the tab-separated sensor exports.
+
+The first load of an export parses the text once and writes its columns to a
+float64 .npy sidecar stored column-major, next to the export, with a small
+JSON file recording the column names and the export's size and mtime. Later
+loads memory-map the sidecar, so a rerun touches only the pages it reads. The
+sidecar is rebuilt whenever the export's size or mtime changes, or the header
+offset differs.
+"""
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+
+def _sidecar_paths(filename):
+    return f'{filename}.npy', f'{filename}.json'
+
+
+def _source_stamp(filename, header):
+    stat = os.stat(filename)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'header': header}
+
+
+def _temporary(path, mode):
+    """
+    Open a uniquely named temporary file next to path, so that processes
+    building the same sidecar never write to the same file.
+    """
+    directory, name = os.path.split(path)
+    fd, tmp = tempfile.mkstemp(dir=directory or '.', prefix=f'{name}.', suffix='.tmp')
+    return tmp, os.fdopen(fd, mode)
+
+
+def _write_sidecar(filename, header, stamp):
+    """Parse the export and write its sidecar, returning the column names."""
+    df = pd.read_csv(filename, sep='\t', header=header)
+    data_path, meta_path = _sidecar_paths(filename)
+
+    tmp, f = _temporary(data_path, 'wb')
+    with f:
+        np.save(f, np.asfortranarray(df.to_numpy(dtype=np.float64)))
+    os.replace(tmp, data_path)
+
+    # The metadata is written last, so it only ever describes a complete sidecar
+    tmp, f = _temporary(meta_path, 'w')
+    with f:
+        json.dump({'columns': list(df.columns), **stamp}, f)
+    os.replace(tmp, meta_path)
+    return list(df.columns)
+
+
+def load_columns(filename, header=0):
+    """
+    Return the columns of a tab-separated export as {name: array}.
+
+    header is the row holding the column names, as for pd.read_csv. The
+    arrays are read-only views into the memory-mapped sidecar.
+    """
+    data_path, meta_path = _sidecar_paths(filename)
+    stamp = _source_stamp(filename, header)
+
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (FileNotFoundError, ValueError):
+        meta = None
+
+    if meta is not None and all(meta.get(key) == value for key, value in stamp.items()):
+        columns = meta['columns']
+    else:
+        columns = _write_sidecar(filename, header, stamp)
+
+    data = np.load(data_path, mmap_mode='r')
+    return {name: data[:, i] for i, name in enumerate(columns)}
+
+
+def load_series(filename, *names, header=0):
+    """
+    Return the named columns of an export as pandas Series backed by the
+    memory-mapped sidecar.
+    """
+    columns = load_columns(filename, header=header)
+    return tuple(pd.Series(columns[name], name=name, copy=False) for name in names)
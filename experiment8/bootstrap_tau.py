@@ -0,0 +1,108 @@
+"""
+Bootstrap confidence intervals for RC time constants.
+
+Each replicate resamples the time points and, at every drawn time point, the
+repeated current runs, both with replacement, as integer index matrices. The
+ln(average current) vs time slope of every replicate comes from the closed
+form least-squares expression evaluated on whole arrays, so a chunk of
+replicates costs a handful of array operations. Large replicate counts are
+split into chunks whose random streams are spawned from one seed and can be
+evaluated in a process pool.
+"""
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Resampled currents per chunk; a chunk holds this many run indices and
+# currents, so its memory does not grow with the size of the data
+DEFAULT_CHUNK_ELEMENTS = 1 << 21
+
+BootstrapResult = namedtuple(
+    'BootstrapResult', ['tau', 'tau_err', 'ci_low', 'ci_high', 'replicates']
+)
+
+
+def ln_current_slopes(time, runs, time_index, run_index):
+    """
+    Return the fitted ln(I) vs t slope for every replicate.
+
+    time_index has shape (replicates, points) and run_index has shape
+    (replicates, n_runs, points), or shapes that broadcast to them; both
+    index into runs, shaped (n_runs, times).
+    """
+    x = time[time_index]
+    currents = runs[run_index, time_index[:, None, :]]
+    y = np.log(currents.mean(axis=1))
+
+    n = x.shape[1]
+    sum_x = x.sum(axis=1)
+    sum_y = y.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (n * np.einsum('ij,ij->i', x, y) - sum_x * sum_y) / (
+            n * np.einsum('ij,ij->i', x, x) - sum_x**2
+        )
+
+
+def _bootstrap_chunk(time, runs, seed_sequence, size):
+    rng = np.random.default_rng(seed_sequence)
+    n_runs, n_times = runs.shape
+    time_index = rng.integers(0, n_times, size=(size, n_times))
+    run_index = rng.integers(0, n_runs, size=(size, n_runs, n_times))
+    return -1 / ln_current_slopes(time, runs, time_index, run_index)
+
+
+def bootstrap_tau(
+    time,
+    runs,
+    n_replicates=10_000,
+    seed=None,
+    confidence=0.95,
+    workers=None,
+    chunk_size=None,
+):
+    """
+    Bootstrap tau = -1 / slope of ln(average current) against time.
+
+    runs holds the repeated current measurements, one run per row. Returns
+    the tau of the original data, the bootstrap standard deviation, the
+    percentile confidence interval and the replicate taus. Replicates whose
+    resampled times are all equal (no slope) are dropped. Replicates are
+    drawn chunk_size at a time, by default as many as fit in
+    DEFAULT_CHUNK_ELEMENTS resampled currents.
+    """
+    time = np.asarray(time, dtype=float)
+    runs = np.atleast_2d(np.asarray(runs, dtype=float))
+
+    # The original data is the replicate that takes every time and every run
+    all_times = np.arange(runs.shape[1])[None, :]
+    all_runs = np.arange(runs.shape[0])[None, :, None]
+    tau = -1 / ln_current_slopes(time, runs, all_times, all_runs)[0]
+
+    if chunk_size is None:
+        chunk_size = max(1, DEFAULT_CHUNK_ELEMENTS // runs.size)
+    chunk_sizes = [chunk_size] * (n_replicates // chunk_size)
+    if n_replicates % chunk_size:
+        chunk_sizes.append(n_replicates % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+
+    if workers and workers > 1 and len(chunk_sizes) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = list(pool.map(
+                _bootstrap_chunk,
+                [time] * len(seeds),
+                [runs] * len(seeds),
+                seeds,
+                chunk_sizes,
+            ))
+    else:
+        chunks = [
+            _bootstrap_chunk(time, runs, seq, size)
+            for seq, size in zip(seeds, chunk_sizes)
+        ]
+
+    replicates = np.concatenate(chunks)
+    replicates = replicates[np.isfinite(replicates)]
+    alpha = (1 - confidence) / 2
+    ci_low, ci_high = np.quantile(replicates, [alpha, 1 - alpha])
+    return BootstrapResult(tau, replicates.std(ddof=1), ci_low, ci_high, replicates)
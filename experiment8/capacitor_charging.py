@@ -1,6 +1,9 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.stats import linregress
+
+from phys1494.instrument import stage, staged
+
+from bootstrap_tau import bootstrap_tau
+from rc_fit import fit_exponential, stack_runs
 
 # Data Organization
 data = {
@@ -21,58 +24,110 @@ data = {
     }
 }
 
-# Averaging Currents and Transforming Data
-averaged_data = {}
-for capacitance, values in data.items():
-    averaged_data[capacitance] = {
-        "time": np.array(values["time"]),
-        "average_current": np.mean([values["current_1"], values["current_2"]], axis=0)
-    }
+current_uncertainty = 0.5
 
-# Linear Regression Analysis and Plotting
-plt.figure(figsize=(12, 8))
+# Calculating and Comparing Ratios of Tau
+def calculate_ratio(tau1, tau1_err, tau2, tau2_err):
+    ratio = tau1 / tau2
+    ratio_err = ratio * np.sqrt((tau1_err / tau1)**2 + (tau2_err / tau2)**2)
+    return ratio, ratio_err
+
+
+def analyze(data=data, n_replicates=10_000, seed=0):
+    """
+    Fit the average current and every run of each capacitor, and bootstrap
+    tau from the repeated runs. ratio_30_20 is only included when data has
+    both the 30 µF and the 20 µF capacitor.
+    """
+    # Stacking the runs of every capacitor, with their average as an extra run
+    capacitances, time, runs = stack_runs(data)
+    average_current = runs.mean(axis=1)
+    curves = np.concatenate([average_current[:, None, :], runs], axis=1)
 
-regression_results = {}
-for capacitance, values in averaged_data.items():
-    ln_current = np.log(values["average_current"])
-    time = values["time"]
-    transformed_uncertainty = 0.5 / values["average_current"]  # Transforming uncertainties
+    # Weighted exponential fit of every capacitor and every run in one call
+    with stage("fit", rows=curves.size, function="fit_exponential"):
+        fit = fit_exponential(time, curves, sigma=current_uncertainty, mode="charging")
 
-    # Linear Regression
-    slope, intercept, r_value, p_value, std_err = linregress(time, ln_current)
-    regression_results[capacitance] = {
-        "tau": -1 / slope,
-        "tau_err": std_err / slope**2
+    regression_results = {}
+    for i, capacitance in enumerate(capacitances):
+        regression_results[capacitance] = {
+            "tau": fit.tau[i, 0],
+            "tau_err": fit.tau_err[i, 0],
+            "run_taus": fit.tau[i, 1:]
+        }
+
+    # Bootstrap confidence intervals for tau, resampling the repeated runs and time points
+    bootstraps = {}
+    for capacitance, values in data.items():
+        with stage("fit", rows=n_replicates, function="bootstrap_tau"):
+            bootstraps[capacitance] = bootstrap_tau(values["time"], [values["current_1"], values["current_2"]], n_replicates=n_replicates, seed=seed)
+
+    results = {
+        "capacitances": capacitances,
+        "time": time,
+        "average_current": average_current,
+        "fit": fit,
+        "regression_results": regression_results,
+        "bootstraps": bootstraps,
     }
 
+    # The 30 µF to 20 µF ratio, when the data has both capacitors
+    if "30 µF" in regression_results and "20 µF" in regression_results:
+        tau_20, tau_20_err = regression_results["20 µF"]["tau"], regression_results["20 µF"]["tau_err"]
+        tau_30, tau_30_err = regression_results["30 µF"]["tau"], regression_results["30 µF"]["tau_err"]
+        results["ratio_30_20"] = calculate_ratio(tau_30, tau_30_err, tau_20, tau_20_err)
+    return results
+
+
+@staged("plot")
+def plot_results(results):
+    import matplotlib.pyplot as plt
+
+    time = results["time"]
+    average_current = results["average_current"]
+    fit = results["fit"]
+
     # Plotting
-    plt.errorbar(time, ln_current, yerr=transformed_uncertainty, fmt='o', label=f'{capacitance} ln(Current)')
-    plt.plot(time, slope*time + intercept, label=f'{capacitance} Regression Line')
+    plt.figure(figsize=(12, 8))
 
-     # Adding τ value with error in a yellow box
-    plt.text(8, slope*8 + intercept - 0.5, f'τ ({capacitance}) = {regression_results[capacitance]["tau"]:.2f} ± {regression_results[capacitance]["tau_err"]:.2f} s', 
-             fontsize=12, bbox=dict(facecolor='yellow', alpha=0.5))
+    for i, capacitance in enumerate(results["capacitances"]):
+        ln_current = np.log(average_current[i])
+        transformed_uncertainty = current_uncertainty / average_current[i]  # Transforming uncertainties
+        tau, tau_err = fit.tau[i, 0], fit.tau_err[i, 0]
 
-# Finalizing Plot
-plt.title('ln(Current) vs Time with Linear Regression')
-plt.xlabel('Time (s)')
-plt.ylabel('ln(Current)')
-plt.legend()
-plt.grid(True)
-plt.show()
+        # ln of the fitted exponential is a straight line
+        ln_fit = np.log(fit.amplitude[i, 0]) - time / tau
+        plt.errorbar(time, ln_current, yerr=transformed_uncertainty, fmt='o', label=f'{capacitance} ln(Current)')
+        plt.plot(time, ln_fit, label=f'{capacitance} Exponential Fit')
 
-# Outputting Regression Results
-for capacitance, results in regression_results.items():
-    print(f"{capacitance}: τ = {results['tau']:.2f} ± {results['tau_err']:.2f} s")
+        # Adding τ value with error in a yellow box
+        plt.text(8, np.log(fit.amplitude[i, 0]) - 8 / tau - 0.5, f'τ ({capacitance}) = {tau:.2f} ± {tau_err:.2f} s',
+                 fontsize=12, bbox=dict(facecolor='yellow', alpha=0.5))
 
-# Calculating and Comparing Ratios of Tau
-def calculate_ratio(tau1, tau1_err, tau2, tau2_err):
-    ratio = tau1 / tau2
-    ratio_err = ratio * np.sqrt((tau1_err / tau1)**2 + (tau2_err / tau2)**2)
-    return ratio, ratio_err
+    # Finalizing Plot
+    plt.title('ln(Current) vs Time with Exponential Fit')
+    plt.xlabel('Time (s)')
+    plt.ylabel('ln(Current)')
+    plt.legend()
+    plt.grid(True)
+    plt.show()
+
+
+def main(plot=True):
+    results = analyze()
+    if plot:
+        plot_results(results)
+
+    # Outputting Fit Results
+    for capacitance, values in results["regression_results"].items():
+        run_taus = ", ".join(f"{run_tau:.2f}" for run_tau in values["run_taus"])
+        print(f"{capacitance}: τ = {values['tau']:.2f} ± {values['tau_err']:.2f} s (runs: {run_taus} s)")
+
+    for capacitance, bootstrap in results["bootstraps"].items():
+        print(f"{capacitance}: bootstrap τ = {bootstrap.tau:.2f} ± {bootstrap.tau_err:.2f} s "
+              f"(95% CI {bootstrap.ci_low:.2f} to {bootstrap.ci_high:.2f} s)")
+    return results
 
-tau_10, tau_10_err = regression_results["10 µF"]["tau"], regression_results["10 µF"]["tau_err"]
-tau_20, tau_20_err = regression_results["20 µF"]["tau"], regression_results["20 µF"]["tau_err"]
-tau_30, tau_30_err = regression_results["30 µF"]["tau"], regression_results["30 µF"]["tau_err"]
 
-ratio_30_20, ratio_30_20_err = calculate_ratio(tau_30, tau_30_err, tau_20, tau_20_err)
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.stats import linregress
+
+from phys1494.instrument import stage, staged
+
+from bootstrap_tau import bootstrap_tau
+from rc_fit import fit_exponential, stack_runs
 
 # Organizing the discharging data
 discharging_data = {
@@ -21,47 +24,96 @@ discharging_data = {
     }
 }
 
-# Averaging the currents for discharging data
-averaged_discharging_data = {}
-for capacitance, values in discharging_data.items():
-    averaged_discharging_data[capacitance] = {
-        "time": np.array(values["time"]),
-        "average_current": np.mean([values["current_1"], values["current_2"]], axis=0)
-    }
+current_uncertainty = 0.5
+
 
-# Linear Regression Analysis and Plotting for Discharging Data
-plt.figure(figsize=(12, 8))
+def analyze(data=discharging_data, n_replicates=10_000, seed=0):
+    """
+    Fit the average current and every run of each capacitor, and bootstrap
+    tau from the repeated runs.
+    """
+    # Stacking the runs of every capacitor, with their average as an extra run
+    capacitances, time, runs = stack_runs(data)
+    average_current = runs.mean(axis=1)
+    curves = np.concatenate([average_current[:, None, :], runs], axis=1)
 
-discharging_regression_results = {}
-for capacitance, values in averaged_discharging_data.items():
-    ln_current = np.log(values["average_current"])
-    time = values["time"]
-    transformed_uncertainty = 0.5 / values["average_current"]  # Transforming uncertainties
+    # Weighted exponential fit of every capacitor and every run in one call
+    with stage("fit", rows=curves.size, function="fit_exponential"):
+        fit = fit_exponential(time, curves, sigma=current_uncertainty, mode="discharging")
 
-    # Linear Regression
-    slope, intercept, r_value, p_value, std_err = linregress(time, ln_current)
-    discharging_regression_results[capacitance] = {
-        "tau": -1 / slope,
-        "tau_err": std_err / slope**2
+    discharging_regression_results = {}
+    for i, capacitance in enumerate(capacitances):
+        discharging_regression_results[capacitance] = {
+            "tau": fit.tau[i, 0],
+            "tau_err": fit.tau_err[i, 0],
+            "run_taus": fit.tau[i, 1:]
+        }
+
+    # Bootstrap confidence intervals for tau, resampling the repeated runs and time points
+    bootstraps = {}
+    for capacitance, values in data.items():
+        with stage("fit", rows=n_replicates, function="bootstrap_tau"):
+            bootstraps[capacitance] = bootstrap_tau(values["time"], [values["current_1"], values["current_2"]], n_replicates=n_replicates, seed=seed)
+
+    return {
+        "capacitances": capacitances,
+        "time": time,
+        "average_current": average_current,
+        "fit": fit,
+        "regression_results": discharging_regression_results,
+        "bootstraps": bootstraps,
     }
 
+
+@staged("plot")
+def plot_results(results):
+    import matplotlib.pyplot as plt
+
+    time = results["time"]
+    average_current = results["average_current"]
+    fit = results["fit"]
+
     # Plotting
-    plt.errorbar(time, ln_current, yerr=transformed_uncertainty, fmt='o', label=f'{capacitance} ln(Current)')
-    plt.plot(time, slope*time + intercept, label=f'{capacitance} Regression Line')
+    plt.figure(figsize=(12, 8))
+
+    for i, capacitance in enumerate(results["capacitances"]):
+        ln_current = np.log(average_current[i])
+        transformed_uncertainty = current_uncertainty / average_current[i]  # Transforming uncertainties
+        tau, tau_err = fit.tau[i, 0], fit.tau_err[i, 0]
+
+        # ln of the fitted exponential is a straight line
+        ln_fit = np.log(fit.amplitude[i, 0]) - time / tau
+        plt.errorbar(time, ln_current, yerr=transformed_uncertainty, fmt='o', label=f'{capacitance} ln(Current)')
+        plt.plot(time, ln_fit, label=f'{capacitance} Exponential Fit')
+
+        # Adding τ value with error in a yellow box
+        plt.text(8, np.log(fit.amplitude[i, 0]) - 8 / tau - 0.5, f'τ ({capacitance}) = {tau:.2f} ± {tau_err:.2f} s',
+                 fontsize=12, bbox=dict(facecolor='yellow', alpha=0.5))
+
+    # Finalizing Plot
+    plt.title('ln(Current) vs Time for Discharging with Exponential Fit')
+    plt.xlabel('Time (s)')
+    plt.ylabel('ln(Current)')
+    plt.legend()
+    plt.grid(True)
+    plt.show()
+
+
+def main(plot=True):
+    results = analyze()
+    if plot:
+        plot_results(results)
 
-    # Adding τ value with error in a yellow box
-    plt.text(8, slope*8 + intercept - 0.5, f'τ ({capacitance}) = {discharging_regression_results[capacitance]["tau"]:.2f} ± {discharging_regression_results[capacitance]["tau_err"]:.2f} s', 
-             fontsize=12, bbox=dict(facecolor='yellow', alpha=0.5))
+    # Outputting Fit Results
+    for capacitance, values in results["regression_results"].items():
+        run_taus = ", ".join(f"{run_tau:.2f}" for run_tau in values["run_taus"])
+        print(f"{capacitance} (Discharging): τ = {values['tau']:.2f} ± {values['tau_err']:.2f} s (runs: {run_taus} s)")
 
-# Finalizing Plot
-plt.title('ln(Current) vs Time for Discharging with Linear Regression')
-plt.xlabel('Time (s)')
-plt.ylabel('ln(Current)')
-plt.legend()
-plt.grid(True)
-plt.show()
+    for capacitance, bootstrap in results["bootstraps"].items():
+        print(f"{capacitance} (Discharging): bootstrap τ = {bootstrap.tau:.2f} ± {bootstrap.tau_err:.2f} s "
+              f"(95% CI {bootstrap.ci_low:.2f} to {bootstrap.ci_high:.2f} s)")
+    return results
 
-# Outputting Regression Results for Discharging
-for capacitance, results in discharging_regression_results.items():
-    print(f"{capacitance} (Discharging): τ = {results['tau']:.2f} ± {results['tau_err']:.2f} s")
 
+if __name__ == "__main__":
+    main()
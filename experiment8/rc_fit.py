@@ -0,0 +1,155 @@
+"""
+Batched weighted exponential fits for RC charging and discharging data.
+
+Instead of fitting ln(I) against t with linregress, which biases tau and
+ignores the measurement errors, the exponential itself is fitted by weighted
+nonlinear least squares with an analytic Jacobian. Every curve of a stacked
+array (capacitors x runs x time points) is fitted at once by the batched
+Levenberg-Marquardt iteration of phys1494.damped.
+
+The current in an RC circuit decays as I0 exp(-t / tau) whether the capacitor
+is charging or discharging; with quantity='voltage' the capacitor voltage is
+fitted instead, which rises as V0 (1 - exp(-t / tau)) while charging.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from phys1494 import damped
+
+ExponentialFit = namedtuple(
+    'ExponentialFit',
+    [
+        'amplitude',
+        'tau',
+        'amplitude_err',
+        'tau_err',
+        'covariance',
+        'chi2',
+        'converged',
+        'failed',
+    ],
+)
+
+MODES = ('charging', 'discharging')
+QUANTITIES = ('current', 'voltage')
+
+
+def stack_runs(data):
+    """
+    Convert a {capacitance: {"time": [...], "current_1": [...], ...}} dict to
+    (names, time, runs) arrays, with runs shaped (capacitors, runs, times).
+    """
+    names = list(data)
+    time = np.asarray(data[names[0]]['time'], dtype=float)
+    runs = np.array([
+        [values[key] for key in sorted(values) if key.startswith('current')]
+        for values in data.values()
+    ], dtype=float)
+    return names, time, runs
+
+
+def _is_rising(mode, quantity):
+    if mode not in MODES:
+        raise ValueError(f'mode must be one of {MODES}, not {mode!r}')
+    if quantity not in QUANTITIES:
+        raise ValueError(
+            f'quantity must be one of {QUANTITIES}, not {quantity!r}'
+        )
+    return mode == 'charging' and quantity == 'voltage'
+
+
+def _model_and_jacobian(amplitude, tau, t, rising):
+    """Evaluate the model and its derivatives with respect to (amplitude, tau)."""
+    decay = np.exp(-t / tau)
+    d_tau = amplitude * t / tau**2 * decay
+    if rising:
+        return amplitude * (1 - decay), 1 - decay, -d_tau
+    return amplitude * decay, decay, d_tau
+
+
+def _initial_guess(t, y, sigma, rising):
+    """Linearized weighted fit giving a starting point for every curve."""
+    t_range = np.ptp(t, axis=-1)
+    if rising:
+        amplitude = 1.1 * np.max(y, axis=-1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z = np.log(1 - y / amplitude[..., None])
+            tau = -np.sum(t * t, axis=-1) / np.nansum(t * z, axis=-1)
+    else:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z = np.log(y)
+            w = np.where(y > 0, (y / sigma) ** 2, 0.0)
+            sw = w.sum(axis=-1)
+            t_mean = (w * t).sum(axis=-1) / sw
+            z_mean = np.nansum(w * z, axis=-1) / sw
+            dt = t - t_mean[..., None]
+            slope = np.nansum(w * dt * z, axis=-1) / (w * dt * dt).sum(axis=-1)
+            tau = -1 / slope
+            amplitude = np.exp(z_mean + t_mean / tau)
+    bad = ~np.isfinite(tau) | (tau <= 0) | ~np.isfinite(amplitude)
+    tau = np.where(bad, t_range, tau)
+    amplitude = np.where(bad, np.max(y, axis=-1), amplitude)
+    return amplitude, tau
+
+
+def fit_exponential(
+    time,
+    values,
+    sigma=1.0,
+    mode='discharging',
+    quantity='current',
+    absolute_sigma=False,
+    max_iter=100,
+    tol=1e-10,
+):
+    """
+    Fit every curve in values (shape (..., times)) at once.
+
+    time is shared by all curves or shaped like values, and sigma is a
+    scalar or an array broadcastable to values. Returns an ExponentialFit of
+    arrays shaped like values without the time axis. Unless absolute_sigma is
+    set, the covariance is scaled by the reduced chi-square, as
+    scipy.optimize.curve_fit does. failed marks the curves whose iteration
+    gave up (damping limit or max_iter) instead of converging.
+    """
+    rising = _is_rising(mode, quantity)
+    y = np.asarray(values, dtype=float)
+    t = np.broadcast_to(np.asarray(time, dtype=float), y.shape)
+    sigma = np.broadcast_to(np.asarray(sigma, dtype=float), y.shape)
+
+    def residuals(params):
+        f, d_amp, d_tau = _model_and_jacobian(
+            params[..., 0:1], params[..., 1:2], t, rising
+        )
+        jacobian = np.stack([d_amp, d_tau], axis=-1) / sigma[..., None]
+        return (y - f) / sigma, jacobian
+
+    def chi_square(params):
+        amplitude, tau = params[..., 0:1], params[..., 1:2]
+        with np.errstate(invalid='ignore', over='ignore'):
+            f = _model_and_jacobian(amplitude, np.abs(tau), t, rising)[0]
+            chi2 = np.sum(((y - f) / sigma) ** 2, axis=-1)
+        return np.where(tau[..., 0] > 0, chi2, np.inf)
+
+    start = np.stack(_initial_guess(t, y, sigma, rising), axis=-1)
+    fit = damped.damped_fit(
+        start, residuals, chi_square, max_iter=max_iter, tol=tol
+    )
+    if absolute_sigma:
+        covariance = damped.covariance(fit.normal)
+    else:
+        covariance = damped.covariance(
+            fit.normal, fit.objective, y.shape[-1] - 2
+        )
+
+    return ExponentialFit(
+        fit.params[..., 0],
+        fit.params[..., 1],
+        np.sqrt(covariance[..., 0, 0]),
+        np.sqrt(covariance[..., 1, 1]),
+        covariance,
+        fit.objective,
+        fit.converged,
+        fit.failed,
+    )
@@ -1,6 +1,8 @@
 import numpy as np
-import matplotlib.pyplot as plt
-import math
+
+from phys1494.instrument import staged
+
+from rlc_sweep import sweep
 
 # Constants
 L = 0.150  # Inductance in Henries (150mH)
@@ -27,6 +29,7 @@ data_capacitor = np.array([
 ])
 
 # Function to calculate phase shift
+@staged("transform", rows="data")
 def calculate_phase_shift(data):
     phase_shifts = []
     for freq, _, total_time, time_diff in data:
@@ -37,48 +40,62 @@ def calculate_phase_shift(data):
         phase_shifts.append((freq, phi, omega))
     return phase_shifts
 
-# Function to calculate theoretical phase shift
-def theoretical_phase_shift(omega, R, L, C):
-    tan_phi = (omega * L - 1 / (omega * C)) / R
-    return np.arctan(tan_phi)
-    
-
-# Calculate phase shifts
-measured_phase_shifts = calculate_phase_shift(data_phase_shift)
-inductor_phase_shifts = calculate_phase_shift(data_inductor)
-capacitor_phase_shifts = calculate_phase_shift(data_capacitor)
-
-# Plot phase shifts
-plt.figure(figsize=(12, 8))
-
-# Plotting measured phase shifts
-freqs, phases, omegas = zip(*measured_phase_shifts)
-plt.plot(freqs, phases, 'o-', label='Measured Phase Shift')
-
-# Plot theoretical phase shifts for different resistors
-for R in R_values:
-    theoretical_phases = [theoretical_phase_shift(omega, R, L, C) for omega in omegas]
-    plt.plot(freqs, theoretical_phases, '--', label=f'Theoretical Phase Shift (R={R} Ω)')
-
-# Adding a horizontal line at zero for reference
-plt.axhline(0, color='gray', linestyle='--')
-
-plt.xlabel('Frequency (Hz)')
-plt.ylabel('Phase Shift (Radians)')
-plt.title('Phase Shift vs Frequency')
-plt.legend()
-plt.grid(True)
-plt.show()
-
-# Print results
-print("Measured Phase Shifts (Radians):")
-for freq, phase, _ in measured_phase_shifts:
-    print(f"Frequency: {freq} Hz, Phase Shift: {phase:.2f} radians")
-
-print("\nPhase Shifts of the Inductor (Radians):")
-for freq, phase, _ in inductor_phase_shifts:
-    print(f"Frequency: {freq} Hz, Phase Shift: {phase:.2f} radians")
-
-print("\nPhase Shifts of the Capacitor (Radians):")
-for freq, phase, _ in capacitor_phase_shifts:
-    print(f"Frequency: {freq} Hz, Phase Shift: {phase:.2f} radians")
+
+def analyze():
+    """Measured phase shifts of the circuit, the inductor and the capacitor."""
+    measured_phase_shifts = calculate_phase_shift(data_phase_shift)
+    inductor_phase_shifts = calculate_phase_shift(data_inductor)
+    capacitor_phase_shifts = calculate_phase_shift(data_capacitor)
+    return measured_phase_shifts, inductor_phase_shifts, capacitor_phase_shifts
+
+
+@staged("plot")
+def plot_results(measured_phase_shifts):
+    import matplotlib.pyplot as plt
+
+    # Plot phase shifts
+    plt.figure(figsize=(12, 8))
+
+    # Plotting measured phase shifts
+    freqs, phases, omegas = zip(*measured_phase_shifts)
+    plt.plot(freqs, phases, 'o-', label='Measured Phase Shift')
+
+    # Plot theoretical phase shifts for different resistors
+    theoretical = sweep(omegas, R_values, L, C)
+    for R in R_values:
+        theoretical_phases, _ = theoretical.sel(R=R, L=L, C=C)
+        plt.plot(freqs, theoretical_phases, '--', label=f'Theoretical Phase Shift (R={R} Ω)')
+
+    # Adding a horizontal line at zero for reference
+    plt.axhline(0, color='gray', linestyle='--')
+
+    plt.xlabel('Frequency (Hz)')
+    plt.ylabel('Phase Shift (Radians)')
+    plt.title('Phase Shift vs Frequency')
+    plt.legend()
+    plt.grid(True)
+    plt.show()
+
+
+def main(plot=True):
+    measured_phase_shifts, inductor_phase_shifts, capacitor_phase_shifts = analyze()
+    if plot:
+        plot_results(measured_phase_shifts)
+
+    # Print results
+    print("Measured Phase Shifts (Radians):")
+    for freq, phase, _ in measured_phase_shifts:
+        print(f"Frequency: {freq} Hz, Phase Shift: {phase:.2f} radians")
+
+    print("\nPhase Shifts of the Inductor (Radians):")
+    for freq, phase, _ in inductor_phase_shifts:
+        print(f"Frequency: {freq} Hz, Phase Shift: {phase:.2f} radians")
+
+    print("\nPhase Shifts of the Capacitor (Radians):")
+    for freq, phase, _ in capacitor_phase_shifts:
+        print(f"Frequency: {freq} Hz, Phase Shift: {phase:.2f} radians")
+    return measured_phase_shifts, inductor_phase_shifts, capacitor_phase_shifts
+
+
+if __name__ == "__main__":
+    main()
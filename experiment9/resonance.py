@@ -1,6 +1,9 @@
-import matplotlib.pyplot as plt
 import numpy as np
 
+from phys1494.instrument import stage, staged
+
+from rlc_fit import fit_resonance, stack_sweeps
+
 # Data for each resistance value
 data_50_ohm = np.array([
     [110.9, 0.56], [143.2, 0.72], [186.8, 0.96], [202.7, 1.04], [232.5, 1.2],
@@ -34,7 +37,9 @@ measured_resonance = {
 
 # Expected resonance frequency
 expected_freq = 581.07  # Hz
+C = 500e-9  # Capacitance in Farads (500nF)
 
+@staged("transform", rows="data")
 def calculate_fwhm_and_uncertainty(data, freq_precision=1):
     max_voltage = np.max(data[:, 1])
     half_max_voltage = max_voltage / 2
@@ -51,31 +56,67 @@ def calculate_fwhm_and_uncertainty(data, freq_precision=1):
 def relative_accuracy(measured, expected):
     return abs((measured - expected) / expected) * 100
 
-# Plot settings
-plt.figure(figsize=(12, 8))
-
-# Plotting normalized data as points
-plt.scatter(data_50_ohm[:, 0], data_50_ohm[:, 1], color='blue', label='R = 50 Ω')
-plt.scatter(data_10_ohm[:, 0], data_10_ohm[:, 1], color='red', label='R = 10 Ω')
-plt.scatter(data_500_ohm[:, 0], data_500_ohm[:, 1], color='green', label='R = 500 Ω')
-
-# Additional plot settings
-plt.xlabel('Frequency (Hz)')
-plt.ylabel('Normalized Peak-to-Peak Voltage')
-plt.title('Normalized Vpp vs Frequency for Different Resistances')
-plt.legend()
-plt.grid(True)
-plt.show()
-
-# Calculate and print relative accuracy
-for R, freq in measured_resonance.items():
-    accuracy = relative_accuracy(freq, expected_freq)
-    print(f'Relative accuracy for R = {R} Ω: {accuracy:.2f}%')
-
-fwhm_10, unc_10 = calculate_fwhm_and_uncertainty(data_10_ohm)
-fwhm_50, unc_50 = calculate_fwhm_and_uncertainty(data_50_ohm)
-fwhm_500, unc_500 = calculate_fwhm_and_uncertainty(data_500_ohm)
-
-print(f"FWHM for 10 Ω resistor: {fwhm_10} Hz ± {unc_10} Hz")
-print(f"FWHM for 50 Ω resistor: {fwhm_50} Hz ± {unc_50} Hz")
-print(f"FWHM for 500 Ω resistor: {fwhm_500} Hz ± {unc_500} Hz")
\ No newline at end of file
+def analyze():
+    """
+    Relative accuracy of the measured resonances, the half-maximum widths of
+    the sweeps and the RLC response fit of all three sweeps.
+    """
+    accuracies = {R: relative_accuracy(freq, expected_freq) for R, freq in measured_resonance.items()}
+
+    fwhm = {
+        10: calculate_fwhm_and_uncertainty(data_10_ohm),
+        50: calculate_fwhm_and_uncertainty(data_50_ohm),
+        500: calculate_fwhm_and_uncertainty(data_500_ohm),
+    }
+
+    # Fit the series RLC response of all sweeps at once
+    frequencies, voltages = stack_sweeps(data_10_ohm, data_50_ohm, data_500_ohm)
+    with stage("fit", rows=voltages.size, function="fit_resonance"):
+        fit = fit_resonance(frequencies, voltages, capacitance=C)
+    return accuracies, fwhm, fit
+
+
+@staged("plot")
+def plot_results():
+    import matplotlib.pyplot as plt
+
+    # Plot settings
+    plt.figure(figsize=(12, 8))
+
+    # Plotting normalized data as points
+    plt.scatter(data_50_ohm[:, 0], data_50_ohm[:, 1], color='blue', label='R = 50 Ω')
+    plt.scatter(data_10_ohm[:, 0], data_10_ohm[:, 1], color='red', label='R = 10 Ω')
+    plt.scatter(data_500_ohm[:, 0], data_500_ohm[:, 1], color='green', label='R = 500 Ω')
+
+    # Additional plot settings
+    plt.xlabel('Frequency (Hz)')
+    plt.ylabel('Normalized Peak-to-Peak Voltage')
+    plt.title('Normalized Vpp vs Frequency for Different Resistances')
+    plt.legend()
+    plt.grid(True)
+    plt.show()
+
+
+def main(plot=True):
+    if plot:
+        plot_results()
+
+    accuracies, fwhm, fit = analyze()
+
+    # Print relative accuracy
+    for R, accuracy in accuracies.items():
+        print(f'Relative accuracy for R = {R} Ω: {accuracy:.2f}%')
+
+    for R, (width, uncertainty) in fwhm.items():
+        print(f"FWHM for {R} Ω resistor: {width} Hz ± {uncertainty} Hz")
+
+    for i, R in enumerate([10, 50, 500]):
+        print(f"R = {R} Ω: f0 = {fit.f0[i]:.1f} ± {fit.f0_err[i]:.1f} Hz, "
+              f"Q = {fit.q[i]:.3f} ± {fit.q_err[i]:.3f}, "
+              f"FWHM = {fit.fwhm[i]:.0f} ± {fit.fwhm_err[i]:.0f} Hz, "
+              f"R_total = {fit.r_total[i]:.0f} ± {fit.r_total_err[i]:.0f} Ω")
+    return accuracies, fwhm, fit
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
-import matplotlib.pyplot as plt
 import numpy as np
 import math
 
+from phys1494.instrument import stage, staged
+
+from rlc_fit import fit_resonance
+
 # Data for R = 500 Ohm
 data_500_ohm_new = np.array([
     [504.2, 14.4], [763.9, 17.2], [904.9, 18], [1040, 18.8], [1161, 18.8],
@@ -11,6 +14,7 @@ data_500_ohm_new = np.array([
 ])
 
 # Function to calculate FWHM
+@staged("transform", rows="data")
 def calculate_fwhm(data):
     max_voltage = np.max(data[:, 1])
     half_max_voltage = max_voltage / 2
@@ -24,20 +28,6 @@ def calculate_fwhm(data):
 # Normalize the data to the maximum Vpp
 data_500_ohm_new[:, 1] /= np.max(data_500_ohm_new[:, 1])
 
-# Plot settings
-plt.figure(figsize=(12, 8))
-
-# Plotting normalized data as points
-plt.scatter(data_500_ohm_new[:, 0], data_500_ohm_new[:, 1], color='green', label='R = 500 Ω')
-
-# Additional plot settings
-plt.xlabel('Frequency (Hz)')
-plt.ylabel('Normalized Peak-to-Peak Voltage')
-plt.title('Normalized Vpp vs Frequency for R = 500 Ω')
-plt.legend()
-plt.grid(True)
-plt.show()
-
 # Expected and measured resonance frequencies
 expected_freq = 1591     # Hz
 measured_freq = 1519.25  # Hz
@@ -45,15 +35,62 @@ measured_freq = 1519.25  # Hz
 # Capacitance in Farads (500 nF)
 C = 500e-9  # Farads
 
-# Calculating the relative error
-relative_error = abs((expected_freq - measured_freq) / expected_freq) * 100
 
-# Calculating the inductance L
-L = 1 / ((2 * math.pi * measured_freq) ** 2 * C)
+def analyze(data=data_500_ohm_new):
+    """
+    Inductance from the measured resonance, the half-maximum width, and the
+    RLC response fit giving the resonance and L with uncertainties, for
+    data of [frequency, Vpp] rows.
+    """
+    # Calculating the relative error
+    relative_error = abs((expected_freq - measured_freq) / expected_freq) * 100
+
+    # Calculating the inductance L
+    L = 1 / ((2 * math.pi * measured_freq) ** 2 * C)
+
+    fwhm_unknown = calculate_fwhm(data)
+
+    # Fit the series RLC response for the resonant frequency and L with uncertainties
+    with stage("fit", rows=len(data), function="fit_resonance"):
+        fit = fit_resonance(data[:, 0], data[:, 1], capacitance=C)
+    return {'L': L, 'relative_error': relative_error, 'fwhm': fwhm_unknown, 'fit': fit}
+
+
+@staged("plot")
+def plot_results():
+    import matplotlib.pyplot as plt
+
+    # Plot settings
+    plt.figure(figsize=(12, 8))
+
+    # Plotting normalized data as points
+    plt.scatter(data_500_ohm_new[:, 0], data_500_ohm_new[:, 1], color='green', label='R = 500 Ω')
+
+    # Additional plot settings
+    plt.xlabel('Frequency (Hz)')
+    plt.ylabel('Normalized Peak-to-Peak Voltage')
+    plt.title('Normalized Vpp vs Frequency for R = 500 Ω')
+    plt.legend()
+    plt.grid(True)
+    plt.show()
+
+
+def main(plot=True):
+    if plot:
+        plot_results()
+
+    results = analyze()
+    fit = results['fit']
+
+    # Outputting the results
+    print(f"Measured Inductance: {results['L']:.5f} H")
+    print(f"Relative Error: {results['relative_error']:.2f}%")
+    print(f"FWHM: {results['fwhm']} Hz")
+    print(f"Fitted Resonance: {fit.f0:.1f} ± {fit.f0_err:.1f} Hz, Q = {fit.q:.3f} ± {fit.q_err:.3f}")
+    print(f"Fitted Inductance: {fit.inductance:.5f} ± {fit.inductance_err:.5f} H")
+    print(f"Fitted FWHM: {fit.fwhm:.0f} ± {fit.fwhm_err:.0f} Hz, R_total = {fit.r_total:.0f} ± {fit.r_total_err:.0f} Ω")
+    return results
 
-# Outputting the results
-print(f"Measured Inductance: {L:.5f} H")
-print(f"Relative Error: {relative_error:.2f}%")
 
-fwhm_unknown = calculate_fwhm(data_500_ohm_new)
-print(f"FWHM: {fwhm_unknown} Hz")
+if __name__ == "__main__":
+    main()
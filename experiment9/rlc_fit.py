@@ -0,0 +1,193 @@
+"""
+Batched fits of the series RLC amplitude response.
+
+The peak-to-peak voltage across the resistor of a driven series RLC circuit
+follows
+
+    V(f) = A / sqrt(1 + Q^2 (f / f0 - f0 / f)^2)
+
+with resonant frequency f0 = 1 / (2 pi sqrt(L C)) and quality factor
+Q = sqrt(L / C) / R_total, where R_total includes the resistance of the
+inductor and the source. Every sweep of a stacked array (sweeps x
+frequencies) is fitted for (A, f0, Q) at once by the batched
+Levenberg-Marquardt iteration of phys1494.damped with an analytic Jacobian;
+flat or dead sweeps whose normal equations are singular are marked failed
+with NaN parameters. Sweeps of different lengths are padded with NaN, which
+fit_resonance ignores.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from phys1494 import damped
+
+ResonanceFit = namedtuple(
+    'ResonanceFit',
+    [
+        'amplitude',
+        'f0',
+        'q',
+        'fwhm',
+        'r_total',
+        'inductance',
+        'f0_err',
+        'q_err',
+        'fwhm_err',
+        'r_total_err',
+        'inductance_err',
+        'covariance',
+        'chi2',
+        'converged',
+        'failed',
+    ],
+)
+
+# The amplitude falls to half its maximum where Q (f / f0 - f0 / f) = +-sqrt(3)
+HALF_MAX = np.sqrt(3)
+
+
+def stack_sweeps(*sweeps):
+    """
+    Stack [frequency, Vpp] arrays into (frequencies, values) arrays of shape
+    (sweeps, points), padding shorter sweeps with NaN.
+    """
+    points = max(len(sweep) for sweep in sweeps)
+    stacked = np.full((len(sweeps), points, 2), np.nan)
+    for i, sweep in enumerate(sweeps):
+        stacked[i, :len(sweep)] = sweep
+    return stacked[..., 0], stacked[..., 1]
+
+
+def _model_and_jacobian(amplitude, f0, q, f):
+    """Evaluate the model and its derivatives with respect to (A, f0, Q)."""
+    u = f / f0 - f0 / f
+    root = np.sqrt(1 + q * q * u * u)
+    value = amplitude / root
+    d_amplitude = 1 / root
+    d_f0 = value * q * q * u * (f / f0 + f0 / f) / (f0 * root * root)
+    d_q = -value * q * u * u / (root * root)
+    return value, d_amplitude, d_f0, d_q
+
+
+def _initial_guess(f, y):
+    """Peak sample and half-maximum width of every sweep."""
+    peak = np.nanargmax(y, axis=-1)[..., None]
+    amplitude = np.take_along_axis(y, peak, axis=-1)[..., 0]
+    f0 = np.take_along_axis(f, peak, axis=-1)[..., 0]
+    above = y >= amplitude[..., None] / 2
+    width = np.max(np.where(above, f, -np.inf), axis=-1) - np.min(
+        np.where(above, f, np.inf), axis=-1
+    )
+    q = np.where(width > 0, HALF_MAX * f0 / width, 1.0)
+    return amplitude, f0, q
+
+
+def fit_resonance(
+    frequency,
+    values,
+    sigma=1.0,
+    capacitance=None,
+    absolute_sigma=False,
+    max_iter=200,
+    tol=1e-10,
+):
+    """
+    Fit every sweep in values (shape (..., frequencies)) at once.
+
+    frequency is shared by all sweeps or shaped like values, and sigma is a
+    scalar or an array broadcastable to values; NaN points are skipped.
+    Returns a ResonanceFit of arrays shaped like values without the
+    frequency axis. fwhm is the full width of the amplitude curve at half
+    its maximum, sqrt(3) f0 / Q. With the capacitance (in F), r_total and
+    the inductance follow from f0 and Q; otherwise they are NaN.
+
+    covariance holds the (A, f0, Q) covariance and the errors of the derived
+    quantities are propagated from it. Unless absolute_sigma is set it is
+    scaled by the reduced chi-square, as scipy.optimize.curve_fit does.
+    failed marks the sweeps whose iteration gave up (damping limit or
+    max_iter) or that could not be fitted (singular normal equations, NaN
+    parameters) instead of converging. The covariance is NaN for the latter
+    and, when it is scaled, for sweeps with fewer than four points.
+    """
+    y = np.asarray(values, dtype=float)
+    f = np.broadcast_to(np.asarray(frequency, dtype=float), y.shape)
+    sigma = np.broadcast_to(np.asarray(sigma, dtype=float), y.shape)
+    valid = np.isfinite(y) & np.isfinite(f)
+    params = np.stack(
+        _initial_guess(np.where(valid, f, np.nan), np.where(valid, y, np.nan)),
+        axis=-1,
+    )
+
+    # Padding gets zero weight and a harmless frequency
+    weight = np.where(valid, 1 / sigma, 0.0)
+    y = np.where(valid, y, 0.0)
+    f = np.where(valid, f, 1.0)
+
+    def residuals(params):
+        value, *derivatives = _model_and_jacobian(
+            params[..., 0:1], params[..., 1:2], params[..., 2:3], f
+        )
+        jacobian = np.stack(derivatives, axis=-1) * weight[..., None]
+        return (y - value) * weight, jacobian
+
+    def chi_square(params):
+        with np.errstate(invalid='ignore', over='ignore', divide='ignore'):
+            value = _model_and_jacobian(
+                params[..., 0:1], params[..., 1:2], params[..., 2:3], f
+            )[0]
+            chi2 = np.sum(((y - value) * weight) ** 2, axis=-1)
+        return np.where(params[..., 1] > 0, chi2, np.inf)
+
+    fit = damped.damped_fit(
+        params, residuals, chi_square, max_iter=max_iter, tol=tol
+    )
+    params, chi2 = fit.params, fit.objective
+
+    # Q only enters squared, so report it positive
+    params[..., 2] = np.abs(params[..., 2])
+    normal, _ = damped.normal_equations(*residuals(params))
+    if absolute_sigma:
+        covariance = damped.covariance(normal)
+    else:
+        covariance = damped.covariance(normal, chi2, valid.sum(axis=-1) - 3)
+
+    amplitude, f0, q = np.moveaxis(params, -1, 0)
+    var_f0 = covariance[..., 1, 1]
+    var_q = covariance[..., 2, 2]
+    cov_f0_q = covariance[..., 1, 2]
+
+    def propagate(d_f0, d_q):
+        """Standard error of a quantity with the given gradient in (f0, Q)."""
+        return np.sqrt(
+            d_f0 * d_f0 * var_f0 + 2 * d_f0 * d_q * cov_f0_q + d_q * d_q * var_q
+        )
+
+    fwhm = HALF_MAX * f0 / q
+    fwhm_err = propagate(fwhm / f0, -fwhm / q)
+    if capacitance is None:
+        r_total = inductance = np.full_like(f0, np.nan)
+        r_total_err = inductance_err = np.full_like(f0, np.nan)
+    else:
+        # R_total = 1 / (2 pi f0 Q C) and L = 1 / ((2 pi f0)^2 C)
+        r_total = 1 / (2 * np.pi * f0 * q * capacitance)
+        r_total_err = propagate(-r_total / f0, -r_total / q)
+        inductance = 1 / ((2 * np.pi * f0) ** 2 * capacitance)
+        inductance_err = propagate(-2 * inductance / f0, 0.0)
+
+    return ResonanceFit(
+        amplitude,
+        f0,
+        q,
+        fwhm,
+        r_total,
+        inductance,
+        np.sqrt(var_f0),
+        np.sqrt(var_q),
+        fwhm_err,
+        r_total_err,
+        inductance_err,
+        covariance,
+        chi2,
+        fit.converged,
+        fit.failed,
+    )
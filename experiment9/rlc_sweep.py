@@ -0,0 +1,126 @@
+"""
+Theoretical series RLC response over a grid of circuit parameters.
+
+The phase shift arctan((omega L - 1 / (omega C)) / R) of
+theoretical_phase_shift and the amplitude of the resistor voltage relative to
+the drive, R / sqrt(R^2 + (omega L - 1 / (omega C))^2), are evaluated over the
+full omega x R x L x C grid by broadcasting. The grid is computed in blocks
+of the omega axis holding at most chunk_size points each, so temporaries stay
+bounded. iter_sweep yields the blocks; sweep collects them into arrays, which
+for grids larger than MAX_IN_MEMORY points must be memory-mapped files passed
+as out.
+"""
+import os
+
+import numpy as np
+
+DIMS = ('omega', 'R', 'L', 'C')
+DEFAULT_CHUNK_SIZE = 1 << 22
+MAX_IN_MEMORY = 1 << 26
+
+
+def reactance(omega, L, C):
+    """Net reactance omega L - 1 / (omega C) of the series LC, in ohms."""
+    return omega * L - 1 / (omega * C)
+
+
+def theoretical_phase_shift(omega, R, L, C):
+    """Phase (radians) of the resistor voltage relative to the drive."""
+    return np.arctan(reactance(omega, L, C) / R)
+
+
+class SweepResult:
+    def __init__(self, phase, amplitude, coords):
+        """
+        Phase and amplitude arrays with one axis per entry of DIMS, and the
+        coordinate values along each axis in coords.
+        """
+        self.phase = phase
+        self.amplitude = amplitude
+        self.dims = DIMS
+        self.coords = coords
+
+    @property
+    def shape(self):
+        return self.phase.shape
+
+    def index(self, **labels):
+        """
+        Index tuple selecting the grid points nearest to the given labels,
+        e.g. result.index(R=50) for every omega, L and C at R = 50 Ω.
+        """
+        index = []
+        for dim in self.dims:
+            if dim in labels:
+                values = self.coords[dim]
+                index.append(int(np.argmin(np.abs(values - labels.pop(dim)))))
+            else:
+                index.append(slice(None))
+        if labels:
+            raise ValueError(f'unknown dimensions {sorted(labels)}')
+        return tuple(index)
+
+    def sel(self, **labels):
+        """(phase, amplitude) at the grid points nearest to the labels."""
+        index = self.index(**labels)
+        return self.phase[index], self.amplitude[index]
+
+
+def iter_sweep(omega, R, L, C, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield (omega slice, phase, amplitude) blocks covering the grid in order
+    of omega, each holding at most chunk_size points (or one omega value).
+    """
+    omega, R, L, C = (
+        np.atleast_1d(np.asarray(values, dtype=float))
+        for values in (omega, R, L, C)
+    )
+    r = R[:, None, None]
+    l = L[None, :, None]
+    c = C[None, None, :]
+    block = max(1, chunk_size // (len(R) * len(L) * len(C)))
+    for start in range(0, len(omega), block):
+        w = omega[start:start + block, None, None, None]
+        phase = theoretical_phase_shift(w, r, l, c)
+        amplitude = r / np.hypot(r, reactance(w, l, c))
+        yield slice(start, start + len(w)), phase, amplitude
+
+
+def sweep(omega, R, L, C, chunk_size=DEFAULT_CHUNK_SIZE, out=None):
+    """
+    Evaluate the phase and amplitude over the omega x R x L x C grid.
+
+    Each parameter is a scalar or a 1-D array of values. out may be a
+    (phase, amplitude) pair of preallocated arrays of the grid shape, such
+    as np.lib.format.open_memmap files, to be filled block by block, or a
+    directory in which phase.npy and amplitude.npy are created as such
+    files. Without out, grids of more than MAX_IN_MEMORY points raise
+    ValueError rather than being allocated on the heap.
+    """
+    coords = {
+        dim: np.atleast_1d(np.asarray(values, dtype=float))
+        for dim, values in zip(DIMS, (omega, R, L, C))
+    }
+    shape = tuple(len(values) for values in coords.values())
+    if out is None:
+        if np.prod(shape) > MAX_IN_MEMORY:
+            raise ValueError(
+                f'a {shape} grid does not fit in memory; pass out (a '
+                'directory or memory-mapped arrays) or use iter_sweep'
+            )
+        out = np.empty(shape), np.empty(shape)
+    elif isinstance(out, (str, os.PathLike)):
+        os.makedirs(out, exist_ok=True)
+        out = tuple(
+            np.lib.format.open_memmap(
+                os.path.join(out, f'{name}.npy'), mode='w+', shape=shape
+            )
+            for name in ('phase', 'amplitude')
+        )
+    phase, amplitude = out
+    for index, phase_block, amplitude_block in iter_sweep(
+        *coords.values(), chunk_size=chunk_size
+    ):
+        phase[index] = phase_block
+        amplitude[index] = amplitude_block
+    return SweepResult(phase, amplitude, coords)
@@ -0,0 +1,141 @@
+"""
+Phase shift between two raw oscilloscope channels at the drive frequency.
+
+Instead of reading the period and the time difference off the scope by hand
+(calculate_phase_shift in phase_shift.py), the capture is projected onto
+exp(-i omega t) at the drive frequency, one Hann-windowed segment at a time.
+The phase of channel b relative to channel a is the angle of the summed
+cross products of the two projections, and the scatter of the per-segment
+phases gives its uncertainty. By default a capture is split into at least
+MIN_SEGMENTS segments of at most MAX_SEGMENT samples, each spanning at least
+MIN_CYCLES drive periods. Only one segment is held in memory as floats, so
+captures of any length can be read from memory-mapped files.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+MAX_SEGMENT = 1 << 20
+MIN_SEGMENTS = 8
+MIN_CYCLES = 4
+
+PhaseEstimate = namedtuple(
+    'PhaseEstimate',
+    ['phase', 'phase_err', 'frequency', 'amplitude_a', 'amplitude_b', 'segments'],
+)
+
+
+def load_trace(path, dtype=None, channels=2):
+    """
+    Memory-map a capture as an array of shape (samples, channels): a .npy
+    file as saved, or a raw file of interleaved samples of the given dtype.
+    """
+    if str(path).endswith('.npy'):
+        return np.load(path, mmap_mode='r')
+    if dtype is None:
+        raise ValueError('dtype is required for raw capture files')
+    return np.memmap(path, dtype=dtype, mode='r').reshape(-1, channels)
+
+
+def estimate_frequency(samples, sample_rate):
+    """
+    Frequency of the strongest spectral peak of samples, refined by
+    parabolic interpolation of the log magnitude around the peak bin.
+    """
+    samples = np.asarray(samples, dtype=float)
+    windowed = (samples - samples.mean()) * np.hanning(len(samples))
+    spectrum = np.abs(np.fft.rfft(windowed))
+    peak = int(np.argmax(spectrum[1:-1])) + 1
+    left, centre, right = np.log(spectrum[peak - 1:peak + 2] + 1e-300)
+    offset = 0.5 * (left - right) / (left - 2 * centre + right)
+    return (peak + offset) * sample_rate / len(samples)
+
+
+def _project(segment, kernel):
+    """
+    Complex projections of both channels of a (samples, 2) segment, from
+    the real (2, samples) kernel of windowed cosine and sine rows.
+    """
+    segment = np.asarray(segment, dtype=float)
+    real, imag = kernel @ (segment - segment.mean(axis=0))
+    return real + 1j * imag
+
+
+def estimate_phase(
+    channel_a,
+    channel_b=None,
+    sample_rate=1.0,
+    frequency=None,
+    segment_size=None,
+):
+    """
+    Phase (radians, in (-pi, pi]) of channel_b relative to channel_a at the
+    drive frequency; positive when channel_b leads.
+
+    channel_a is either one channel or, with channel_b omitted, a
+    (samples, 2) capture such as returned by load_trace. frequency is
+    estimated from the first MAX_SEGMENT samples when not given. The capture
+    is processed in segments of segment_size samples, chosen from its length
+    when not given; phase_err is the standard error of the per-segment
+    phases and is NaN for a single segment, which only captures shorter
+    than MIN_CYCLES drive periods give by default. The amplitudes are those
+    of the sinusoid at the drive frequency.
+    """
+    if channel_b is None:
+        capture = channel_a
+        n_samples = capture.shape[0]
+    else:
+        n_samples = min(len(channel_a), len(channel_b))
+
+    def segment(start, stop):
+        if channel_b is None:
+            return capture[start:stop]
+        return np.column_stack((channel_a[start:stop], channel_b[start:stop]))
+
+    if frequency is None:
+        first = segment(0, min(MAX_SEGMENT, n_samples))[:, 0]
+        frequency = estimate_frequency(first, sample_rate)
+    omega = 2 * np.pi * frequency / sample_rate
+    if segment_size is None:
+        min_size = int(np.ceil(MIN_CYCLES * 2 * np.pi / omega))
+        segment_size = min(MAX_SEGMENT, max(n_samples // MIN_SEGMENTS, min_size))
+    segment_size = min(segment_size, n_samples)
+
+    def make_kernel(size):
+        window = np.hanning(size)
+        angle = omega * np.arange(size)
+        kernel = np.stack([window * np.cos(angle), -window * np.sin(angle)])
+        return kernel, window.sum()
+
+    kernel, window_sum = make_kernel(segment_size)
+    projections = []
+    for start in range(0, n_samples, segment_size):
+        stop = min(start + segment_size, n_samples)
+        if stop - start == segment_size:
+            local, norm = kernel, window_sum
+        elif stop - start >= segment_size // 2:
+            local, norm = make_kernel(stop - start)
+        else:
+            break  # too short a tail to resolve the drive frequency
+        # Each segment's time origin is its own first sample, which rotates
+        # both channels alike and cancels in the phase difference
+        projections.append(_project(segment(start, stop), local) / norm)
+
+    projections = np.array(projections)
+    a, b = projections[:, 0], projections[:, 1]
+    cross = b * np.conj(a)
+    phase = np.angle(cross.sum())
+    segment_phases = np.angle(cross * np.exp(-1j * phase))
+    if len(cross) > 1:
+        phase_err = segment_phases.std(ddof=1) / np.sqrt(len(cross))
+    else:
+        phase_err = np.nan
+
+    return PhaseEstimate(
+        phase,
+        phase_err,
+        frequency,
+        2 * np.abs(a).mean(),
+        2 * np.abs(b).mean(),
+        len(cross),
+    )
@@ -0,0 +1,3 @@
+"""
+Shared tools for the PHYS1494 analysis scripts.
+"""
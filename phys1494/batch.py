@@ -0,0 +1,332 @@
+"""
+Batch analysis of many datasets per experiment.
+
+A manifest (JSON) lists dataset files per experiment and script, with paths
+relative to the manifest:
+
+    {
+        "experiment8": {"capacitor_charging": ["section01.json", ...]},
+        "experiment10": {"beta_particles": ["section01.csv", ...]},
+        "experiment5": {"angular_position_intensity": [["a_1.txt", "a_2.txt"]]}
+    }
+
+Each dataset is loaded into the arguments its script's analyze() takes in
+place of the module-level data: JSON for the dict-shaped data (trials of
+experiment2, data of experiment3 and experiment8, the columns of experiment4),
+CSV with a header row for the array-shaped data (the rows of experiment9 and
+experiment10), the original CSV formats of experiment1, and a list of trial
+files for experiment5. The scalar results of every dataset are collected into
+one table with a row per (dataset, quantity).
+
+Datasets are spread over a process pool whose workers import the scripts
+once and keep them, so every dataset after the first costs only its analysis.
+The linregress, polyfit and curve_fit calls of the scripts go through the
+shared on-disk fit cache (phys1494.fitcache), so those fits are not repeated
+for datasets that have not changed when a batch is run again; the batched
+fits (phys1494.grouped and the exponential, resonance and attenuation fits
+of experiments 8 to 10) are cheap enough to be recomputed every time.
+
+Usage (from the repository root):
+
+    python -m phys1494.batch manifest.json [--out results.csv] [--jobs N]
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from phys1494.experiments import load
+from phys1494.instrument import context, stage
+from phys1494.paths import REPO_ROOT
+
+COLUMNS = ["experiment", "script", "dataset", "quantity", "value", "error"]
+
+
+def _read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _read_table(path):
+    """Rows of a comma-separated file with one header line, as a 2-D array."""
+    return np.loadtxt(path, delimiter=",", skiprows=1, ndmin=2)
+
+
+def _gravitational_constant(module, path):
+    results = module.analyze(path)
+    return {
+        "slope": results["slope"],
+        "slope_err": results["std_err"],
+        "intercept": results["intercept"],
+        "intercept_err": results["SE_intercept"],
+        "g": results["g_estimated"],
+        "g_err": results["sigma_g"],
+    }
+
+
+def _motion_analyzer(module, path):
+    analyzer = module.CoefficientAnalyzer(path)
+    analyzer.process_all_trials(vectorized=True)
+    return {
+        "trials": analyzer.N,
+        "e_mean": analyzer.e_mean,
+        "e_std": analyzer.sigma,
+        "e_mean_err": analyzer.sigma_mean,
+        "e_weighted_mean": analyzer.e_weighted_mean,
+        "e_weighted_mean_err": analyzer.sigma_weighted_mean,
+    }
+
+
+def _velocity_acceleration_graph(module, path):
+    v_final, v_initial = module.average_velocities(path)
+    return {"v_final_mean": v_final, "v_initial_mean": v_initial}
+
+
+def _bounding_box_analysis(module, path):
+    results = module.analyze_trials(_read_json(path))
+    values = {}
+    for trial, result in results.items():
+        values[f"{trial} mean_x"], values[f"{trial} mean_y"] = result["Mean Position"]
+        values[f"{trial} std_x"], values[f"{trial} std_y"] = result["Standard Deviation"]
+    return values
+
+
+def _current_carrying_rod(module, path):
+    fit = module.analyze(_read_json(path))
+    values = {}
+    for current, B, B_err in zip(fit.keys, fit.slope, fit.stderr):
+        values[f"B[I={current}]"] = B
+        values[f"B_err[I={current}]"] = B_err
+    return values
+
+
+def _current_curvature(module, path):
+    results_df, em_values, sigma_em_values = module.analyze(**_read_json(path))
+    values = {}
+    for row in results_df.itertuples(index=False):
+        values[f"slope[V={row[0]}]"] = row[1]
+        values[f"slope_err[V={row[0]}]"] = row[3]
+    values["e_over_m"] = np.mean(em_values)
+    values["e_over_m_err"] = np.sqrt(np.mean(sigma_em_values))
+    return values
+
+
+def _angular_position_intensity(module, paths):
+    angular_positions, avg_intensities, std_intensities = module.analyze(paths)
+    peak = int(np.argmax(avg_intensities))
+    return {
+        "peak_position": angular_positions[peak],
+        "peak_intensity": avg_intensities[peak],
+        "peak_intensity_std": std_intensities[peak],
+    }
+
+
+def _linear_position_intensity(module, paths):
+    results = module.analyze(paths)
+    return {
+        "maxima": len(results["maxima_positions"]),
+        "slope": results["slope"],
+        "intercept": results["intercept"],
+        "wavelength": results["wavelength"],
+        "slit_width": results["slit_width"],
+    }
+
+
+def _capacitor(module, path):
+    results = module.analyze(_read_json(path))
+    values = {}
+    for capacitance, fit in results["regression_results"].items():
+        values[f"tau[{capacitance}]"] = fit["tau"]
+        values[f"tau_err[{capacitance}]"] = fit["tau_err"]
+    for capacitance, bootstrap in results["bootstraps"].items():
+        values[f"bootstrap_tau[{capacitance}]"] = bootstrap.tau
+        values[f"bootstrap_tau_err[{capacitance}]"] = bootstrap.tau_err
+    if "ratio_30_20" in results:
+        values["ratio_30_20"], values["ratio_30_20_err"] = results["ratio_30_20"]
+    return values
+
+
+def _resonance_unknown_L(module, path):
+    results = module.analyze(_read_table(path))
+    fit = results["fit"]
+    return {
+        "fwhm_half_max": results["fwhm"],
+        "f0": fit.f0,
+        "f0_err": fit.f0_err,
+        "q": fit.q,
+        "q_err": fit.q_err,
+        "fwhm": fit.fwhm,
+        "fwhm_err": fit.fwhm_err,
+        "inductance": fit.inductance,
+        "inductance_err": fit.inductance_err,
+    }
+
+
+def _background(module, path):
+    table = _read_table(path)
+    polynomial = module.analyze(table[:, 0], table[:, 1])
+    return {f"coefficient_{power}": c for power, c in enumerate(polynomial.coeffs[::-1])}
+
+
+def _beta_particles(module, path):
+    results = module.analyze(_read_table(path))
+    fit = results["fit"]
+    return {
+        "energy_max": results["energy_max"],
+        "num_std_devs": results["num_std_devs"],
+        "mu": fit.mu,
+        "mu_err": fit.mu_err,
+    }
+
+
+def _gamma_particles(module, path):
+    results = module.analyze(_read_table(path))
+    fit = results["fit"]
+    return {
+        "absorption_coefficient": results["absorption_coefficient"],
+        "absorption_coefficient_err": results["std_err"],
+        "mu": fit.mu,
+        "mu_err": fit.mu_err,
+    }
+
+
+# How to analyze one dataset of each supported script, returning its scalar
+# results by name. experiment9's phase_shift and resonance read hand-entered
+# readings and are not batched.
+ANALYSES = {
+    ("experiment1", "gravitational_constant"): _gravitational_constant,
+    ("experiment1", "motion_analyzer"): _motion_analyzer,
+    ("experiment1", "velocity_acceleration_graph"): _velocity_acceleration_graph,
+    ("experiment2", "run_bouding_box_analysis"): _bounding_box_analysis,
+    ("experiment3", "current_carrying_rod_analysis"): _current_carrying_rod,
+    ("experiment4", "current_curvature_anlysis"): _current_curvature,
+    ("experiment5", "angular_position_intensity"): _angular_position_intensity,
+    ("experiment5", "linear_position_relative_intensity"): _linear_position_intensity,
+    ("experiment8", "capacitor_charging"): _capacitor,
+    ("experiment8", "capacitor_discharging"): _capacitor,
+    ("experiment9", "resonance_unkown_L"): _resonance_unknown_L,
+    ("experiment10", "background"): _background,
+    ("experiment10", "beta_particles"): _beta_particles,
+    ("experiment10", "gamma_particles"): _gamma_particles,
+}
+
+
+def read_manifest(path):
+    """
+    Return the (experiment, script, dataset) tasks of a manifest in order,
+    with dataset paths made absolute; a dataset is one path or, for
+    experiment5, a list of paths.
+    """
+    base = Path(path).resolve().parent
+    tasks = []
+    for experiment, scripts in _read_json(path).items():
+        for script, datasets in scripts.items():
+            script = script[:-3] if script.endswith(".py") else script
+            if (experiment, script) not in ANALYSES:
+                raise ValueError(f"no batch analysis for {experiment}/{script}.py")
+            for dataset in datasets:
+                if isinstance(dataset, list):
+                    dataset = [str(base / p) for p in dataset]
+                else:
+                    dataset = str(base / dataset)
+                tasks.append((experiment, script, dataset))
+    return tasks
+
+
+def _warm(scripts, root):
+    """Pool initializer: import every script of the batch once per worker."""
+    for experiment, script in scripts:
+        load(experiment, script, root)
+
+
+def analyze_dataset(task, root=REPO_ROOT):
+    """
+    Analyze one (experiment, script, dataset) task, returning the task, its
+    results by quantity and the error message if the analysis failed.
+    """
+    experiment, script, dataset = task
+    try:
+        module = load(experiment, script, root)
+        with context(experiment=experiment, script=script, dataset=dataset), stage("analyze"):
+            values = ANALYSES[experiment, script](module, dataset)
+    except Exception as exc:  # report and keep analyzing the rest
+        return task, {}, repr(exc)
+    return task, {name: float(np.squeeze(value)) for name, value in values.items()}, None
+
+
+def run_batch(tasks, jobs=None, root=REPO_ROOT):
+    """
+    Analyze every task, in a pool of jobs worker processes (all cores by
+    default) or in this process when jobs is 1, and return the results in
+    the order of tasks.
+    """
+    scripts = list(dict.fromkeys(task[:2] for task in tasks))
+    if jobs == 1:
+        _warm(scripts, root)
+        return [analyze_dataset(task, root) for task in tasks]
+
+    # Hand out tasks in batches to keep the per-task overhead small
+    chunksize = max(1, len(tasks) // (4 * (jobs or os.cpu_count() or 1)))
+    with ProcessPoolExecutor(
+        max_workers=jobs, initializer=_warm, initargs=(scripts, str(root))
+    ) as pool:
+        return list(
+            pool.map(analyze_dataset, tasks, [str(root)] * len(tasks), chunksize=chunksize)
+        )
+
+
+def write_results(results, path, base=None):
+    """
+    Write the results of run_batch to a CSV file with COLUMNS, one row per
+    quantity of each dataset and one row with the error of a failed one.
+    Dataset paths are written relative to base when given.
+    """
+
+    def name(dataset):
+        if isinstance(dataset, list):
+            return ";".join(name(p) for p in dataset)
+        if base is None:
+            return dataset
+        try:
+            return str(Path(dataset).relative_to(base))
+        except ValueError:
+            return dataset
+
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for (experiment, script, dataset), values, error in results:
+            if error is not None:
+                writer.writerow([experiment, script, name(dataset), "", "", error])
+            for quantity, value in values.items():
+                writer.writerow([experiment, script, name(dataset), quantity, repr(value), ""])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("manifest", help="JSON manifest of datasets")
+    parser.add_argument("--out", default="results.csv", help="results table (CSV)")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes")
+    args = parser.parse_args(argv)
+
+    try:
+        tasks = read_manifest(args.manifest)
+    except ValueError as exc:
+        parser.error(str(exc))
+    results = run_batch(tasks, args.jobs)
+    write_results(results, args.out, base=Path(args.manifest).resolve().parent)
+
+    failed = [task for task, _, error in results if error is not None]
+    print(f"{len(results) - len(failed)} of {len(results)} datasets analyzed, results in {args.out}")
+    for experiment, script, dataset in failed:
+        print(f"failed: {experiment}/{script}.py {dataset}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,326 @@
+"""
+Scaling benchmarks of the analysis hot paths.
+
+Every benchmark builds synthetic input of a given number of rows, outside the
+timed region, and times one call of the function under test; the best of
+--repeat runs is kept, and the peak memory allocated during one further call
+is measured with tracemalloc (which also tracks NumPy's buffers). Results are
+written to a JSON file and compared against a stored baseline: a benchmark
+regresses when its time or peak memory exceeds the baseline by more than
+--tolerance, both in the first run and when it is measured again. Times below
+MIN_SECONDS and peaks below MIN_BYTES are compared as those floors, so noise
+on the smallest sizes is not reported. When the baseline was measured with
+another Python or NumPy minor version or on another machine type (the
+COMPARED fields of the environment), regressions are printed as warnings
+only; patch releases and other platform details do not matter.
+
+Usage (from the repository root):
+
+    python -m phys1494.benchmark [name ...] [--sizes 1000 100000] [--max-size N]
+        [--repeat 5] [--out benchmark.json] [--baseline benchmarks/baseline.json]
+        [--save-baseline] [--tolerance 0.25]
+"""
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+from phys1494.experiments import load
+from phys1494.paths import REPO_ROOT
+
+SIZES = [10**3, 10**4, 10**5, 10**6, 10**7]
+BASELINE = REPO_ROOT / "benchmarks" / "baseline.json"
+DEFAULT_TOLERANCE = 0.25
+MIN_SECONDS = 1e-2
+MIN_BYTES = 2**20
+
+# environment() fields that have to match the baseline's for a regression to
+# fail the run
+COMPARED = ("python", "numpy", "machine")
+
+# name -> (experiment, script, setup); setup(module, n, rng, workdir) builds
+# the input of n rows and returns the zero-argument call to time
+BENCHMARKS = {}
+
+
+def benchmark(name, experiment, script):
+    """Register a setup function as the benchmark name of a script."""
+
+    def register(setup):
+        BENCHMARKS[name] = (experiment, script, setup)
+        return setup
+
+    return register
+
+
+@benchmark("process_all_trials", "experiment1", "motion_analyzer")
+def _process_all_trials(module, n, rng, workdir):
+    import pandas as pd
+
+    v_initial = rng.uniform(0.1, 0.6, n)
+    frame = pd.DataFrame({
+        "Trial #": np.arange(1, n + 1),
+        "v final": -v_initial * rng.normal(0.93, 0.03, n),
+        "v initial": v_initial,
+        "uncertainty vf": rng.uniform(2e-4, 1e-3, n),
+        "uncertainty vi": rng.uniform(2e-4, 1e-3, n),
+    })
+    path = Path(workdir) / "trials.csv"
+    frame.to_csv(path, index=False)
+    analyzer = module.CoefficientAnalyzer(path)
+    return lambda: analyzer.process_all_trials(vectorized=True)
+
+
+@benchmark("batch_real_trajectories", "experiment1", "velocity_acceleration_graph")
+def _batch_real_trajectories(module, n, rng, workdir):
+    # load() put experiment1 on sys.path; trajectory holds the vectorized
+    # path behind the script's graphs, timed without matplotlib
+    import trajectory
+
+    pairs = max(n // 1000, 1)
+    velocity_left = -rng.uniform(0.1, 0.6, pairs)
+    velocity_right = -velocity_left * rng.normal(0.93, 0.03, pairs)
+    velocity_pairs = np.column_stack([velocity_left, velocity_right])
+    return lambda: trajectory.batch_real_trajectories(velocity_pairs, n // pairs)
+
+
+@benchmark("find_maxima_positions", "experiment5", "linear_position_relative_intensity")
+def _find_maxima_positions(module, n, rng, workdir):
+    # Double-slit fringes under a single-slit envelope, with sensor noise
+    x = np.linspace(-0.1, 0.1, n)
+    envelope = np.sinc(x / 0.02) ** 2
+    intensity = envelope * np.cos(np.pi * x / 0.004) ** 2 + rng.normal(0, 0.005, n)
+    return lambda: module.find_maxima_positions(x, intensity, prominence=0.05)
+
+
+@benchmark("normalize_phase", "experiment5", "angular_position_intensity")
+def _normalize_phase(module, n, rng, workdir):
+    import pandas as pd
+
+    angles = pd.Series(np.linspace(0, 400, n))
+    intensities = pd.Series(
+        1000 * np.cos(np.radians(angles - 70)) ** 2 + rng.normal(0, 5, n)
+    )
+    return lambda: module.normalize_phase(angles, intensities)
+
+
+@benchmark("calculate_avg_and_std", "experiment5", "angular_position_intensity")
+def _calculate_avg_and_std(module, n, rng, workdir):
+    trials = []
+    for _ in range(3):
+        angles = np.sort(rng.uniform(0, 360, n // 3))
+        trials.append((angles, 1000 * np.cos(np.radians(angles)) ** 2 + rng.normal(0, 5, len(angles))))
+    return lambda: module.calculate_avg_and_std(*trials)
+
+
+@benchmark("weighted_least_squares_fit", "experiment4", "current_curvature_anlysis")
+def _weighted_least_squares_fit(module, n, rng, workdir):
+    voltage = rng.choice([100, 200, 300, 400, 500], n)
+    inv_radius = 2 / rng.uniform(0.06, 0.11, n)
+    current = 0.0008 * inv_radius * np.sqrt(voltage / 100) + rng.normal(0, 0.1, n)
+    spread = rng.uniform(0.05, 0.15, n)
+    return lambda: module.weighted_least_squares_fit(
+        voltage, inv_radius, current, current + spread, current - spread
+    )
+
+
+@benchmark("calculate_fwhm_and_uncertainty", "experiment9", "resonance")
+def _calculate_fwhm_and_uncertainty(module, n, rng, workdir):
+    frequency = np.geomspace(100, 4000, n)
+    reactance = 2 * np.pi * frequency * 0.15 - 1 / (2 * np.pi * frequency * 500e-9)
+    vpp = 50 / np.hypot(50, reactance) + rng.normal(0, 0.01, n)
+    data = np.column_stack([frequency, vpp])
+    return lambda: module.calculate_fwhm_and_uncertainty(data)
+
+
+@benchmark("grouped_mean_std", "experiment10", "beta_particles")
+def _grouped_mean_std(module, n, rng, workdir):
+    # The per-thickness aggregation of beta_particles.py and gamma_particles.py
+    thickness = rng.choice(np.linspace(0, 0.7, 8), n)
+    counts = rng.poisson(200 * np.exp(-1.3 * thickness))
+    return lambda: module.grouped_mean_std(thickness, counts)
+
+
+def run_benchmark(name, n, repeat=5, seed=0):
+    """Time benchmark name at n rows; returns its result record."""
+    experiment, script, setup = BENCHMARKS[name]
+    module = load(experiment, script)
+    with tempfile.TemporaryDirectory() as workdir:
+        call = setup(module, n, np.random.default_rng(seed), workdir)
+        call()  # warm up caches and lazy imports
+
+        seconds = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            call()
+            seconds.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        try:
+            call()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    best = min(seconds)
+    return {
+        "name": name,
+        "size": n,
+        "seconds": best,
+        "rows_per_second": n / best if best > 0 else None,
+        "peak_bytes": peak,
+    }
+
+
+def run_all(names=None, sizes=SIZES, repeat=5, seed=0, report=None):
+    """Run the benchmarks (all by default) at every size."""
+    results = []
+    for name in names or list(BENCHMARKS):
+        for n in sizes:
+            result = run_benchmark(name, n, repeat, seed)
+            results.append(result)
+            if report is not None:
+                report(result)
+    return results
+
+
+def environment():
+    """Versions and platform the results were measured on."""
+    import pandas
+    import scipy
+
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        "pandas": pandas.__version__,
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+    }
+
+
+def _release(version):
+    """Major.minor part of a version string."""
+    return ".".join(version.split(".")[:2])
+
+
+def differences(baseline, current):
+    """
+    The COMPARED environment fields that differ between the baseline and
+    the current run, with Python and NumPy compared by minor version.
+    """
+    changed = []
+    for key in COMPARED:
+        old, new = baseline.get(key), current.get(key)
+        if key != "machine" and old is not None and new is not None:
+            old, new = _release(old), _release(new)
+        if old != new:
+            changed.append(f"{key} {old} -> {new}")
+    return changed
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Return the regressions of the results against the baseline results, as
+    dicts with the name, size, metric, baseline and current values and their
+    ratio.
+    """
+    reference = {(r["name"], r["size"]): r for r in baseline}
+    regressions = []
+    for result in results:
+        base = reference.get((result["name"], result["size"]))
+        if base is None:
+            continue
+        for metric, floor in (("seconds", MIN_SECONDS), ("peak_bytes", MIN_BYTES)):
+            ratio = max(result[metric], floor) / max(base[metric], floor)
+            if ratio > 1 + tolerance:
+                regressions.append({
+                    "name": result["name"],
+                    "size": result["size"],
+                    "metric": metric,
+                    "baseline": base[metric],
+                    "current": result[metric],
+                    "ratio": ratio,
+                })
+    return regressions
+
+
+def _write(path, results):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2)
+        f.write("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("names", nargs="*", help=f"default: all of {', '.join(BENCHMARKS)}")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="rows per run")
+    parser.add_argument("--max-size", type=int, default=None, help="skip larger sizes")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="benchmark.json", help="results file")
+    parser.add_argument("--baseline", default=str(BASELINE), help="baseline results")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed relative slowdown")
+    args = parser.parse_args(argv)
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    sizes = [n for n in args.sizes if args.max_size is None or n <= args.max_size]
+
+    def report(result):
+        print(
+            f"{result['name']:32} {result['size']:>10} rows "
+            f"{result['seconds'] * 1e3:12.3f} ms {result['peak_bytes'] / 2**20:10.1f} MiB"
+        )
+
+    results = run_all(args.names, sizes, args.repeat, args.seed, report)
+    if args.save_baseline:
+        _write(args.out, results)
+        _write(args.baseline, results)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+
+    if not Path(args.baseline).exists():
+        _write(args.out, results)
+        print(f"no baseline at {args.baseline}; run with --save-baseline to store one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline["results"], args.tolerance)
+
+    # A regression has to reproduce: measure the flagged benchmarks again and
+    # keep the faster of the two runs, so a burst of load is not reported
+    flagged = {(r["name"], r["size"]) for r in regressions}
+    if flagged:
+        for i, result in enumerate(results):
+            if (result["name"], result["size"]) in flagged:
+                again = run_benchmark(result["name"], result["size"], args.repeat, args.seed)
+                print("remeasured: ", end="")
+                report(again)
+                results[i] = min(result, again, key=lambda r: r["seconds"])
+        regressions = compare(results, baseline["results"], args.tolerance)
+    _write(args.out, results)
+
+    changed = differences(baseline["environment"], environment())
+    if changed:
+        print(f"warning: baseline measured in another environment ({'; '.join(changed)})")
+    label = "warning: possible regression" if changed else "regression"
+    for r in regressions:
+        print(
+            f"{label}: {r['name']} at {r['size']} rows, {r['metric']} "
+            f"{r['baseline']:.4g} -> {r['current']:.4g} ({r['ratio']:.2f}x)"
+        )
+    return 1 if regressions and not changed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Command-line entry point for the experiment analyses.
+
+Usage:
+
+    phys1494 list
+    phys1494 run experiment8 [script ...] [--no-plot]
+    phys1494 render [experiment ...] [--jobs N] [--force]
+    phys1494 batch manifest.json [--out results.csv] [--jobs N]
+    phys1494 bench [name ...] [--max-size N] [--save-baseline]
+    phys1494 synth generator path [--size N] [--seed S] [--chunk-size N]
+
+Subcommands import what they need when they run, and scripts run with
+--no-plot never import matplotlib.
+"""
+import argparse
+import sys
+
+
+def _list(args):
+    from phys1494.experiments import SCRIPTS
+
+    for experiment, scripts in SCRIPTS.items():
+        print(f"{experiment}: {', '.join(script[:-3] for script in scripts)}")
+    return 0
+
+
+def _run(args):
+    from phys1494.experiments import SCRIPTS, run
+
+    if args.experiment not in SCRIPTS:
+        print(f"unknown experiment: {args.experiment}", file=sys.stderr)
+        return 2
+    try:
+        run(args.experiment, args.scripts or None, plot=not args.no_plot)
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        return 2
+    return 0
+
+
+def _render(args):
+    from phys1494 import render
+
+    return render.main(args.arguments)
+
+
+def _batch(args):
+    from phys1494 import batch
+
+    return batch.main(args.arguments)
+
+
+def _bench(args):
+    from phys1494 import benchmark
+
+    return benchmark.main(args.arguments)
+
+
+def _synth(args):
+    from phys1494 import synthetic
+
+    return synthetic.main(args.arguments)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="phys1494", description="Run the PHYS1494 analyses."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="list the analysis scripts").set_defaults(
+        handler=_list
+    )
+
+    run_parser = commands.add_parser("run", help="run an experiment's analyses")
+    run_parser.add_argument("experiment", help="e.g. experiment8")
+    run_parser.add_argument("scripts", nargs="*", help="default: all")
+    run_parser.add_argument(
+        "--no-plot", action="store_true", help="print results without plotting"
+    )
+    run_parser.set_defaults(handler=_run)
+
+    render_parser = commands.add_parser(
+        "render", help="render figures headlessly (see python -m phys1494.render)"
+    )
+    render_parser.add_argument("arguments", nargs=argparse.REMAINDER)
+    render_parser.set_defaults(handler=_render)
+
+    batch_parser = commands.add_parser(
+        "batch", help="analyze a manifest of datasets (see python -m phys1494.batch)"
+    )
+    batch_parser.add_argument("arguments", nargs=argparse.REMAINDER)
+    batch_parser.set_defaults(handler=_batch)
+
+    bench_parser = commands.add_parser(
+        "bench", help="run the scaling benchmarks (see python -m phys1494.benchmark)"
+    )
+    bench_parser.add_argument("arguments", nargs=argparse.REMAINDER)
+    bench_parser.set_defaults(handler=_bench)
+
+    synth_parser = commands.add_parser(
+        "synth", help="write a synthetic dataset (see python -m phys1494.synthetic)"
+    )
+    synth_parser.add_argument("arguments", nargs=argparse.REMAINDER)
+    synth_parser.set_defaults(handler=_synth)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Batched damped least-squares (Levenberg-Marquardt) iteration.
+
+The nonlinear fitters of the experiments fit many independent members at
+once: every curve, sweep or absorber combination has its own parameters and
+its own damping. A model supplies the residuals of every member with their
+Jacobian and the objective being minimized, chi-square or, for Poisson
+counts, the negative log-likelihood (whose residuals (y - m) / sqrt(m) turn
+the normal matrix into the Fisher information). Each iteration solves the
+damped normal equations
+
+    (J^T J + damping * diag(J^T J)) step = J^T r
+
+of every member and keeps the step where it lowers the objective, dividing
+that member's damping by ten, and otherwise multiplies the damping by ten.
+
+A member converges once its step or its improvement falls below tol. It
+fails when its damping passes MAX_DAMPING (no better point nearby), when it
+is still iterating after max_iter, or when its normal matrix is singular, as
+for a flat or dead sweep; singular members get NaN parameters. No member
+stops the others from being fitted.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+MAX_DAMPING = 1e12
+# Smallest determinant of the normal matrix scaled to unit diagonal (a
+# correlation matrix) that is still treated as invertible
+MIN_SCALED_DET = 1e-14
+
+DampedFit = namedtuple(
+    "DampedFit", ["params", "objective", "normal", "converged", "failed"]
+)
+
+
+def normal_equations(residuals, jacobian, reduce=None):
+    """
+    J^T J and J^T r of every member, from residuals shaped (..., n) and
+    their Jacobian shaped (..., n, p). By default the last axis of the
+    residuals holds the points of one member; otherwise reduce sums arrays
+    shaped (..., n) over the points of every member (e.g. Grouping.sum).
+    """
+    if reduce is None:
+        normal = np.einsum("...ni,...nj->...ij", jacobian, jacobian)
+        gradient = np.einsum("...ni,...n->...i", jacobian, residuals)
+        return normal, gradient
+    columns = np.moveaxis(jacobian, -1, 0)
+    normal = reduce(columns[:, None] * columns[None, :])
+    gradient = reduce(columns * residuals)
+    normal = np.moveaxis(normal, (0, 1), (-2, -1))
+    return normal, np.moveaxis(gradient, 0, -1)
+
+
+def invertible(matrix):
+    """Members whose positive semi-definite matrix can be inverted."""
+    diagonal = np.einsum("...ii->...i", matrix)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        scale = 1 / np.sqrt(diagonal)
+        scaled = matrix * scale[..., :, None] * scale[..., None, :]
+        scaled = np.where(np.isfinite(scaled), scaled, 0.0)
+        determinant = np.linalg.det(scaled)
+    return np.all(diagonal > 0, axis=-1) & (determinant > MIN_SCALED_DET)
+
+
+def covariance(normal, chi2=None, dof=None):
+    """
+    Inverse of the normal matrix of every member, NaN where it is singular.
+
+    With chi2 and dof it is scaled by the reduced chi-square chi2 / dof, as
+    scipy.optimize.curve_fit does, and is NaN where dof < 1.
+    """
+    ok = invertible(normal)
+    result = np.full(normal.shape, np.nan)
+    result[ok] = np.linalg.inv(normal[ok])
+    if chi2 is not None:
+        dof = np.broadcast_to(dof, np.shape(chi2))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scale = np.where(dof > 0, chi2 / dof, np.nan)
+        result = result * scale[..., None, None]
+    return result
+
+
+def damped_fit(
+    params, residuals, objective, reduce=None, max_iter=100, tol=1e-10
+):
+    """
+    Minimize the objective of every member from the starting params, shaped
+    (..., p) with one row per member.
+
+    residuals(params) returns the residuals of every point and their
+    Jacobian with respect to params, which normal_equations sums into the
+    members (with reduce, if given). objective(params) returns the value
+    of every member, inf where params lie outside the model's domain.
+
+    Returns a DampedFit with the final params and objective, the undamped
+    normal matrix J^T J there (see covariance) and boolean masks of the
+    members that converged and of those that failed.
+    """
+    params = np.array(params, dtype=float)
+    shape = params.shape[:-1]
+    diagonal = np.arange(params.shape[-1])
+    damping = np.full(shape, 1e-3)
+    converged = np.zeros(shape, dtype=bool)
+    failed = np.zeros(shape, dtype=bool)
+    singular = np.zeros(shape, dtype=bool)
+
+    value = objective(params)
+    for _ in range(max_iter):
+        normal, gradient = normal_equations(*residuals(params), reduce)
+        damped = normal.copy()
+        damped[..., diagonal, diagonal] *= 1 + damping[..., None]
+
+        # Solve only the members that are still iterating and solvable
+        active = ~(converged | failed)
+        solvable = active & invertible(damped)
+        singular |= active & ~solvable
+        failed |= singular
+        step = np.full(params.shape, np.nan)
+        step[solvable] = np.linalg.solve(
+            damped[solvable], gradient[solvable][..., None]
+        )[..., 0]
+
+        new_params = params + step
+        with np.errstate(invalid="ignore", over="ignore", divide="ignore"):
+            new_value = np.where(solvable, objective(new_params), np.inf)
+        improved = solvable & (new_value <= value)
+
+        small = np.all(np.abs(step) <= tol * (np.abs(params) + tol), axis=-1)
+        stalled = improved & (value - new_value <= tol * np.abs(value))
+        params = np.where(improved[..., None], new_params, params)
+        value = np.where(improved, new_value, value)
+        damping = np.where(improved, damping / 10, damping * 10)
+        converged |= solvable & (small | stalled)
+        # Members whose damping ran away found no better point: give up
+        failed |= (damping > MAX_DAMPING) & ~converged
+        if (converged | failed).all():
+            break
+    failed |= ~converged  # still iterating after max_iter
+
+    params[singular] = np.nan
+    value = np.where(singular, np.nan, value)
+    normal, _ = normal_equations(*residuals(params), reduce)
+    return DampedFit(params, value, normal, converged, failed)
@@ -0,0 +1,80 @@
+"""
+The analysis scripts of every experiment, importable as library modules.
+
+Each script keeps its data and helpers at module level and does its work in
+main(plot=True), so importing one is cheap and matplotlib is only imported
+when a figure is drawn. Scripts import their sibling modules by bare name and
+read their data files relative to the repository root, so they are loaded
+with their directory on sys.path and run from the root.
+"""
+import contextlib
+import importlib
+import os
+import sys
+from pathlib import Path
+
+from phys1494.instrument import context, stage
+from phys1494.paths import REPO_ROOT
+
+# Analysis scripts, per experiment directory
+SCRIPTS = {
+    "experiment1": [
+        "gravitational_constant.py",
+        "motion_analyzer.py",
+        "velocity_acceleration_graph.py",
+    ],
+    "experiment2": ["run_bouding_box_analysis.py"],
+    "experiment3": ["current_carrying_rod_analysis.py"],
+    "experiment4": ["current_curvature_anlysis.py"],
+    "experiment5": [
+        "angular_position_intensity.py",
+        "linear_position_relative_intensity.py",
+    ],
+    "experiment8": ["capacitor_charging.py", "capacitor_discharging.py"],
+    "experiment9": ["phase_shift.py", "resonance.py", "resonance_unkown_L.py"],
+    "experiment10": [
+        "background.py",
+        "beta_particles.py",
+        "gamma_particles.py",
+    ],
+}
+
+
+@contextlib.contextmanager
+def working_tree(root=REPO_ROOT):
+    """Run from root, the directory the scripts' data paths are relative to."""
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        yield
+    finally:
+        os.chdir(cwd)
+
+
+def load(experiment, script, root=REPO_ROOT):
+    """
+    Import an analysis script (e.g. "capacitor_charging" or
+    "capacitor_charging.py") of an experiment and return the module.
+    """
+    name = script[:-3] if script.endswith(".py") else script
+    if f"{name}.py" not in SCRIPTS.get(experiment, ()):
+        raise ValueError(f"unknown script {experiment}/{name}.py")
+    directory = str((Path(root) / experiment).resolve())
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    with working_tree(root):
+        return importlib.import_module(name)
+
+
+def run(experiment, scripts=None, plot=True, root=REPO_ROOT):
+    """
+    Run the main() of the given scripts of an experiment (all by default)
+    and return {script: result}.
+    """
+    results = {}
+    for script in scripts or SCRIPTS[experiment]:
+        module = load(experiment, script, root)
+        with working_tree(root), context(experiment=experiment, script=module.__name__):
+            with stage("main"):
+                results[script] = module.main(plot=plot)
+    return results
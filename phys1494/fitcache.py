@@ -0,0 +1,253 @@
+"""
+Content-addressed memoization of regression and curve fits.
+
+linregress, polyfit and curve_fit are drop-in replacements for the scipy and
+NumPy functions used by the experiments. Each call is keyed on a hash of the
+input arrays, weights, model and options; the result is pickled into an
+on-disk store that is kept under a size limit by evicting the least recently
+used entries. Re-running a batch in which most datasets are unchanged then
+costs one hash and one small file read per fit.
+
+Models are keyed on their source together with their default arguments and
+the values captured by closures; functools.partial objects on their function,
+arguments and keywords. Calls with a model that cannot be keyed this way (a
+bound method or other callable object, or captured state that is not plain
+data) are fitted without the cache.
+
+The store lives in $PHYS1494_CACHE_DIR/fits (see phys1494.paths) and its size
+limit defaults to $PHYS1494_FIT_CACHE_BYTES or 256 MiB.
+"""
+import contextlib
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import tempfile
+import types
+
+import numpy as np
+
+from phys1494.instrument import stage
+from phys1494.paths import cache_dir
+
+DEFAULT_MAX_BYTES = 256 * 2**20
+
+
+class Unkeyable(TypeError):
+    """Raised by fit_key for inputs that have no reliable content hash."""
+
+
+def _update_callable(digest, obj, seen):
+    if isinstance(obj, functools.partial):
+        digest.update(b"partial")
+        _update(digest, obj.func, seen)
+        _update(digest, list(obj.args), seen)
+        _update(digest, obj.keywords, seen)
+        return
+    wrapped = getattr(obj, "__wrapped__", None)
+    if isinstance(wrapped, types.FunctionType):  # e.g. NumPy's dispatchers
+        obj = wrapped
+    if isinstance(obj, (types.BuiltinFunctionType, np.ufunc)):
+        digest.update(f"{getattr(obj, '__module__', None)}.{obj.__name__}".encode())
+        return
+    if not isinstance(obj, types.FunctionType):
+        # Bound methods and callable objects carry state we cannot see
+        raise Unkeyable(f"cannot key {type(obj).__name__} {obj!r}")
+    if id(obj) in seen:  # a closure referring to itself
+        digest.update(b"recursive")
+        return
+    seen = seen | {id(obj)}
+    digest.update(f"{obj.__module__}.{obj.__qualname__}".encode())
+    try:
+        digest.update(inspect.getsource(obj).encode())
+    except (OSError, TypeError):
+        digest.update(obj.__code__.co_code)
+    _update(digest, list(obj.__defaults__ or ()), seen)
+    _update(digest, obj.__kwdefaults__ or {}, seen)
+    cells = []
+    for cell in obj.__closure__ or ():
+        try:
+            cells.append(cell.cell_contents)
+        except ValueError:  # cell not yet assigned
+            cells.append(None)
+    _update(digest, cells, seen)
+
+
+def _update(digest, obj, seen=frozenset()):
+    """
+    Feed a canonical encoding of obj (arrays, containers, callables) into
+    digest; raises Unkeyable for objects that have none.
+    """
+    if isinstance(obj, dict):
+        digest.update(b"dict")
+        for name in sorted(obj):
+            digest.update(str(name).encode())
+            _update(digest, obj[name], seen)
+    elif isinstance(obj, (list, tuple)) and not all(np.isscalar(v) for v in obj):
+        digest.update(f"seq{len(obj)}".encode())
+        for value in obj:
+            _update(digest, value, seen)
+    elif callable(obj):
+        _update_callable(digest, obj, seen)
+    elif obj is None or isinstance(obj, (str, bool)):
+        digest.update(repr(obj).encode())
+    else:
+        array = np.ascontiguousarray(np.asarray(obj))
+        if array.dtype.hasobject:
+            raise Unkeyable(f"cannot key {type(obj).__name__} {obj!r}")
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        digest.update(array.tobytes())
+
+
+def fit_key(kind, *args, **options):
+    """
+    Return the hex digest identifying a fit of the given kind and inputs;
+    raises Unkeyable if an input cannot be hashed reliably.
+    """
+    import scipy
+
+    digest = hashlib.sha256()
+    digest.update(f"{kind}|numpy {np.__version__}|scipy {scipy.__version__}".encode())
+    _update(digest, list(args))
+    _update(digest, options)
+    return digest.hexdigest()
+
+
+class FitCache:
+    def __init__(self, directory=None, max_bytes=None):
+        """
+        Initialize a fit store in directory, bounded to max_bytes on disk.
+        """
+        self.directory = directory or cache_dir("fits")
+        os.makedirs(self.directory, exist_ok=True)
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("PHYS1494_FIT_CACHE_BYTES", DEFAULT_MAX_BYTES))
+        self.max_bytes = max_bytes
+        # Bytes in the store as of the last scan plus those written since;
+        # the directory is only rescanned once this passes max_bytes
+        self._size = None
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key):
+        """Return the stored result for key, or None, marking it recently used."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        # The mtime doubles as the LRU timestamp; another process may have
+        # evicted the entry since it was read
+        with contextlib.suppress(FileNotFoundError):
+            os.utime(path)
+        return result
+
+    def put(self, key, result):
+        """
+        Store result under key, then evict old entries once the bytes
+        written since the last scan may have pushed the store over its limit.
+        """
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            size = f.tell()
+        os.replace(tmp, self._path(key))
+        if self._size is None:
+            self.evict()
+        else:
+            self._size += size
+            if self._size > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        """
+        Delete least recently used entries until the store fits max_bytes,
+        scanning the whole directory.
+        """
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".pkl"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                    total += stat.st_size
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._size = total
+
+    def clear(self):
+        """Remove every stored fit."""
+        for name in os.listdir(self.directory):
+            if name.endswith(".pkl"):
+                os.remove(os.path.join(self.directory, name))
+        self._size = 0
+
+    def memoize(self, kind, compute, *args, **options):
+        """
+        Return the cached result of compute(*args, **options), fitting on a
+        miss, or fitting uncached if the inputs cannot be keyed.
+        """
+        try:
+            key = fit_key(kind, *args, **options)
+        except Unkeyable:
+            return compute(*args, **options)
+        result = self.get(key)
+        if result is None:
+            result = compute(*args, **options)
+            self.put(key, result)
+        return result
+
+
+_default_cache = None
+
+
+def default_cache():
+    """Return the process-wide FitCache."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = FitCache()
+    return _default_cache
+
+
+def _linregress(x, y):
+    from scipy import stats
+
+    return stats.linregress(x, y)
+
+
+def _curve_fit(f, xdata, ydata, **kwargs):
+    from scipy import optimize
+
+    return optimize.curve_fit(f, xdata, ydata, **kwargs)
+
+
+def linregress(x, y, cache=None):
+    """Cached scipy.stats.linregress; scipy.stats is only imported on a miss."""
+    with stage("fit", rows=len(x), function="linregress"):
+        return (cache or default_cache()).memoize("linregress", _linregress, x, y)
+
+
+def polyfit(x, y, deg, w=None, cov=False, cache=None):
+    """Cached np.polyfit."""
+    with stage("fit", rows=len(x), function="polyfit"):
+        return (cache or default_cache()).memoize(
+            "polyfit", np.polyfit, x, y, deg, w=w, cov=cov
+        )
+
+
+def curve_fit(f, xdata, ydata, p0=None, sigma=None, cache=None, **kwargs):
+    """Cached scipy.optimize.curve_fit; returns (popt, pcov)."""
+    with stage("fit", rows=len(ydata), function="curve_fit"):
+        return (cache or default_cache()).memoize(
+            "curve_fit", _curve_fit, f, xdata, ydata, p0=p0, sigma=sigma, **kwargs
+        )
@@ -0,0 +1,244 @@
+"""
+Per-group statistics and straight-line fits computed for all groups at once.
+
+Rows are assigned to groups once with np.unique(return_inverse=True) (a
+Grouping) and every per-group sum is a np.bincount, so the cost does not
+grow with the number of groups. The weighted sufficient statistics of the
+(x, y) pairs of every group (group_moments) give grouped_wls, weighted
+straight-line fits with their covariance, and grouped_linregress, which
+gives the same numbers as calling scipy.stats.linregress on every group
+separately; grouped_mean_std gives the mean and spread of values per group.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+GroupedRegression = namedtuple(
+    "GroupedRegression",
+    [
+        "keys",
+        "slope",
+        "intercept",
+        "rvalue",
+        "pvalue",
+        "stderr",
+        "intercept_stderr",
+        "n",
+        "inverse",
+    ],
+)
+
+GroupedFit = namedtuple(
+    "GroupedFit",
+    [
+        "keys",
+        "slope",
+        "intercept",
+        "covariance",
+        "n",
+        "chi2",
+        "inverse",
+        "residuals",
+    ],
+)
+
+GroupStats = namedtuple("GroupStats", ["keys", "mean", "std", "n", "inverse"])
+
+Moments = namedtuple(
+    "Moments", ["sum_w", "x_mean", "y_mean", "s_xx", "s_xy", "s_yy"]
+)
+
+
+class Grouping:
+    """
+    Rows grouped by key: keys holds the sorted unique keys, inverse the
+    group index of every row and n the number of rows in every group.
+    """
+
+    def __init__(self, keys, n_rows=None):
+        """
+        keys is a 1-D array, a 2-D array whose rows are key combinations
+        such as (source, absorber), or None for a single group of n_rows
+        rows.
+        """
+        if keys is None:
+            self.keys = np.zeros(1)
+            self.inverse = np.zeros(n_rows, dtype=np.intp)
+        else:
+            keys = np.asarray(keys)
+            axis = 0 if keys.ndim > 1 else None
+            self.keys, inverse = np.unique(
+                keys, axis=axis, return_inverse=True
+            )
+            self.inverse = inverse.ravel()
+        self.n = np.bincount(self.inverse, minlength=len(self.keys))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def sum(self, values):
+        """
+        Sum values over the rows of every group. The rows are the last axis
+        of values; leading axes are kept, so the result has shape
+        values.shape[:-1] + (groups,).
+        """
+        values = np.asarray(values, dtype=float)
+        groups = len(self.keys)
+        if values.ndim == 1:
+            return np.bincount(self.inverse, weights=values, minlength=groups)
+        # One bincount over all leading entries, offset by groups each
+        rows = values.reshape(-1, values.shape[-1])
+        index = self.inverse + groups * np.arange(len(rows))[:, None]
+        sums = np.bincount(
+            index.ravel(), weights=rows.ravel(), minlength=groups * len(rows)
+        )
+        return sums.reshape(values.shape[:-1] + (groups,))
+
+
+def group_moments(grouping, x, y=None, weights=None):
+    """
+    Weighted sufficient statistics of every group: the sum of weights, the
+    weighted means of x and y and the weighted sums of squares and cross
+    products about those means (summing about the means avoids
+    cancellation). Unweighted when weights is None; the y statistics are
+    None when y is.
+    """
+    x = np.asarray(x, dtype=float)
+    if weights is None:
+        sum_w = grouping.n
+
+        def weighted(values):
+            return values
+
+    else:
+        w = np.asarray(weights, dtype=float)
+        sum_w = grouping.sum(w)
+
+        def weighted(values):
+            return w * values
+
+    inverse = grouping.inverse
+    x_mean = grouping.sum(weighted(x)) / sum_w
+    dx = x - x_mean[inverse]
+    s_xx = grouping.sum(weighted(dx * dx))
+    if y is None:
+        return Moments(sum_w, x_mean, None, s_xx, None, None)
+
+    y = np.asarray(y, dtype=float)
+    y_mean = grouping.sum(weighted(y)) / sum_w
+    dy = y - y_mean[inverse]
+    s_xy = grouping.sum(weighted(dx * dy))
+    s_yy = grouping.sum(weighted(dy * dy))
+    return Moments(sum_w, x_mean, y_mean, s_xx, s_xy, s_yy)
+
+
+def grouped_wls(keys, x, y, weights=None, absolute_sigma=False):
+    """
+    Fit y = slope * x + intercept separately for every distinct key.
+
+    weights multiply the squared residuals (1 / sigma**2 for Gaussian
+    errors); all ones when omitted. covariance has shape (groups, 2, 2) for
+    (slope, intercept). Unless absolute_sigma is set it is scaled by the
+    reduced chi-square chi2 / (n - 2), as np.polyfit(cov=True) does.
+    inverse maps every input row to its group and residuals holds y minus
+    the fitted line for every row.
+    """
+    grouping = Grouping(keys)
+    inverse = grouping.inverse
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    moments = group_moments(grouping, x, y, weights)
+
+    slope = moments.s_xy / moments.s_xx
+    intercept = moments.y_mean - slope * moments.x_mean
+    residuals = y - (slope[inverse] * x + intercept[inverse])
+    w = 1.0 if weights is None else np.asarray(weights, dtype=float)
+    chi2 = grouping.sum(w * residuals**2)
+
+    covariance = np.empty((len(grouping), 2, 2))
+    covariance[:, 0, 0] = 1 / moments.s_xx
+    covariance[:, 1, 1] = (
+        1 / moments.sum_w + moments.x_mean**2 / moments.s_xx
+    )
+    covariance[:, 0, 1] = covariance[:, 1, 0] = -moments.x_mean / moments.s_xx
+    n = grouping.n
+    if not absolute_sigma:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            covariance *= (chi2 / (n - 2))[:, None, None]
+
+    return GroupedFit(
+        grouping.keys,
+        slope,
+        intercept,
+        covariance,
+        n,
+        chi2,
+        inverse,
+        residuals,
+    )
+
+
+def grouped_linregress(keys, x, y):
+    """
+    Regress y on x separately for every distinct key.
+
+    Returns a GroupedRegression of per-group arrays ordered like the sorted
+    unique keys; inverse maps every input row to its group index.
+    """
+    from scipy import stats
+
+    grouping = Grouping(keys)
+    x = np.asarray(x, dtype=float)
+    moments = group_moments(grouping, x, y)
+    s_xx, s_xy, s_yy = moments.s_xx, moments.s_xy, moments.s_yy
+    n = grouping.n
+
+    slope = s_xy / s_xx
+    intercept = moments.y_mean - slope * moments.x_mean
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rvalue = np.clip(s_xy / np.sqrt(s_xx * s_yy), -1.0, 1.0)
+        rvalue = np.where(s_yy == 0, 0.0, rvalue)
+        df = n - 2
+        t = rvalue * np.sqrt(df / ((1.0 - rvalue) * (1.0 + rvalue)))
+        pvalue = 2 * stats.t.sf(np.abs(t), df)
+        stderr = np.sqrt((1 - rvalue**2) * s_yy / s_xx / df)
+    intercept_stderr = stderr * np.sqrt(grouping.sum(x * x) / n)
+
+    return GroupedRegression(
+        grouping.keys,
+        slope,
+        intercept,
+        rvalue,
+        pvalue,
+        stderr,
+        intercept_stderr,
+        n,
+        grouping.inverse,
+    )
+
+
+def grouped_mean_std(keys, values):
+    """
+    Mean and (population) standard deviation of values for every distinct
+    key, in the order of the sorted unique keys.
+    """
+    grouping = Grouping(keys, len(values))
+    moments = group_moments(grouping, values)
+    n = grouping.n
+    return GroupStats(
+        grouping.keys,
+        moments.x_mean,
+        np.sqrt(moments.s_xx / n),
+        n,
+        grouping.inverse,
+    )
+
+
+def split_groups(regression, *arrays):
+    """
+    Split each array into per-group pieces, in the order of regression.keys.
+    """
+    order = np.argsort(regression.inverse, kind="stable")
+    bounds = np.cumsum(regression.n)[:-1]
+    return [np.split(np.asarray(array)[order], bounds) for array in arrays]
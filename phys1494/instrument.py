@@ -0,0 +1,190 @@
+"""
+Stage-level instrumentation of the analyses.
+
+The load, transform, fit and plot stages of the scripts are wrapped in
+`with stage("fit"):` blocks or decorated with @staged("plot"). While
+instrumentation is enabled, every stage writes one JSON line when it ends:
+
+    {"stage": "fit", "function": "linregress", "parent": "main", "rows": 5,
+     "wall_s": 0.0012, "cpu_s": 0.0011, "peak_rss_bytes": 91226112,
+     "rss_growth_bytes": 0, "start": 1729245600.12, "pid": 4242,
+     "experiment": "experiment1", "script": "gravitational_constant"}
+
+wall_s and cpu_s are the wall-clock and process CPU time of the stage,
+peak_rss_bytes the peak resident set size of the process when it ended and
+rss_growth_bytes how much that peak rose during the stage. parent is the
+enclosing stage, and fields set with context() (the experiment, script and
+dataset being run) are added to every record.
+
+Enable it with enable(path), or by setting $PHYS1494_TRACE to a file path
+("-" for stderr), which also enables it in worker processes. Records are
+appended one line per write, so several processes can share one file. While
+disabled, stage() returns a shared no-op context manager and staged functions
+call straight through, so instrumented code pays one check per stage.
+"""
+import contextlib
+import functools
+import inspect
+import json
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_sink = None
+_stack = []
+_context = {}
+
+
+def enable(path="-"):
+    """Write stage records to path (appending), or to stderr for "-"."""
+    global _sink
+    disable()
+    _sink = sys.stderr if path == "-" else open(path, "a", buffering=1)
+
+
+def disable():
+    """Stop recording stages, closing the trace file."""
+    global _sink
+    if _sink is not None and _sink is not sys.stderr:
+        _sink.close()
+    _sink = None
+
+
+def enabled():
+    return _sink is not None
+
+
+def _peak_rss():
+    """Peak resident set size of this process in bytes, or None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+@contextlib.contextmanager
+def context(**fields):
+    """Add fields (e.g. experiment and script) to the records of enclosed stages."""
+    saved = dict(_context)
+    _context.update(fields)
+    try:
+        yield
+    finally:
+        _context.clear()
+        _context.update(saved)
+
+
+class Stage:
+    def __init__(self, name, rows=None, **fields):
+        """
+        A stage named name (load, transform, fit or plot) processing rows
+        rows; rows may also be set on the stage inside the with block.
+        """
+        self.name = name
+        self.rows = rows
+        self.fields = fields
+
+    def __enter__(self):
+        self.parent = _stack[-1] if _stack else None
+        _stack.append(self.name)
+        self.start = time.time()
+        self.rss = _peak_rss()
+        self.cpu = time.process_time()
+        self.wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        rss = _peak_rss()
+        _stack.pop()
+        record = {"stage": self.name, **self.fields, "parent": self.parent}
+        if self.rows is not None:
+            record["rows"] = int(self.rows)
+        record.update(
+            wall_s=wall,
+            cpu_s=cpu,
+            peak_rss_bytes=rss,
+            rss_growth_bytes=None if rss is None else rss - self.rss,
+            start=self.start,
+            pid=os.getpid(),
+            **_context,
+        )
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        if _sink is not None:
+            _sink.write(json.dumps(record, default=str) + "\n")
+        return False
+
+
+class _NullStage:
+    """What stage() returns while disabled; accepts and ignores rows."""
+
+    rows = property(lambda self: None, lambda self, value: None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name, rows=None, **fields):
+    """
+    Context manager recording the stage name, e.g.
+
+        with stage("load") as s:
+            data = pd.read_csv(filename)
+            s.rows = len(data)
+    """
+    if _sink is None:
+        return _NULL_STAGE
+    return Stage(name, rows, **fields)
+
+
+def _row_count(value):
+    if isinstance(value, int):
+        return value
+    shape = getattr(value, "shape", None)
+    if shape is not None:
+        return shape[0] if len(shape) else 1
+    return len(value)
+
+
+def staged(name, rows=None):
+    """
+    Decorator recording every call of a function as the stage name; rows
+    names the argument whose length (or value, for an int) is the stage's
+    row count.
+    """
+
+    def decorate(function):
+        signature = inspect.signature(function) if rows is not None else None
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _sink is None:
+                return function(*args, **kwargs)
+            count = None
+            if rows is not None:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                count = _row_count(bound.arguments[rows])
+            with Stage(name, count, function=function.__qualname__):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+if os.environ.get("PHYS1494_TRACE"):
+    enable(os.environ["PHYS1494_TRACE"])
@@ -0,0 +1,111 @@
+"""
+Monte Carlo propagation of measurement uncertainties.
+
+Every input is sampled in one NumPy batch per chunk and the model is
+evaluated on whole arrays, so the cost per sample is a few vector operations
+rather than a Python call. The sample budget is split into chunks of
+chunk_size samples whose random streams are spawned from one seed, which
+makes a result depend only on the seed, the budget and chunk_size, whether
+the chunks run in this process or across a process pool.
+"""
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+MonteCarloResult = namedtuple(
+    "MonteCarloResult", ["mean", "std", "percentiles", "samples"]
+)
+
+
+def _draw(spec, rng, size):
+    """
+    Sample one input. spec is a constant, a (mean, sigma) pair for a normal
+    distribution (either may be an array), or a callable f(rng, size).
+    """
+    if callable(spec):
+        return spec(rng, size)
+    if isinstance(spec, tuple):
+        mean, sigma = (np.asarray(v, dtype=float) for v in spec)
+        shape = np.broadcast_shapes(mean.shape, sigma.shape)
+        return rng.normal(mean, sigma, size=(size,) + shape)
+    return np.asarray(spec, dtype=float)
+
+
+class Uniform:
+    def __init__(self, low, high):
+        """
+        Input spec for a uniform distribution on [low, high). A class rather
+        than a closure so that it can be sent to pool workers.
+        """
+        self.low = np.asarray(low, dtype=float)
+        self.high = np.asarray(high, dtype=float)
+
+    def __call__(self, rng, size):
+        shape = np.broadcast_shapes(self.low.shape, self.high.shape)
+        return rng.uniform(self.low, self.high, size=(size,) + shape)
+
+
+def _run_chunk(model, inputs, seed_sequence, size):
+    rng = np.random.default_rng(seed_sequence)
+    samples = {name: _draw(spec, rng, size) for name, spec in inputs.items()}
+    return np.asarray(model(**samples), dtype=float)
+
+
+def propagate(
+    model,
+    inputs,
+    n_samples=100_000,
+    seed=None,
+    percentiles=(2.5, 50, 97.5),
+    workers=None,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    keep_samples=False,
+):
+    """
+    Propagate the uncertainties of inputs through model by sampling.
+
+    inputs maps the keyword arguments of model to specs accepted by _draw;
+    sampled inputs have a leading axis of length n_samples and model must
+    evaluate element-wise along it. With workers > 1 the chunks are evaluated
+    in a process pool, which requires model and any callable specs to be
+    picklable (defined at module level). The samples drawn depend on
+    chunk_size but not on workers, so the same seed, n_samples and
+    chunk_size reproduce a result.
+
+    Returns a MonteCarloResult with the mean, sample standard deviation and
+    {percentile: value} of the output along the sample axis, and the output
+    samples themselves if keep_samples is set.
+    """
+    chunk_sizes = [chunk_size] * (n_samples // chunk_size)
+    if n_samples % chunk_size:
+        chunk_sizes.append(n_samples % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+
+    if workers and workers > 1 and len(chunk_sizes) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = list(
+                pool.map(
+                    _run_chunk,
+                    [model] * len(seeds),
+                    [inputs] * len(seeds),
+                    seeds,
+                    chunk_sizes,
+                )
+            )
+    else:
+        chunks = [
+            _run_chunk(model, inputs, seq, size)
+            for seq, size in zip(seeds, chunk_sizes)
+        ]
+
+    output = np.concatenate(chunks) if len(chunks) > 1 else chunks[0]
+    values = np.percentile(output, percentiles, axis=0)
+    return MonteCarloResult(
+        mean=output.mean(axis=0),
+        std=output.std(axis=0, ddof=1),
+        percentiles=dict(zip(percentiles, values)),
+        samples=output if keep_samples else None,
+    )
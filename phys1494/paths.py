@@ -0,0 +1,20 @@
+"""
+Locations of the repository and of on-disk caches.
+"""
+import os
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def cache_dir(*parts):
+    """
+    Return (and create) a directory under the cache root.
+
+    The root is $PHYS1494_CACHE_DIR if set, otherwise ~/.cache/phys1494.
+    """
+    root = os.environ.get("PHYS1494_CACHE_DIR")
+    root = Path(root) if root else Path.home() / ".cache" / "phys1494"
+    directory = root.joinpath(*parts)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
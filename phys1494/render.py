@@ -0,0 +1,207 @@
+"""
+Headless, parallel rendering of the experiment figures.
+
+Each analysis script runs in a worker process with the non-interactive Agg
+backend. plt.show() is replaced by a hook that writes every open figure to the
+experiment's figures/ directory, so no script blocks on a window. A script is
+skipped when the hash of its inputs (the experiment's sources and data files)
+and of the plotting style matches the previous render and all of the files it
+wrote still exist.
+
+Usage (from the repository root):
+
+    python -m phys1494.render [experiment ...] [--jobs N] [--force]
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import runpy
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from phys1494 import instrument
+from phys1494.experiments import SCRIPTS
+from phys1494.paths import REPO_ROOT, cache_dir
+
+# Files whose contents feed the figures of an experiment
+INPUT_SUFFIXES = (".py", ".csv", ".txt")
+
+MANIFEST = "render.json"
+
+
+def _hash_file(path, digest):
+    """Feed the contents of path into digest in 1 MiB blocks."""
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+
+
+def input_hash(experiment, script, style=None, root=REPO_ROOT):
+    """
+    Hash everything a script's figures depend on: the script itself, the
+    other sources and data files in its experiment directory, the plotting
+    style and the matplotlib version.
+    """
+    import matplotlib
+
+    digest = hashlib.sha256()
+    digest.update(f"{experiment}/{script}".encode())
+    digest.update(json.dumps(style, sort_keys=True, default=str).encode())
+    digest.update(matplotlib.__version__.encode())
+    directory = Path(root) / experiment
+    for path in sorted(directory.iterdir()):
+        if path.suffix in INPUT_SUFFIXES:
+            digest.update(path.name.encode())
+            _hash_file(path, digest)
+    return digest.hexdigest()
+
+
+def render_script(experiment, script, style=None, root=REPO_ROOT):
+    """
+    Run one analysis script headlessly and return the files it wrote.
+
+    Runs in a worker process. Figures the script shows without saving them
+    itself are written as figures/<script>_<n>.png next to the script.
+    """
+    os.environ["MPLBACKEND"] = "Agg"
+    import matplotlib
+
+    matplotlib.use("Agg", force=True)
+    import matplotlib.pyplot as plt
+    from matplotlib.figure import Figure
+
+    root = Path(root)
+    script_path = root / experiment / script
+    figures_dir = root / experiment / "figures"
+    written = []
+    saved = []
+    shown = 0
+
+    original_savefig, original_show = Figure.savefig, plt.show
+
+    def savefig(fig, fname, *args, **kwargs):
+        written.append(str(fname))
+        saved.append(fig)
+        return original_savefig(fig, fname, *args, **kwargs)
+
+    def show(*args, **kwargs):
+        nonlocal shown
+        for number in plt.get_fignums():
+            fig = plt.figure(number)
+            if any(fig is other for other in saved):
+                continue
+            shown += 1
+            figures_dir.mkdir(exist_ok=True)
+            fig.savefig(figures_dir / f"{script_path.stem}_{shown}.png")
+        saved.clear()
+        plt.close("all")
+
+    output = io.StringIO()
+    cwd = os.getcwd()
+    sys.path.insert(0, str(script_path.parent))
+    Figure.savefig, plt.show = savefig, show
+    try:
+        os.chdir(root)
+        context = plt.style.context(style) if style else contextlib.nullcontext()
+        with context, contextlib.redirect_stdout(output), instrument.context(
+            experiment=experiment, script=script_path.stem
+        ), instrument.stage("main"):
+            runpy.run_path(str(script_path), run_name="__main__")
+            show()
+    finally:
+        Figure.savefig, plt.show = original_savefig, original_show
+        sys.path.remove(str(script_path.parent))
+        os.chdir(cwd)
+        plt.close("all")
+
+    outputs = sorted(
+        str((root / path).resolve().relative_to(root)) for path in written
+    )
+    return {"outputs": outputs, "stdout": output.getvalue()}
+
+
+def _load_manifest():
+    path = cache_dir() / MANIFEST
+    if path.exists():
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def _save_manifest(manifest):
+    path = cache_dir() / MANIFEST
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _is_current(entry, key, root):
+    return (
+        entry is not None
+        and entry["key"] == key
+        and all((Path(root) / path).exists() for path in entry["outputs"])
+    )
+
+
+def render_all(experiments=None, jobs=None, force=False, style=None, root=REPO_ROOT):
+    """
+    Render the figures of the given experiments (all by default) in a process
+    pool, skipping scripts whose input hash is unchanged.
+
+    Returns a dict mapping "experimentN/script.py" to "cached", "rendered" or
+    the error message of a failed script.
+    """
+    experiments = experiments or list(SCRIPTS)
+    manifest = _load_manifest()
+    status = {}
+    pending = {}
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for experiment in experiments:
+            for script in SCRIPTS[experiment]:
+                name = f"{experiment}/{script}"
+                key = input_hash(experiment, script, style, root)
+                if not force and _is_current(manifest.get(name), key, root):
+                    status[name] = "cached"
+                    continue
+                future = pool.submit(render_script, experiment, script, style, str(root))
+                pending[name] = (key, future)
+
+        for name, (key, future) in pending.items():
+            try:
+                result = future.result()
+            except Exception as exc:  # report and keep rendering the rest
+                status[name] = f"failed: {exc!r}"
+                manifest.pop(name, None)
+                continue
+            manifest[name] = {"key": key, "outputs": result["outputs"]}
+            status[name] = "rendered"
+
+    _save_manifest(manifest)
+    return status
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("experiments", nargs="*", help="default: all")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes")
+    parser.add_argument("--force", action="store_true", help="ignore the render cache")
+    parser.add_argument("--style", default=None, help="matplotlib style to render with")
+    args = parser.parse_args(argv)
+    unknown = set(args.experiments) - set(SCRIPTS)
+    if unknown:
+        parser.error(f"unknown experiments: {', '.join(sorted(unknown))}")
+
+    status = render_all(args.experiments, args.jobs, args.force, args.style)
+    for name, state in status.items():
+        print(f"{name}: {state}")
+    return 0 if all(not s.startswith("failed") for s in status.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
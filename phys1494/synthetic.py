@@ -0,0 +1,662 @@
+"""
+Synthetic datasets in the file formats of the experiments.
+
+Every generator writes size rows (trials, samples or events) drawn from a
+physical model of the measurement with realistic noise, in the format and
+column names of the files the analyses read: the CSV files of experiment1,
+the tab-separated sensor exports of experiment5, the event stream of
+geiger_stream.py and the JSON and CSV datasets of phys1494.batch. Rows are
+produced and written chunk_size at a time, so files of any size are written
+in bounded memory; JSON columns are written one after another by generating
+the chunks again for each column.
+
+Each chunk draws from its own generator seeded with (seed, chunk index), so
+a file is reproducible from its seed, size and chunk_size.
+
+Usage (from the repository root):
+
+    python -m phys1494.synthetic restitution_trials data.csv \
+        --size 1000000 --seed 1
+"""
+
+import argparse
+import json
+import sys
+
+import numpy as np
+
+DEFAULT_CHUNK_SIZE = 1 << 18
+
+G = 9.81  # m/s^2
+E_OVER_M = 1.759e11  # C/kg
+COIL_CONSTANT = 0.0008047  # T/A, C in current_curvature_anlysis.py
+
+# name -> (experiment, generator)
+GENERATORS = {}
+
+
+def generator(name, experiment):
+    """Register a function as the generator name of an experiment's data."""
+
+    def register(function):
+        GENERATORS[name] = (experiment, function)
+        return function
+
+    return register
+
+
+def _chunks(size, chunk_size, *seed):
+    """Yield (start, stop, rng) for consecutive chunks of size rows."""
+    for index, start in enumerate(range(0, size, chunk_size)):
+        rng = np.random.default_rng([*seed, index])
+        yield start, min(start + chunk_size, size), rng
+
+
+def _write_table(
+    path,
+    header,
+    fmt,
+    make_chunk,
+    size,
+    seed,
+    chunk_size,
+    delimiter=",",
+    title=None,
+):
+    """Write the rows of make_chunk(start, stop, rng) below the header."""
+    line = delimiter.join(fmt) + "\n"
+    with open(path, "w") as f:
+        if title is not None:
+            f.write(title + "\n")
+        f.write(delimiter.join(header) + "\n")
+        for start, stop, rng in _chunks(size, chunk_size, seed):
+            rows = make_chunk(start, stop, rng)
+            # One formatting operation per chunk rather than one per row
+            f.write((line * len(rows)) % tuple(rows.ravel().tolist()))
+
+
+def _write_json_columns(f, make_chunk, names, size, chunk_size, *seed):
+    """
+    Write {name: [values]} of the columns make_chunk returns, one column at
+    a time.
+    """
+    f.write("{")
+    for i, name in enumerate(names):
+        f.write(
+            ("," if i else "")
+            + f"\n  {json.dumps(name, ensure_ascii=False)}: ["
+        )
+        for j, (start, stop, rng) in enumerate(
+            _chunks(size, chunk_size, *seed)
+        ):
+            values = make_chunk(start, stop, rng)[name].tolist()
+            f.write(("," if j else "") + ",".join(map(repr, values)))
+        f.write("]")
+    f.write("\n}")
+
+
+@generator("restitution_trials", "experiment1")
+def restitution_trials(
+    path,
+    size,
+    seed=0,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    restitution=0.93,
+    spread=0.03,
+):
+    """
+    Cart collisions with the bumper in the format of experiment1/data.csv:
+    velocities before and after the bounce with their uncertainties, the
+    coefficient of restitution of every trial drawn around restitution.
+    """
+
+    def make_chunk(start, stop, rng):
+        n = stop - start
+        v_initial = rng.uniform(0.15, 0.45, n)
+        sigma_vi = rng.uniform(5e-4, 1.2e-3, n)
+        sigma_vf = rng.uniform(2e-4, 8e-4, n)
+        e = rng.normal(restitution, spread, n)
+        v_final = -e * v_initial + rng.normal(0, sigma_vf)
+        v_initial = v_initial + rng.normal(0, sigma_vi)
+        return np.column_stack(
+            [
+                np.arange(start + 1, stop + 1),
+                v_final,
+                v_initial,
+                sigma_vf,
+                sigma_vi,
+            ]
+        )
+
+    header = [
+        "Trial #",
+        "v final",
+        "v initial",
+        "uncertainty vf",
+        "uncertainty vi",
+    ]
+    fmt = ["%d", "%.3f", "%.3f", "%.2E", "%.2E"]
+    _write_table(path, header, fmt, make_chunk, size, seed, chunk_size)
+
+
+@generator("track_accelerations", "experiment1")
+def track_accelerations(
+    path,
+    size,
+    seed=0,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    max_shims=5,
+    track_span=1.5,
+):
+    """
+    Runs down the tilted track in the format of
+    experiment1/gravitational_acceleration_data.csv, with 1.2 mm shims under a
+    leg track_span metres from the other (the track length L of
+    gravitational_constant.py) and the trials split evenly over 1 to
+    max_shims shims. A, B and C are the coefficients of the quadratic
+    x(t) = A t^2 + B t + C fitted to the position log.
+    """
+
+    def make_chunk(start, stop, rng):
+        n = stop - start
+        trial = np.arange(start + 1, stop + 1)
+        shims = 1 + (trial - 1) * max_shims // size
+        h = 1.2 * shims  # mm
+        l2 = rng.uniform(1.04, 1.25, n)
+        sigma_a = rng.uniform(1.8e-4, 1.4e-3, n)
+        ax = G * h / 1000 / track_span * rng.normal(1, 0.03, n)
+        v1 = -np.sqrt(2 * ax * l2 * rng.normal(0.8, 0.1, n).clip(0.3))
+        a = ax / 2 + rng.normal(0, 1e-4, n)
+        b = v1 * rng.normal(1.1, 0.05, n)
+        c = rng.normal(1.86, 0.02, n)
+        return np.column_stack(
+            [
+                trial,
+                shims,
+                h,
+                l2,
+                v1,
+                ax,
+                sigma_a,
+                a,
+                rng.uniform(5e-6, 5e-5, n),
+                b,
+                rng.uniform(1.7e-4, 6e-4, n),
+                c,
+                rng.uniform(1e-3, 3e-3, n),
+            ]
+        )
+
+    header = [
+        "Trial #",
+        "# of shims",
+        "h (mm)",
+        "l2 (m)",
+        "v1 (m/s)",
+        "ax (m/s^2)",
+        "a uncertainty",
+        "A",
+        "A uncertainty",
+        "B",
+        "B uncertainty",
+        "C",
+        "C uncertainty",
+    ]
+    fmt = [
+        "%d",
+        "%d",
+        "%.1f",
+        "%.3f",
+        "%.2f",
+        "%.3g",
+        "%.2E",
+        "%.3g",
+        "%.2E",
+        "%.3g",
+        "%.2E",
+        "%.3g",
+        "%.2E",
+    ]
+    _write_table(path, header, fmt, make_chunk, size, seed, chunk_size)
+
+
+@generator("bounding_box_trials", "experiment2")
+def bounding_box_trials(path, size, seed=0, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    size projectile trials in the JSON layout of the trials dict of
+    run_bouding_box_analysis.py: radial measurements of the landing spots and
+    the bounding box of the remaining hits, in cm.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{")
+        for start, stop, rng in _chunks(size, chunk_size, seed):
+            # Draw the whole chunk at once; only the formatting is per trial
+            n = stop - start
+            centre = rng.uniform(20, 65, n)
+            x, y = rng.uniform(-30, 50, n), centre
+            half_width, half_height = rng.uniform(1.5, 6, (2, n))
+            lengths = rng.integers(5, 17, n)
+            radial = np.round(rng.normal(np.repeat(centre, lengths), 6))
+            radial = np.split(radial.astype(int), np.cumsum(lengths)[:-1])
+            points = rng.integers(4, 16, n).tolist()
+            left, right = x - half_width, x + half_width
+            top, bottom = y + half_height, y - half_height
+            corners = np.stack(
+                [left, top, right, top, left, bottom, right, bottom], axis=-1
+            )
+            corners = np.round(corners).astype(int).reshape(n, 4, 2).tolist()
+            for i, trial in enumerate(range(start, stop)):
+                trial_data = {
+                    "Radial measurements": radial[i].tolist(),
+                    "Bounding Box": {
+                        "points": points[i],
+                        "corners": corners[i],
+                    },
+                }
+                name = json.dumps(f"Trial {trial + 1}")
+                f.write(
+                    ("," if trial else "")
+                    + f"\n  {name}: {json.dumps(trial_data)}"
+                )
+        f.write("\n}")
+
+
+@generator("rod_forces", "experiment3")
+def rod_forces(
+    path, size, seed=0, chunk_size=DEFAULT_CHUNK_SIZE, field_per_amp=0.044
+):
+    """
+    Current balance readings in the JSON layout of the data dict of
+    current_carrying_rod_analysis.py: the magnet current I (A) cycling over
+    2 to 4 A, the rod current times length iL and the balancing weight F=mg,
+    with B = field_per_amp * I.
+    """
+
+    def make_chunk(start, stop, rng):
+        n = stop - start
+        current = 2 + 0.5 * (np.arange(start, stop) % 5)
+        il = np.round(0.0256 * rng.integers(1, 6, n), 4)
+        force = field_per_amp * current * il + rng.normal(0, 1e-3, n)
+        return {"I": current, "iL": il, "F=mg": np.round(force, 7)}
+
+    with open(path, "w", encoding="utf-8") as f:
+        _write_json_columns(
+            f, make_chunk, ["I", "iL", "F=mg"], size, chunk_size, seed
+        )
+
+
+@generator("electron_beam", "experiment4")
+def electron_beam(path, size, seed=0, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Coil currents bending the electron beam to the measured diameter, in the
+    JSON layout of the columns of current_curvature_anlysis.py, for
+    accelerating voltages cycling over 100 to 500 V. The current follows
+    I = sqrt(2 V / (e/m)) / (C r) with a 5% reading spread.
+    """
+
+    def make_chunk(start, stop, rng):
+        n = stop - start
+        voltage = 100 * (1 + np.arange(start, stop) % 5)
+        diameter = rng.uniform(0.06, 0.11, n)
+        current = np.sqrt(2 * voltage / E_OVER_M) / (
+            COIL_CONSTANT * diameter / 2
+        )
+        current = current * rng.normal(1, 0.08, n)
+        spread = current * rng.uniform(0.03, 0.08, n)
+        return {
+            "voltage": voltage,
+            "current": np.round(current, 2),
+            "current_high": np.round(current + spread, 2),
+            "current_low": np.round(current - spread, 2),
+            "diameter": np.round(diameter, 3),
+        }
+
+    names = ["voltage", "current", "current_high", "current_low", "diameter"]
+    with open(path, "w", encoding="utf-8") as f:
+        _write_json_columns(f, make_chunk, names, size, chunk_size, seed)
+
+
+@generator("polarizer_scan", "experiment5")
+def polarizer_scan(
+    path,
+    size,
+    seed=0,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    peak=2780.0,
+    offset=70.0,
+):
+    """
+    Intensity through a rotating polarizer (Malus's law) over 0 to 390
+    degrees, in the format of experiment5/intensityAngularPosition_*.txt,
+    peaking at offset degrees with a 1% noise and a background of 45.
+    """
+
+    def make_chunk(start, stop, rng):
+        angle = 390 * np.arange(start, stop) / max(size - 1, 1)
+        intensity = 45 + peak * np.cos(np.radians(angle - offset)) ** 2
+        intensity = intensity * rng.normal(1, 0.01, stop - start)
+        return np.column_stack([angle, intensity])
+
+    header = ["Angular Position ( deg )", "Relative Intensity (  )"]
+    _write_table(
+        path,
+        header,
+        ["%.1f", "%.2f"],
+        make_chunk,
+        size,
+        seed,
+        chunk_size,
+        delimiter="\t",
+    )
+
+
+@generator("double_slit_scan", "experiment5")
+def double_slit_scan(
+    path,
+    size,
+    seed=0,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    wavelength=650e-9,
+    slit_separation=0.25e-3,
+    slit_width=0.04e-3,
+    distance=0.8,
+    run=1,
+):
+    """
+    A double-slit pattern scanned by the light sensor from 0 to -0.18 m, in
+    the format of experiment5/linearPositionRelativeIntensity_*.txt: the
+    interference fringes under the single-slit envelope, centred at -0.1 m,
+    with detector noise and background.
+    """
+
+    def make_chunk(start, stop, rng):
+        n = stop - start
+        position = -0.18 * np.arange(start, stop) / max(size - 1, 1)
+        x = (position + 0.1) / distance  # sin of the angle from the centre
+        envelope = np.sinc(slit_width * x / wavelength) ** 2
+        fringes = np.cos(np.pi * slit_separation * x / wavelength) ** 2
+        intensity = (
+            3.7 * envelope * fringes * rng.normal(1, 0.02, n)
+            + 0.04
+            + rng.normal(0, 0.005, n)
+        )
+        return np.column_stack([position, intensity.clip(0)])
+
+    header = ["Linear Position ( m )", "Relative Intensity (  )"]
+    title = f"Relative Intensity vs Linear Position, Run #{run}"
+    _write_table(
+        path,
+        header,
+        ["%.5f", "%.2f"],
+        make_chunk,
+        size,
+        seed,
+        chunk_size,
+        delimiter="\t",
+        title=title,
+    )
+
+
+@generator("rc_currents", "experiment8")
+def rc_currents(
+    path,
+    size,
+    seed=0,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    resistance=680e3,
+    duration=10.0,
+):
+    """
+    Two runs of the current through a charging (or discharging) 10, 20 and
+    30 µF capacitor in the JSON layout of the data dicts of
+    capacitor_charging.py, sampled size times over duration seconds, with
+    tau = resistance * C and the 0.5 µA reading resolution of the meter.
+    """
+    capacitances = {"10 µF": 10e-6, "20 µF": 20e-6, "30 µF": 30e-6}
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{")
+        for i, (name, capacitance) in enumerate(capacitances.items()):
+            tau = resistance * capacitance
+
+            def make_chunk(start, stop, rng):
+                time = duration * np.arange(start + 1, stop + 1) / size
+                columns = {"time": np.round(time, 6)}
+                for run in ("current_1", "current_2"):
+                    current = 10 * np.exp(-time / tau) + rng.normal(
+                        0, 0.3, stop - start
+                    )
+                    columns[run] = np.round(2 * current) / 2
+                return columns
+
+            f.write(
+                ("," if i else "")
+                + f"\n{json.dumps(name, ensure_ascii=False)}: "
+            )
+            _write_json_columns(
+                f,
+                make_chunk,
+                ["time", "current_1", "current_2"],
+                size,
+                chunk_size,
+                seed,
+                i,
+            )
+        f.write("\n}")
+
+
+@generator("rlc_sweep", "experiment9")
+def rlc_sweep(
+    path,
+    size,
+    seed=0,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    R=50.0,
+    L=0.15,
+    C=500e-9,
+    drive=3.0,
+    f_min=100.0,
+    f_max=10000.0,
+):
+    """
+    Peak-to-peak resistor voltage of a series RLC circuit over a logarithmic
+    frequency sweep, as [frequency, Vpp] rows under a frequency,vpp header
+    (the sweeps of resonance.py), with 2% noise on the reading.
+    """
+
+    def make_chunk(start, stop, rng):
+        frequency = f_min * (f_max / f_min) ** (
+            np.arange(start, stop) / max(size - 1, 1)
+        )
+        omega = 2 * np.pi * frequency
+        vpp = drive * R / np.hypot(R, omega * L - 1 / (omega * C))
+        return np.column_stack(
+            [frequency, vpp * rng.normal(1, 0.02, stop - start)]
+        )
+
+    _write_table(
+        path,
+        ["frequency", "vpp"],
+        ["%.1f", "%.4g"],
+        make_chunk,
+        size,
+        seed,
+        chunk_size,
+    )
+
+
+def _attenuation_counts(rng, thickness, time, rate, mu, background):
+    """Poisson counts of trials of time seconds behind the absorbers."""
+    return rng.poisson(time * (rate * np.exp(-mu * thickness) + background))
+
+
+@generator("beta_counts", "experiment10")
+def beta_counts(
+    path,
+    size,
+    seed=0,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    rate=11.0,
+    mu=30.0,
+    background=46.6 / 60,
+):
+    """
+    Geiger counts of a beta source behind aluminium absorbers of 1 to 7
+    layers of 0.01016 cm, as [thickness, count, time] rows (the data of
+    beta_particles.py) with 15 and 30 s counting times. rate is the
+    unattenuated count rate and background the background rate, per second.
+    """
+
+    def make_chunk(start, stop, rng):
+        index = np.arange(start, stop)
+        thickness = 0.01016 * (1 + index % 7)
+        time = np.where(index // 7 % 2, 30.0, 15.0)
+        counts = _attenuation_counts(
+            rng, thickness, time, rate, mu, background
+        )
+        return np.column_stack([thickness, counts, time])
+
+    _write_table(
+        path,
+        ["thickness", "count", "time"],
+        ["%.5f", "%d", "%d"],
+        make_chunk,
+        size,
+        seed,
+        chunk_size,
+    )
+
+
+@generator("gamma_counts", "experiment10")
+def gamma_counts(
+    path,
+    size,
+    seed=0,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    rate=7.0,
+    mu=1.25,
+    background=0.0,
+):
+    """
+    Geiger counts of a gamma source behind 0 to 5 absorbers of 0.062 in,
+    as the [thickness (in), thickness, count, time] rows of
+    gamma_particles.py, counted for 30 s each. mu is per unit of the second
+    thickness column, 2.24 times the first.
+    """
+
+    def make_chunk(start, stop, rng):
+        thickness_in = 0.062 * (np.arange(start, stop) % 6)
+        thickness = 2.24 * thickness_in
+        time = np.full(stop - start, 30.0)
+        counts = _attenuation_counts(
+            rng, thickness, time, rate, mu, background
+        )
+        return np.column_stack([thickness_in, thickness, counts, time])
+
+    header = ["thickness (in)", "thickness", "count", "time"]
+    _write_table(
+        path,
+        header,
+        ["%.3f", "%.5f", "%d", "%d"],
+        make_chunk,
+        size,
+        seed,
+        chunk_size,
+    )
+
+
+@generator("geiger_events", "experiment10")
+def geiger_events(
+    path,
+    size,
+    seed=0,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    rate=11.0,
+    mu=30.0,
+    background=46.6 / 60,
+    interval=30.0,
+):
+    """
+    size Geiger counter events as the line protocol read by geiger_stream.py:
+    a background interval, then intervals of interval seconds behind 1 to 7
+    absorbers of 0.01016 cm in turn, repeated until size events are written.
+    Each interval holds a Poisson number of events at uniformly distributed
+    times, drawn for as many intervals at once as hold about chunk_size
+    events; each such block of intervals is a chunk with its own generator.
+    """
+    thicknesses = 0.01016 * np.arange(1, 8)
+    # Interval i counts the background when i % 8 == 0, else behind
+    # absorber i % 8
+    rates = np.concatenate(
+        [[background], rate * np.exp(-mu * thicknesses) + background]
+    )
+    per_interval = rates.mean() * interval
+    written = 0
+    first = 0
+    block = 0
+    with open(path, "w") as f:
+        while written < size:
+            rng = np.random.default_rng([seed, block])
+            block += 1
+            index = np.arange(
+                first, first + max(1, int(chunk_size / per_interval))
+            )
+            counts = rng.poisson(rates[index % len(rates)] * interval)
+            # Intervals are disjoint, so one sort orders the events within
+            # each
+            times = np.repeat(index * interval, counts) + rng.uniform(
+                0, interval, counts.sum()
+            )
+            times.sort()
+            bounds = np.concatenate([[0], np.cumsum(counts)])
+
+            for i, interval_index in enumerate(index):
+                kind = interval_index % len(rates)
+                start = interval_index * interval
+                if kind == 0:
+                    f.write(f"#{start:.6f} background\n")
+                else:
+                    f.write(
+                        f"#{start:.6f} absorber {thicknesses[kind - 1]:.5f}\n"
+                    )
+                events = times[bounds[i] : bounds[i + 1]]
+                stop = start + interval
+                if written + len(events) >= size:
+                    # The last interval ends with the size-th event
+                    events = events[: size - written]
+                    stop = events[-1] if len(events) else start
+                f.write(("%.6f\n" * len(events)) % tuple(events.tolist()))
+                f.write(f"#{stop:.6f} stop\n")
+                written += len(events)
+                if written >= size:
+                    break
+            first = index[-1] + 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().split("\n\n")[0]
+    )
+    parser.add_argument(
+        "generator", choices=list(GENERATORS), help="dataset to generate"
+    )
+    parser.add_argument("path", help="output file")
+    parser.add_argument(
+        "--size", type=int, default=1000, help="rows, samples or events"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help="rows per write",
+    )
+    args = parser.parse_args(argv)
+
+    _, function = GENERATORS[args.generator]
+    function(args.path, args.size, seed=args.seed, chunk_size=args.chunk_size)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())